@@ -10,27 +10,50 @@ Usage:
 
 import argparse
 import asyncio
-import json
-import os
 import sys
-import time
-import zipfile
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urlparse
+from typing import AsyncIterator, Dict, Iterable, Optional, Sized
 
-import aiohttp
 import requests
+from mineru_download import add_download_arguments, fetch_result, setup_download
+from mineru_engine import (
+    AsyncEngine,
+    Engine,
+    EngineSource,
+    Job,
+    Policy,
+    as_engine,
+    batch_counts,
+    open_session,
+    put_file,
+    run_async,
+)
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pages import PAGES, add_pages_arguments, result_name, setup_pages
+from mineru_pipeline import (
+    DEFAULT_BACKLOG,
+    ResultSink,
+    chunked,
+    iter_lines,
+    progress_tag,
+)
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_route import ROUTER, add_route_arguments, route_batches, setup_route
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_tokens import TokenPool, add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace
 
-API_BASE = "https://mineru.net/api/v4"
 DEFAULT_TIMEOUT = 600
 DEFAULT_POLL_INTERVAL = 5
 DEFAULT_CONCURRENCY = 5
 
 
-def get_token(args: argparse.Namespace) -> str:
-    """Get API token from args or environment."""
-    token = args.token or os.environ.get("MINERU_TOKEN")
+def get_token(args: argparse.Namespace) -> TokenPool:
+    """Get the API token(s) from args or environment."""
+    token = token_pool(args)
     if not token:
         raise ValueError(
             "No API token provided. Set MINERU_TOKEN environment variable "
@@ -39,125 +62,47 @@ def get_token(args: argparse.Namespace) -> str:
     return token
 
 
-def headers(token: str) -> dict:
-    """Return authorization headers."""
+def parse_options(model_version: str = "vlm", enable_formula: bool = True,
+                  enable_table: bool = True, is_ocr: bool = False) -> dict:
+    """API options shared by URL tasks and file batches."""
     return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-        "Accept": "*/*",
-    }
-
-
-# ============ Async Functions ============
-
-
-async def async_post(session: aiohttp.ClientSession, url: str, token: str, data: dict, timeout: int = 30) -> dict:
-    """Async POST request."""
-    async with session.post(
-        url,
-        headers=headers(token),
-        json=data,
-        timeout=aiohttp.ClientTimeout(total=timeout),
-    ) as response:
-        result = await response.json()
-        if result.get("code") != 0:
-            raise Exception(f"API error: {result.get('msg', result)}")
-        return result
-
-
-async def async_get(session: aiohttp.ClientSession, url: str, token: str, timeout: int = 30) -> dict:
-    """Async GET request."""
-    async with session.get(
-        url,
-        headers=headers(token),
-        timeout=aiohttp.ClientTimeout(total=timeout),
-    ) as response:
-        result = await response.json()
-        if result.get("code") != 0:
-            raise Exception(f"API error: {result.get('msg', result)}")
-        return result
-
-
-async def async_create_task_from_url(
-    session: aiohttp.ClientSession,
-    token: str,
-    url: str,
-    data_id: str,
-    model_version: str = "vlm",
-    enable_formula: bool = True,
-    enable_table: bool = True,
-    is_ocr: bool = False,
-) -> str:
-    """Create a parsing task from URL. Returns task_id."""
-    data = {
-        "url": url,
         "model_version": model_version,
         "enable_formula": enable_formula,
         "enable_table": enable_table,
         "is_ocr": is_ocr,
-        "data_id": data_id,
     }
-    result = await async_post(session, f"{API_BASE}/extract/task", token, data)
-    return result["data"]["task_id"]
 
 
-async def async_get_task_status(session: aiohttp.ClientSession, token: str, task_id: str) -> dict:
-    """Get task status and result."""
-    result = await async_get(session, f"{API_BASE}/extract/task/{task_id}", token)
-    return result["data"]
-
-
-async def async_wait_for_task(
-    session: aiohttp.ClientSession,
-    token: str,
-    task_id: str,
-    poll_interval: int = DEFAULT_POLL_INTERVAL,
-    timeout: int = DEFAULT_TIMEOUT,
-) -> dict:
-    """Wait for task to complete. Returns result data."""
-    start_time = time.time()
-
-    while True:
-        elapsed = time.time() - start_time
-        if elapsed > timeout:
-            raise TimeoutError(f"Task timed out after {timeout} seconds")
-
-        status = await async_get_task_status(session, token, task_id)
-        state = status.get("state")
-
-        if state == "done":
-            return status
-        elif state == "failed":
-            raise Exception(f"Task failed: {status.get('err_msg', 'Unknown error')}")
+# ============ Async Functions ============
 
-        await asyncio.sleep(poll_interval)
 
+def _url_progress(total: Optional[int]):
+    """Engine event hook printing one line per URL start / finish."""
 
-async def async_download_and_extract(session: aiohttp.ClientSession, url: str, output_dir: Path, filename: str) -> Path:
-    """Download and extract result ZIP asynchronously."""
-    zip_path = output_dir / f"{filename}.zip"
+    def on_event(job: Job, event: str) -> None:
+        tag = progress_tag(job.index, total)
+        if event == "start":
+            print(f"  {tag} 开始: {job.name}")
+        elif event == "done":
+            print(f"  {tag} ✅ 完成: {job.name}")
+        elif event == "failed":
+            print(f"  {tag} ❌ 失败: {job.name} - {job.error}")
 
-    async with session.get(url, timeout=aiohttp.ClientTimeout(total=300)) as response:
-        with open(zip_path, "wb") as f:
-            async for chunk in response.content.iter_chunked(8192):
-                f.write(chunk)
+    return on_event
 
-    # Extract ZIP (sync, fast enough)
-    extract_dir = output_dir / filename
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_dir)
 
-    zip_path.unlink()
-    return extract_dir
+def _url_policy(poll_interval: int, timeout: int) -> Policy:
+    # One attempt per URL; every URL is parsed even if its output already exists
+    return Policy(retries=1, poll_interval=poll_interval, timeout=timeout, skip_existing=False)
 
 
 async def async_parse_single_url(
-    session: aiohttp.ClientSession,
-    token: str,
+    session,
+    token: EngineSource,
     url: str,
     output_dir: Path,
     index: int,
-    total: int,
+    total: Optional[int],
     model_version: str = "vlm",
     enable_formula: bool = True,
     enable_table: bool = True,
@@ -166,43 +111,61 @@ async def async_parse_single_url(
     timeout: int = DEFAULT_TIMEOUT,
     verbose: bool = True,
 ) -> tuple:
-    """Parse a single PDF URL asynchronously. Returns (index, filename, extract_dir or error)."""
-    parsed = urlparse(url)
-    filename = Path(parsed.path).stem or f"document_{index}"
-
-    if verbose:
-        print(f"  [{index+1}/{total}] 开始: {filename}")
-
-    try:
-        # Create task
-        task_id = await async_create_task_from_url(
-            session, token, url, filename, model_version, enable_formula, enable_table, is_ocr
-        )
-
-        # Wait for completion
-        result = await async_wait_for_task(session, token, task_id, poll_interval, timeout)
+    """Parse a single PDF URL on an open aiohttp session. Returns (index, filename,
+    extract_dir or error)."""
+    tokens = token.tokens if isinstance(token, Engine) else token
+    engine = AsyncEngine(tokens, session, _url_policy(poll_interval, timeout))
+    job = Job(url, output_dir, options=parse_options(model_version, enable_formula, enable_table,
+                                                     is_ocr), index=index)
+    await engine.run(job, _url_progress(total) if verbose else None)
+    file_done("success" if job.ok else "failed")
+    return job.index, job.name, job.output if job.ok else job.error
+
+
+async def async_stream_urls(
+    token: EngineSource,
+    urls: Iterable[str],
+    output_dir: Path,
+    model_version: str = "vlm",
+    enable_formula: bool = True,
+    enable_table: bool = True,
+    is_ocr: bool = False,
+    poll_interval: int = DEFAULT_POLL_INTERVAL,
+    timeout: int = DEFAULT_TIMEOUT,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    verbose: bool = True,
+    backlog: int = DEFAULT_BACKLOG,
+) -> AsyncIterator[tuple]:
+    """Parse URLs through a bounded worker pool, yielding results as they finish.
 
-        # Download result
-        zip_url = result.get("full_zip_url")
-        if not zip_url:
-            raise Exception("No result URL in response")
+    `urls` may be any iterable (e.g. `iter_lines(path)`); it is consumed lazily,
+    so memory use does not grow with the number of URLs. Yields
+    (index, filename, extract_dir or error message) in completion order.
+    `token` is a token, a TokenPool or an Engine (whose tokens are used).
+    """
+    total = len(urls) if isinstance(urls, Sized) else None
 
-        extract_dir = await async_download_and_extract(session, zip_url, output_dir, filename)
+    if verbose:
+        count = f"{total} 个文件" if total is not None else "流式输入"
+        print(f"\n📚 并发解析 {count} (并发数: {concurrency})...")
 
-        if verbose:
-            print(f"  [{index+1}/{total}] ✅ 完成: {filename}")
+    output_dir.mkdir(parents=True, exist_ok=True)
 
-        return (index, filename, extract_dir)
+    tokens = token.tokens if isinstance(token, Engine) else token
+    options = parse_options(model_version, enable_formula, enable_table, is_ocr)
+    jobs = (Job(url, output_dir, options=options, index=i) for i, url in enumerate(urls))
 
-    except Exception as e:
-        if verbose:
-            print(f"  [{index+1}/{total}] ❌ 失败: {filename} - {e}")
-        return (index, filename, str(e))
+    async with open_session(concurrency) as session:
+        engine = AsyncEngine(tokens, session, _url_policy(poll_interval, timeout))
+        async for job in run_async(engine, jobs, concurrency, backlog,
+                                   _url_progress(total) if verbose else None):
+            file_done("success" if job.ok else "failed")
+            yield job.index, job.name, job.output if job.ok else job.error
 
 
 async def async_parse_batch_urls(
-    token: str,
-    urls: list,
+    token: EngineSource,
+    urls: Iterable[str],
     output_dir: Path,
     model_version: str = "vlm",
     enable_formula: bool = True,
@@ -213,108 +176,90 @@ async def async_parse_batch_urls(
     concurrency: int = DEFAULT_CONCURRENCY,
     verbose: bool = True,
 ) -> list:
-    """Parse multiple PDF URLs concurrently."""
-    if verbose:
-        print(f"\n📚 并发解析 {len(urls)} 个文件 (并发数: {concurrency})...")
-
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    connector = aiohttp.TCPConnector(limit=concurrency)
-    timeout_config = aiohttp.ClientTimeout(total=timeout * 2)
-
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout_config) as session:
-        # Create semaphore for concurrency control
-        semaphore = asyncio.Semaphore(concurrency)
-
-        async def bounded_parse(url, index):
-            async with semaphore:
-                return await async_parse_single_url(
-                    session, token, url, output_dir, index, len(urls),
-                    model_version, enable_formula, enable_table, is_ocr,
-                    poll_interval, timeout, verbose
-                )
-
-        # Run all tasks concurrently
-        tasks = [bounded_parse(url, i) for i, url in enumerate(urls)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Process results
-        output_dirs = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                if verbose:
-                    print(f"  [{i+1}/{len(urls)}] ❌ 异常: {result}")
-            else:
-                index, filename, data = result
-                if isinstance(data, Path):
-                    output_dirs.append(data)
-                    # Rename full.md to {filename}.md
-                    md_file = data / "full.md"
-                    if md_file.exists():
-                        md_file.rename(data / f"{filename}.md")
-
-        return output_dirs
-
-
-# ============ Batch File Upload Functions ============
+    """Parse multiple PDF URLs concurrently. Returns the output directories."""
+    output_dirs = []
+    async for index, filename, data in async_stream_urls(
+        token, urls, output_dir,
+        model_version, enable_formula, enable_table, is_ocr,
+        poll_interval, timeout, concurrency, verbose
+    ):
+        if isinstance(data, Path):
+            output_dirs.append(data)
+    return output_dirs
 
 
-def create_batch_from_files(
-    token: str,
-    file_paths: list,
+async def async_parse_urls_to_sink(
+    token: EngineSource,
+    urls: Iterable[str],
+    output_dir: Path,
+    sink: ResultSink,
     model_version: str = "vlm",
     enable_formula: bool = True,
     enable_table: bool = True,
     is_ocr: bool = False,
-) -> tuple:
-    """Create batch parsing task by uploading files. Returns (batch_id, upload_urls)."""
-    files = [{"name": Path(f).name, "data_id": Path(f).stem} for f in file_paths]
-    data = {
-        "files": files,
-        "model_version": model_version,
-        "enable_formula": enable_formula,
-        "enable_table": enable_table,
-        "is_ocr": is_ocr,
-    }
+    poll_interval: int = DEFAULT_POLL_INTERVAL,
+    timeout: int = DEFAULT_TIMEOUT,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    verbose: bool = True,
+    backlog: int = DEFAULT_BACKLOG,
+) -> dict:
+    """Parse a (possibly huge) stream of URLs, recording each result in `sink`.
 
-    response = requests.post(
-        f"{API_BASE}/file-urls/batch",
-        headers=headers(token),
-        json=data,
-        timeout=60,
-    )
-    result = response.json()
+    Nothing is accumulated in memory; returns the final summary dict.
+    """
+    try:
+        async for index, filename, data in async_stream_urls(
+            token, urls, output_dir,
+            model_version, enable_formula, enable_table, is_ocr,
+            poll_interval, timeout, concurrency, verbose, backlog
+        ):
+            if isinstance(data, Path):
+                sink.record(filename, True, index=index, output=str(data))
+            else:
+                sink.record(filename, False, index=index, error=data)
+    finally:
+        summary = sink.close()
+    return summary
 
-    if result.get("code") != 0:
-        raise Exception(f"Failed to get upload URLs: {result.get('msg', result)}")
 
-    return result["data"]["batch_id"], result["data"]["file_urls"]
+# ============ Batch File Upload Functions ============
 
 
-def upload_file(upload_url: str, file_path: str) -> bool:
-    """Upload a single file to the given URL."""
-    with open(file_path, "rb") as f:
-        response = requests.put(upload_url, data=f, timeout=300)
-    return response.status_code == 200
+def create_batch_from_files(engine: EngineSource, file_paths: list, options=None, *args,
+                            file_options: Optional[Dict[str, dict]] = None, **kwargs) -> tuple:
+    """Create batch parsing task by uploading files. Returns (batch_id, upload_urls).
 
+    `options` is an API options dict; the older form with `model_version`,
+    `enable_formula`, `enable_table`, `is_ocr` (positional or keyword) still
+    works. `file_options` maps a path to its own options (e.g. --pages
+    `page_ranges`).
+    """
+    if isinstance(options, str) or args or kwargs:
+        options = parse_options(*([options] if options is not None else []), *args, **kwargs)
+    file_options = file_options or {}
+    files = [(Path(f).name, result_name(Path(f)), file_options.get(f, {})) for f in file_paths]
+    return as_engine(engine).create_upload_urls(files, options)
 
-def get_batch_status(token: str, batch_id: str) -> list:
-    """Get batch task status and results."""
-    response = requests.get(
-        f"{API_BASE}/extract-results/batch/{batch_id}",
-        headers=headers(token),
-        timeout=30,
-    )
-    result = response.json()
 
-    if result.get("code") != 0:
-        raise Exception(f"Failed to get batch status: {result.get('msg', result)}")
+def upload_file(upload_url: str, file_path: str, engine: Optional[Engine] = None) -> bool:
+    """Upload a single file to the given URL (over `engine`'s connection, if given)."""
+    try:
+        if engine is None:
+            put_file(requests, upload_url, Path(file_path), Policy().upload_timeout)
+        else:
+            engine.upload(upload_url, Path(file_path))
+    except Exception:
+        return False
+    return True
 
-    return result["data"]["extract_result"]
+
+def get_batch_status(engine: EngineSource, batch_id: str) -> list:
+    """Get batch task status and results."""
+    return as_engine(engine).batch_results(batch_id)
 
 
 def wait_for_batch(
-    token: str,
+    engine: EngineSource,
     batch_id: str,
     total_files: int,
     poll_interval: int = DEFAULT_POLL_INTERVAL,
@@ -322,51 +267,24 @@ def wait_for_batch(
     verbose: bool = True,
 ) -> list:
     """Wait for batch to complete. Returns list of results."""
-    start_time = time.time()
-
-    while True:
-        elapsed = time.time() - start_time
-        if elapsed > timeout:
-            raise TimeoutError(f"Batch timed out after {timeout} seconds")
-
-        results = get_batch_status(token, batch_id)
-
-        completed = sum(1 for r in results if r.get("state") == "done")
-        failed = sum(1 for r in results if r.get("state") == "failed")
-        running = sum(1 for r in results if r.get("state") == "running")
-        pending = total_files - completed - failed - running
-
-        if verbose:
-            print(f"  状态: {completed} 完成, {running} 处理中, {pending} 等待, {failed} 失败")
 
-        if completed + failed == total_files:
-            return results
+    def show(results):
+        completed, running, pending, failed = batch_counts(results, total_files)
+        print(f"  状态: {completed} 完成, {running} 处理中, {pending} 等待, {failed} 失败")
 
-        time.sleep(poll_interval)
+    return as_engine(engine).wait_batch(batch_id, total_files, show if verbose else None,
+                                        poll_interval, timeout)
 
 
-def download_result(url: str, output_dir: Path, filename: str) -> Path:
-    """Download and extract result ZIP."""
-    zip_path = output_dir / f"{filename}.zip"
-
-    response = requests.get(url, stream=True, timeout=300)
-    response.raise_for_status()
-
-    with open(zip_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-
-    extract_dir = output_dir / filename
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_dir)
-
-    zip_path.unlink()
-
-    return extract_dir
+def download_result(url: str, output_dir: Path, filename: str, source: Optional[dict] = None,
+                    engine: Optional[Engine] = None) -> Path:
+    """Download and extract result ZIP (only record its URL with --defer-download)."""
+    return fetch_result(url, output_dir, filename, source,
+                        session=engine.http if engine is not None else None)
 
 
 def parse_local_files(
-    token: str,
+    engine: EngineSource,
     file_paths: list,
     output_dir: Path,
     model_version: str = "vlm",
@@ -376,8 +294,13 @@ def parse_local_files(
     poll_interval: int = DEFAULT_POLL_INTERVAL,
     timeout: int = DEFAULT_TIMEOUT,
     verbose: bool = True,
+    file_options: Optional[Dict[str, dict]] = None,
 ) -> list:
-    """Parse local PDF files by uploading them (sync, for smaller batches)."""
+    """Parse local PDF files by uploading them (sync, for smaller batches).
+
+    `engine` is an Engine, or a token / TokenPool to make one with.
+    """
+    engine = as_engine(engine)
     if verbose:
         print(f"\n📚 上传并解析 {len(file_paths)} 个文件...")
 
@@ -385,7 +308,8 @@ def parse_local_files(
 
     # Create batch and upload
     batch_id, upload_urls = create_batch_from_files(
-        token, file_paths, model_version, enable_formula, enable_table, is_ocr
+        engine, file_paths, parse_options(model_version, enable_formula, enable_table, is_ocr),
+        file_options=file_options,
     )
 
     if verbose:
@@ -395,37 +319,71 @@ def parse_local_files(
     for i, (file_path, upload_url) in enumerate(zip(file_paths, upload_urls)):
         if verbose:
             print(f"  上传 {Path(file_path).name}... ({i+1}/{len(file_paths)})")
-        if not upload_file(upload_url, file_path):
+        if not upload_file(upload_url, file_path, engine):
             print(f"  ❌ 上传失败: {file_path}")
 
     # Wait for completion
-    results = wait_for_batch(token, batch_id, len(file_paths), poll_interval, timeout, verbose)
+    results = wait_for_batch(engine, batch_id, len(file_paths), poll_interval, timeout, verbose)
 
     # Download results
     output_dirs = []
     for result in results:
         if result.get("state") == "done":
             zip_url = result.get("full_zip_url")
-            filename = result.get("data_id") or result.get("file_name", "document")
-            filename = Path(filename).stem
+            # data_id is already the result name (dots and --pages suffix included)
+            filename = result.get("data_id") or Path(result.get("file_name", "document")).stem
 
-            extract_dir = download_result(zip_url, output_dir, filename)
+            source = {"batch_id": batch_id, "data_id": result.get("data_id"),
+                      "file_name": result.get("file_name"),
+                      "token_id": engine.tokens.owner(batch_id).id}
+            extract_dir = download_result(zip_url, output_dir, filename, source, engine)
             output_dirs.append(extract_dir)
 
-            # Rename full.md
-            md_file = extract_dir / "full.md"
-            if md_file.exists():
-                md_file.rename(extract_dir / f"{filename}.md")
-
             if verbose:
                 print(f"  ✓ {filename}")
+            file_done("success")
         else:
+            file_done("failed")
             if verbose:
                 print(f"  ✗ {result.get('file_name', 'unknown')}: {result.get('err_msg', 'failed')}")
 
     return output_dirs
 
 
+def parse_routed_files(engine: Engine, file_paths: list, output_dir: Path,
+                       args: argparse.Namespace) -> list:
+    """`parse_local_files` once per group of files that --route sends to the same
+    model and OCR setting (one group, with --model / --ocr, without it), with each
+    file's --pages `page_ranges`."""
+    output_dirs = []
+    file_options = {}
+    if PAGES.enabled:
+        selected = []
+        for f in file_paths:
+            try:
+                ranges = PAGES.page_ranges(Path(f))
+            except ValueError as e:
+                print(f"  ✗ {Path(f).name}: {e}")
+                file_done("failed")
+                continue
+            file_options[f] = {"page_ranges": ranges} if ranges else {}
+            selected.append(f)
+        file_paths = selected
+    if not file_paths:
+        return output_dirs
+    options = parse_options(args.model, args.formula, args.table, args.ocr)
+    for routed, paths in route_batches(file_paths, options):
+        if ROUTER.enabled:
+            ocr = " + OCR" if routed["is_ocr"] else ""
+            print(f"\n🧭 {routed['model_version']}{ocr}: {len(paths)} 个文件")
+        output_dirs += parse_local_files(
+            engine, paths, output_dir,
+            routed["model_version"], args.formula, args.table, routed["is_ocr"],
+            args.poll_interval, args.timeout, file_options=file_options,
+        )
+    return output_dirs
+
+
 # ============ Main ============
 
 
@@ -439,6 +397,7 @@ Examples:
   %(prog)s --file ./document.pdf --output ./parsed/
   %(prog)s --dir ./pdfs/ --output ./parsed/ --concurrency 10
   %(prog)s --urls-file ./urls.txt --output ./parsed/ --concurrency 5
+  %(prog)s --urls-file ./urls.txt --output ./parsed/ --results ./parsed/results.jsonl
         """,
     )
 
@@ -456,8 +415,10 @@ Examples:
     parser.add_argument("--token", help="MinerU API token (or set MINERU_TOKEN env)")
 
     # Parsing options
-    parser.add_argument("--model", default="vlm", choices=["pipeline", "vlm", "MinerU-HTML"])
-    parser.add_argument("--ocr", action="store_true", help="Enable OCR for scanned PDFs")
+    parser.add_argument("--model", default="vlm", choices=["pipeline", "vlm", "MinerU-HTML"],
+                        help="Model version (default: vlm; with --route: for URLs)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="Enable OCR for scanned PDFs (with --route: for every file)")
     parser.add_argument("--formula", action="store_true", default=True)
     parser.add_argument("--no-formula", action="store_false", dest="formula")
     parser.add_argument("--table", action="store_true", default=True)
@@ -470,8 +431,33 @@ Examples:
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
     parser.add_argument("--batch-size", type=int, default=50,
                         help="Batch size for large directories (default: 50)")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help=f"Max URLs read ahead of the workers (default: {DEFAULT_BACKLOG})")
+    parser.add_argument("--results",
+                        help="Append per-file results to this JSONL file as they finish "
+                             "(a .summary.json is kept next to it)")
+    add_scan_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
+    add_route_arguments(parser)
+    add_pages_arguments(parser)
 
     args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
+    setup_route(args)
+    setup_pages(args)
 
     # Get token
     try:
@@ -484,6 +470,8 @@ Examples:
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    engine = Engine(token, Policy(timeout=args.timeout, poll_interval=args.poll_interval))
+
     try:
         if args.url:
             # Single URL - use async for consistency
@@ -494,54 +482,53 @@ Examples:
             ))
 
         elif args.urls_file:
-            # URLs from file
-            with open(args.urls_file) as f:
-                urls = [line.strip() for line in f if line.strip()]
-
-            print(f"📋 从文件读取 {len(urls)} 个 URL")
+            # URLs from file - read lazily through a bounded queue
+            print(f"📋 从文件流式读取 URL: {args.urls_file}")
 
-            asyncio.run(async_parse_batch_urls(
-                token, urls, output_dir,
+            sink = ResultSink(args.results)
+            summary = asyncio.run(async_parse_urls_to_sink(
+                token, iter_lines(args.urls_file), output_dir, sink,
                 args.model, args.formula, args.table, args.ocr,
-                args.poll_interval, args.timeout, args.concurrency
+                args.poll_interval, args.timeout, args.concurrency,
+                backlog=args.backlog,
             ))
 
+            close_events()
+            print(f"\n{'='*50}")
+            print(f"✅ 成功: {summary['success']}")
+            print(f"❌ 失败: {summary['failed']}")
+            print(f"⏱️  耗时: {summary['elapsed']/60:.1f} 分钟")
+            sink.print_failures()
+            if args.results:
+                print(f"📝 结果记录: {args.results}")
+
         elif args.file:
             # Single local file
-            parse_local_files(
-                token, [args.file], output_dir,
-                args.model, args.formula, args.table, args.ocr,
-                args.poll_interval, args.timeout
-            )
+            parse_routed_files(engine, [args.file], output_dir, args)
 
         elif args.dir:
-            # Directory of files - batch process
+            # Directory of files - scanned lazily and batched as files are discovered
             input_dir = Path(args.dir)
-            pdf_files = list(input_dir.glob("*.pdf")) + list(input_dir.glob("*.PDF"))
-
-            if not pdf_files:
-                print(f"No PDF files found in {args.dir}", file=sys.stderr)
-                sys.exit(1)
-
-            print(f"📚 发现 {len(pdf_files)} 个 PDF 文件")
+            files = (
+                (f, mirror_output_dir(f, input_dir, output_dir))
+                for f in timed_iter("scan", scan_from_args(args, input_dir, {".pdf"}, output_dir))
+            )
 
-            # Process in batches
-            batch_size = args.batch_size
-            total_batches = (len(pdf_files) + batch_size - 1) // batch_size
+            # Process in batches (each batch shares one output directory)
+            batch_count = 0
+            for batch in chunked(files, args.batch_size, key=lambda job: job[1]):
+                batch_count += 1
+                batch_files = [f for f, _ in batch]
 
-            for batch_num in range(total_batches):
-                start_idx = batch_num * batch_size
-                end_idx = min((batch_num + 1) * batch_size, len(pdf_files))
-                batch_files = pdf_files[start_idx:end_idx]
+                print(f"\n📦 批次 {batch_count} ({len(batch_files)} 个文件)")
 
-                print(f"\n📦 批次 {batch_num + 1}/{total_batches} ({len(batch_files)} 个文件)")
+                parse_routed_files(engine, [str(f) for f in batch_files], batch[0][1], args)
 
-                parse_local_files(
-                    token, [str(f) for f in batch_files], output_dir,
-                    args.model, args.formula, args.table, args.ocr,
-                    args.poll_interval, args.timeout
-                )
+            if not batch_count:
+                print(f"No PDF files found in {args.dir}", file=sys.stderr)
+                sys.exit(1)
 
+        close_events()
         print(f"\n✅ 完成! 结果保存在: {output_dir}")
 
     except Exception as e:
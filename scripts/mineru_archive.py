@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+MinerU result archives - keep results zipped, read members on demand
+
+With `--archive` a result stays as the downloaded, verified `<name>.zip`
+instead of being unpacked into a folder of small files. Every archived
+result gets a line in `mineru-archives.jsonl` next to it, holding the
+archive's size and mtime plus the offset, sizes, compression and CRC of
+each member. A member is then read with one seek and one read, without
+parsing the central directory. An entry whose archive changed after it was
+indexed falls back to `zipfile`, and so do archives that were never
+indexed.
+
+`--resume` and the per-file "already exists" checks accept either the
+extracted folder or `<name>.zip`, so archived runs resume like extracted
+ones.
+
+Python API:
+    store = ArchiveStore("./output")
+    store.names()                                 # indexed documents
+    doc = store.open("paper")
+    doc.markdown()                                # full.md as str
+    doc.read("images/fig_0.jpg")                  # bytes
+    doc.export("./paper", keep={"md", "images"})  # unpack selected members
+
+CLI:
+    python mineru_archive.py ls ./output [NAME]
+    python mineru_archive.py cat ./output NAME [MEMBER]    # default: the Markdown
+    python mineru_archive.py export ./output NAME DEST --keep md,images
+    python mineru_archive.py index ./output                # rebuild the index
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+INDEX_NAME = "mineru-archives.jsonl"
+KEEP_KINDS = ("md", "images", "content_list", "model", "layout", "origin", "other")
+IMAGE_REF = re.compile(r"images/[^\s)\]\"'<>]+")
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+_index_lock = threading.Lock()
+_indexed_names: Dict[str, Tuple[Tuple[int, int], Set[str]]] = {}  # index path -> (stat, names)
+
+
+# ============ Result members ============
+
+def member_kind(name: str) -> str:
+    """Classify a result ZIP member: md, images, content_list, model, layout, origin or other."""
+    base = name.rsplit("/", 1)[-1]
+    if name.startswith("images/") or "/images/" in name:
+        return "images"
+    if base.endswith(".md"):
+        return "md"
+    if base.endswith("_content_list.json"):
+        return "content_list"
+    if base.endswith("_model.json"):
+        return "model"
+    if base == "layout.json" or base.endswith("_middle.json"):
+        return "layout"
+    if base.endswith("_origin.pdf"):
+        return "origin"
+    return "other"
+
+
+def referenced_images(zf: zipfile.ZipFile, members: Iterable[zipfile.ZipInfo]) -> Set[str]:
+    """Image paths mentioned by the Markdown / content list among `members`."""
+    refs = set()
+    for info in members:
+        if member_kind(info.filename) in ("md", "content_list"):
+            prefix = info.filename[:len(info.filename) - len(info.filename.rsplit("/", 1)[-1])]
+            text = zf.read(info).decode("utf-8", errors="replace")
+            refs.update(prefix + ref for ref in IMAGE_REF.findall(text))
+    return refs
+
+
+def select_members(zf: zipfile.ZipFile, keep: Optional[Set[str]] = None,
+                   referenced_only: bool = False) -> List[zipfile.ZipInfo]:
+    """Members of kinds in `keep` (None = all), optionally dropping unreferenced images."""
+    members = [i for i in zf.infolist() if not i.is_dir()]
+    if keep is not None:
+        members = [i for i in members if member_kind(i.filename) in keep]
+    if referenced_only:
+        refs = referenced_images(zf, members)
+        members = [i for i in members
+                   if member_kind(i.filename) != "images" or i.filename in refs]
+    return members
+
+
+def unpack(zf: zipfile.ZipFile, dest: Path, name: str, keep: Optional[Set[str]] = None,
+           referenced_only: bool = False) -> int:
+    """Extract the selected members into `dest`, rename full.md to `<name>.md`; returns bytes written."""
+    members = select_members(zf, keep, referenced_only)
+    zf.extractall(dest, members=members)
+    md = dest / "full.md"
+    if md.exists():
+        md.rename(dest / f"{name}.md")
+    return sum(i.file_size for i in members)
+
+
+def archive_path(output_dir: Path, name: str) -> Path:
+    return Path(output_dir) / f"{name}.zip"
+
+
+# ============ Index ============
+
+def index_entry(path: Path, name: str) -> dict:
+    """Index line for one archive: its stat plus [offset, compressed, size, method, crc] per member."""
+    st = path.stat()
+    with zipfile.ZipFile(path) as zf:
+        members = {
+            i.filename: [i.header_offset, i.compress_size, i.file_size, i.compress_type, i.CRC]
+            for i in zf.infolist() if not i.is_dir()
+        }
+    return {"name": name, "archive": path.name, "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns, "members": members}
+
+
+def add_to_index(path: Path, name: str) -> None:
+    """Append `path` to the index in its directory (later lines win)."""
+    line = json.dumps(index_entry(path, name), ensure_ascii=False) + "\n"
+    with _index_lock, open(path.parent / INDEX_NAME, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def read_index(directory: Path) -> Dict[str, dict]:
+    """Latest index entry per document name in `directory` ({} without an index)."""
+    entries: Dict[str, dict] = {}
+    try:
+        f = open(Path(directory) / INDEX_NAME, encoding="utf-8")
+    except FileNotFoundError:
+        return entries
+    with f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            entries[entry["name"]] = entry
+    return entries
+
+
+def is_indexed(directory: Path, name: str) -> bool:
+    """True if the index of `directory` has an entry for `name` (the names are cached
+    until the index file changes)."""
+    path = Path(directory) / INDEX_NAME
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return False
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _indexed_names.get(str(path))
+    if cached is None or cached[0] != stamp:
+        cached = _indexed_names[str(path)] = (stamp, set(read_index(directory)))
+    return name in cached[1]
+
+
+def rebuild_index(directory: Path) -> int:
+    """Rewrite the index of `directory` from the archives actually present."""
+    directory = Path(directory)
+    entries = [index_entry(p, p.stem) for p in sorted(directory.glob("*.zip"))]
+    tmp = directory / (INDEX_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp, directory / INDEX_NAME)
+    return len(entries)
+
+
+def _index_dirs(root: Path, recursive: bool) -> Iterator[Path]:
+    if not recursive:
+        yield root
+        return
+    for dirpath, _, filenames in os.walk(root):
+        if INDEX_NAME in filenames or any(n.endswith(".zip") for n in filenames):
+            yield Path(dirpath)
+
+
+# ============ Reading ============
+
+class ResultArchive:
+    """One kept result ZIP; members are read on demand."""
+
+    def __init__(self, path: Path, entry: Optional[dict] = None):
+        self.path = Path(path)
+        self.name = entry["name"] if entry else self.path.stem
+        self._members = entry["members"] if entry and self._fresh(entry) else None
+
+    def _fresh(self, entry: dict) -> bool:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def names(self) -> List[str]:
+        if self._members is not None:
+            return list(self._members)
+        with zipfile.ZipFile(self.path) as zf:
+            return [i.filename for i in zf.infolist() if not i.is_dir()]
+
+    def sizes(self) -> List[Tuple[str, int]]:
+        """(member, uncompressed size) pairs."""
+        if self._members is not None:
+            return [(n, m[2]) for n, m in self._members.items()]
+        with zipfile.ZipFile(self.path) as zf:
+            return [(i.filename, i.file_size) for i in zf.infolist() if not i.is_dir()]
+
+    def read(self, member: str) -> bytes:
+        meta = self._members.get(member) if self._members is not None else None
+        if meta and meta[3] in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return self._read_indexed(member, *meta)
+        with zipfile.ZipFile(self.path) as zf:
+            return zf.read(member)
+
+    def _read_indexed(self, member: str, offset: int, csize: int, size: int,
+                      method: int, crc: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            header = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+            if header[0] != b"PK\x03\x04":
+                raise zipfile.BadZipFile(f"{member}: bad local header in {self.path}")
+            f.seek(header[9] + header[10], os.SEEK_CUR)  # name + extra field
+            data = f.read(csize)
+        if method == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if len(data) != size or zlib.crc32(data) != crc:
+            raise zipfile.BadZipFile(f"{member}: CRC mismatch in {self.path}")
+        return data
+
+    def markdown_member(self) -> Optional[str]:
+        names = self.names()
+        if "full.md" in names:
+            return "full.md"
+        return next((n for n in names if member_kind(n) == "md"), None)
+
+    def markdown(self) -> str:
+        member = self.markdown_member()
+        if member is None:
+            raise KeyError(f"{self.path} has no Markdown")
+        return self.read(member).decode("utf-8")
+
+    def export(self, dest: Path, keep: Optional[Set[str]] = None,
+               referenced_only: bool = False) -> Path:
+        """Unpack into `dest` the same way a non-archive run would."""
+        dest = Path(dest)
+        with zipfile.ZipFile(self.path) as zf:
+            unpack(zf, dest, self.name, keep, referenced_only)
+        return dest
+
+
+class ArchiveStore:
+    """The archived results under an output directory, looked up through their indexes."""
+
+    def __init__(self, root: Path, recursive: bool = False):
+        self.root = Path(root)
+        self._entries: Dict[str, Tuple[Path, dict]] = {}
+        for directory in _index_dirs(self.root, recursive):
+            rel = directory.relative_to(self.root).as_posix()
+            for name, entry in read_index(directory).items():
+                key = name if rel == "." else f"{rel}/{name}"
+                self._entries[key] = (directory / entry["archive"], entry)
+
+    def names(self) -> List[str]:
+        return sorted(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries or archive_path(self.root, name).exists()
+
+    def open(self, name: str) -> ResultArchive:
+        if name in self._entries:
+            return ResultArchive(*self._entries[name])
+        path = archive_path(self.root, name)
+        if path.exists():
+            return ResultArchive(path)  # not indexed: read through zipfile
+        raise KeyError(name)
+
+
+# ============ CLI ============
+
+def keep_kinds(value: str) -> Set[str]:
+    kinds = {k.strip() for k in value.split(",") if k.strip()}
+    unknown = kinds - set(KEEP_KINDS)
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown kind(s): {', '.join(sorted(unknown))} (choose from {', '.join(KEEP_KINDS)})"
+        )
+    return kinds
+
+
+def _open(args: argparse.Namespace) -> ResultArchive:
+    rel = Path(args.name)
+    try:
+        return ArchiveStore(Path(args.root) / rel.parent).open(rel.name)
+    except KeyError:
+        print(f"❌ 找不到归档: {args.name}", file=sys.stderr)
+        sys.exit(1)
+
+
+def cmd_ls(args: argparse.Namespace) -> None:
+    if args.name:
+        for member, size in _open(args).sizes():
+            print(f"{size:>12}  {member_kind(member):<12}  {member}")
+        return
+    store = ArchiveStore(args.root, args.recursive)
+    for name in store.names():
+        doc = store.open(name)
+        print(f"{doc.path.stat().st_size:>12}  {len(doc.names()):>5}  {name}")
+
+
+def cmd_cat(args: argparse.Namespace) -> None:
+    doc = _open(args)
+    member = args.member or doc.markdown_member()
+    try:
+        data = doc.read(member) if member else None
+    except KeyError:
+        data = None
+    if data is None:
+        print(f"❌ {args.name} 中没有 {member or 'Markdown'}", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.buffer.write(data)
+
+
+def cmd_export(args: argparse.Namespace) -> None:
+    dest = _open(args).export(Path(args.dest), args.keep, args.referenced_images)
+    print(f"✅ {args.name} → {dest}")
+
+
+def cmd_index(args: argparse.Namespace) -> None:
+    root = Path(args.root)
+    total = sum(rebuild_index(d) for d in _index_dirs(root, args.recursive))
+    print(f"✅ 已索引 {total} 个归档")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read results kept with --archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ls", help="List archived documents, or the members of one")
+    p.add_argument("root", help="Output directory")
+    p.add_argument("name", nargs="?", help="Document name (relative path in recursive output)")
+    p.add_argument("--recursive", "-r", action="store_true", help="Include subdirectories")
+    p.set_defaults(func=cmd_ls)
+
+    p = sub.add_parser("cat", help="Write one member to stdout (default: the Markdown)")
+    p.add_argument("root")
+    p.add_argument("name")
+    p.add_argument("member", nargs="?")
+    p.set_defaults(func=cmd_cat)
+
+    p = sub.add_parser("export", help="Unpack one document like a non-archive run")
+    p.add_argument("root")
+    p.add_argument("name")
+    p.add_argument("dest")
+    p.add_argument("--keep", type=keep_kinds, metavar="KINDS",
+                   help=f"Only these members, comma-separated from {','.join(KEEP_KINDS)}")
+    p.add_argument("--referenced-images", action="store_true",
+                   help="Skip images not referenced by the Markdown or content list")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("index", help=f"Rebuild {INDEX_NAME} from the archives present")
+    p.add_argument("root")
+    p.add_argument("--recursive", "-r", action="store_true")
+    p.set_defaults(func=cmd_index)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
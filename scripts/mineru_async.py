@@ -5,165 +5,99 @@ MinerU PDF Parser - 高性能异步并发版本
 Optimizations:
 - asyncio + aiohttp: 单线程异步，无 GIL 开销
 - 连接池复用: 减少 TCP 握手
-- 信号量控制: 精确并发数
+- 固定数量 worker: 精确并发数
 - 自动重试: 失败自动重试 3 次
+- 有界队列: 边枚举边处理，结果逐个落盘，内存占用与文件数无关
 """
 
 import argparse
 import asyncio
-import os
 import sys
 import time
-import zipfile
 from pathlib import Path
-from typing import Optional, Tuple
 
-import aiohttp
-
-API_BASE = "https://mineru.net/api/v4"
+from mineru_download import add_download_arguments, async_fetch_result, has_result, setup_download
+from mineru_engine import JOB_RETRIES, AsyncEngine, Job, Policy, open_session, run_async
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_local import add_local_arguments, setup_local
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pages import add_pages_arguments, result_name, setup_pages
+from mineru_pipeline import DEFAULT_BACKLOG, ResultSink, progress_tag
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_tokens import add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace
 
 # 并发控制
 MAX_CONCURRENT = 10
-MAX_RETRIES = 3
+MAX_RETRIES = JOB_RETRIES
+
+POLICY = Policy(retries=MAX_RETRIES, backoff=lambda attempt: 2 ** attempt,  # 指数退避
+                poll_interval=5, timeout=600)
 
 
 class MinerUClient:
-    """MinerU API 异步客户端"""
-    
-    def __init__(self, token: str, session: aiohttp.ClientSession):
+    """旧接口兼容层: 按 token + session 调用，内部委托给 AsyncEngine"""
+
+    def __init__(self, token, session, concurrency=None):
         self.token = token
         self.session = session
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT)
-    
-    def _headers(self) -> dict:
-        return {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}",
-        }
-    
-    async def create_batch_upload(self, filename: str, data_id: str) -> Tuple[str, str]:
-        """获取上传链接"""
-        async with self.session.post(
-            f"{API_BASE}/file-urls/batch",
-            headers=self._headers(),
-            json={
-                "files": [{"name": filename, "data_id": data_id}],
-                "model_version": "vlm",
-                "enable_formula": True,
-                "enable_table": True,
-            },
-        ) as resp:
-            result = await resp.json()
-            if result.get("code") != 0:
-                raise Exception(f"API error: {result.get('msg')}")
-            data = result["data"]
-            return data["batch_id"], data["file_urls"][0]
-    
-    async def upload_file(self, upload_url: str, file_path: Path) -> bool:
+        self.engine = AsyncEngine(token, session, POLICY)
+        self.semaphore = asyncio.Semaphore(concurrency or MAX_CONCURRENT)
+
+    async def create_batch_upload(self, filename, data_id, options=None):
+        """创建上传任务，返回 (batch_id, upload_url)"""
+        batch_id, urls = await self.engine.create_upload_urls([(filename, data_id)], options)
+        return batch_id, urls[0]
+
+    async def upload_file(self, upload_url, file_path):
         """上传文件"""
-        async with self.session.put(
-            upload_url,
-            data=file_path.read_bytes(),
-        ) as resp:
-            return resp.status == 200
-    
-    async def wait_for_result(self, batch_id: str, timeout: int = 600) -> Optional[str]:
-        """等待解析完成，返回下载链接"""
-        start = time.time()
-        
-        while time.time() - start < timeout:
-            async with self.session.get(
-                f"{API_BASE}/extract-results/batch/{batch_id}",
-                headers=self._headers(),
-            ) as resp:
-                result = await resp.json()
-                results = result["data"]["extract_result"]
-                
-                if not results:
-                    await asyncio.sleep(5)
-                    continue
-                
-                state = results[0].get("state")
-                
-                if state == "done":
-                    return results[0].get("full_zip_url")
-                elif state == "failed":
-                    raise Exception(results[0].get("err_msg", "解析失败"))
-                
-                await asyncio.sleep(5)
-        
-        raise TimeoutError("等待超时")
-    
-    async def download_and_extract(self, zip_url: str, output_dir: Path, filename: str) -> Path:
-        """下载并解压"""
-        zip_path = output_dir / f"{filename}.zip"
-        
-        async with self.session.get(zip_url) as resp:
-            zip_path.write_bytes(await resp.read())
-        
-        extract_dir = output_dir / filename
-        with zipfile.ZipFile(zip_path) as zf:
-            zf.extractall(extract_dir)
-        
-        zip_path.unlink()
-        
-        # 重命名
-        md_file = extract_dir / "full.md"
-        if md_file.exists():
-            md_file.rename(extract_dir / f"{filename}.md")
-        
-        return extract_dir
-    
-    async def process_file(
-        self,
-        file_path: Path,
-        output_dir: Path,
-        index: int,
-        total: int,
-    ) -> Tuple[bool, str]:
-        """处理单个文件（带重试）"""
-        filename = file_path.name
-        stem = file_path.stem
-        
-        # 检查是否已存在
-        if (output_dir / stem).exists():
-            print(f"  [{index+1}/{total}] ⏭️  {stem}")
-            return True, stem
-        
-        async with self.semaphore:  # 控制并发
-            for attempt in range(MAX_RETRIES):
-                try:
-                    print(f"  [{index+1}/{total}] {'🔄' if attempt > 0 else '📤'} {stem}")
-                    
-                    # 1. 获取上传链接
-                    batch_id, upload_url = await self.create_batch_upload(filename, stem)
-                    
-                    # 2. 上传
-                    if not await self.upload_file(upload_url, file_path):
-                        raise Exception("上传失败")
-                    
-                    # 3. 等待解析
-                    zip_url = await self.wait_for_result(batch_id)
-                    
-                    # 4. 下载解压
-                    await self.download_and_extract(zip_url, output_dir, stem)
-                    
-                    print(f"  [{index+1}/{total}] ✅ {stem}")
-                    return True, stem
-                    
-                except Exception as e:
-                    if attempt < MAX_RETRIES - 1:
-                        await asyncio.sleep(2 ** attempt)  # 指数退避
-                        continue
-                    print(f"  [{index+1}/{total}] ❌ {stem}: {e}")
-                    return False, stem
-        
-        return False, stem
+        try:
+            await self.engine.upload(upload_url, Path(file_path))
+        except Exception:
+            return False
+        return True
+
+    async def get_result(self, batch_id):
+        """获取批次中第一个文件的结果"""
+        return await self.engine._first_result(batch_id)
+
+    async def wait_for_result(self, batch_id, timeout=600, poll_interval=5):
+        """等待解析完成，返回 zip 下载链接"""
+        engine = AsyncEngine(self.engine.tokens, self.session,
+                             Policy(poll_interval=poll_interval, timeout=timeout))
+        return await engine.wait(lambda: engine._first_result(batch_id))
+
+    async def download_and_extract(self, zip_url, output_dir, filename, batch_id=None):
+        """下载并解压结果"""
+        source = {"batch_id": batch_id, "data_id": filename} if batch_id else None
+        return await async_fetch_result(self.session, zip_url, Path(output_dir), filename, source)
+
+    async def process_file(self, file_path, output_dir, index, total):
+        """处理单个文件（带重试），返回 (是否成功, 名称)"""
+        job = Job(Path(file_path), Path(output_dir), index=index)
+        async with self.semaphore:
+            await self.engine.run(job)
+        return job.ok, job.name
+
+
+def print_progress(job, event):
+    tag = progress_tag(job.index)
+    if event == "skip":
+        print(f"  {tag} ⏭️  {job.name}")
+    elif event in ("start", "retry"):
+        print(f"  {tag} {'🔄' if event == 'retry' else '📤'} {job.name}")
+    elif event == "done":
+        print(f"  {tag} ✅ {job.name}")
+    elif event == "failed":
+        print(f"  {tag} ❌ {job.name}: {job.error}")
 
 
 async def main_async(args):
     """异步主函数"""
-    token = args.token or os.environ.get("MINERU_TOKEN")
+    token = token_pool(args)
     if not token:
         print("❌ 请设置 MINERU_TOKEN")
         sys.exit(1)
@@ -171,61 +105,58 @@ async def main_async(args):
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # 收集文件
+    # 结果流式写入磁盘（内存占用与文件数无关）
+    sink = ResultSink(args.results)
     input_dir = Path(args.dir)
-    pdf_files = sorted(list(input_dir.glob("*.pdf")) + list(input_dir.glob("*.PDF")))
-    
-    if not pdf_files:
-        print("❌ 未找到 PDF 文件")
-        sys.exit(1)
-    
-    # 过滤已处理的
-    if args.resume:
-        original = len(pdf_files)
-        pdf_files = [f for f in pdf_files if not (output_dir / f.stem).exists()]
-        if skipped := original - len(pdf_files):
-            print(f"⏭️  跳过已处理: {skipped} 个")
     
-    if not pdf_files:
-        print("✅ 所有文件已处理完成!")
-        return
-    
-    total = len(pdf_files)
-    print(f"\n📚 开始处理 {total} 个文件 (异步并发: {MAX_CONCURRENT})")
+    def iter_pending():
+        """惰性枚举待处理文件，边发现边入队"""
+        for f in timed_iter("scan", scan_from_args(args, input_dir, {".pdf"}, output_dir)):
+            target = mirror_output_dir(f, input_dir, output_dir)
+            # 过滤已处理的
+            if args.resume and has_result(target, result_name(f)):
+                sink.record(result_name(f), True, skipped=True)
+                file_done("skipped")
+                continue
+            yield Job(f, target)
+    
+    print(f"\n📚 开始流式处理 (异步并发: {MAX_CONCURRENT}, 预读队列: {args.backlog})")
     print(f"📁 输出到: {output_dir}\n")
     
     start_time = time.time()
     
-    # 创建 aiohttp session（连接池复用）
-    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT * 2, force_close=False)
-    timeout = aiohttp.ClientTimeout(total=3600)
+    try:
+        # 共享 aiohttp session（连接池复用）
+        async with open_session(MAX_CONCURRENT) as session:
+            engine = AsyncEngine(token, session, POLICY)
+            # 有界队列：固定数量的 worker 从队列取文件，完成一个记录一个
+            async for job in run_async(engine, iter_pending(), MAX_CONCURRENT, args.backlog,
+                                       print_progress):
+                sink.record(job.name, job.ok, skipped=job.skipped)
+                file_done("skipped" if job.skipped else "success" if job.ok else "failed")
+    finally:
+        summary = sink.close()
+        close_events()
+    
+    if summary["total"] == 0:
+        print("❌ 未找到 PDF 文件")
+        sys.exit(1)
     
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        client = MinerUClient(token, session)
-        
-        # 并发处理所有文件
-        tasks = [
-            client.process_file(f, output_dir, i, total)
-            for i, f in enumerate(pdf_files)
-        ]
-        results = await asyncio.gather(*tasks)
+    if summary["skipped"]:
+        print(f"⏭️  跳过已处理: {summary['skipped']} 个")
     
-    # 统计
-    success = sum(1 for ok, _ in results if ok)
-    failed = sum(1 for ok, _ in results if not ok)
-    failed_files = [name for ok, name in results if not ok]
+    if summary["success"] + summary["failed"] == 0:
+        print("✅ 所有文件已处理完成!")
+        return
     
     elapsed = time.time() - start_time
     print(f"\n{'='*50}")
-    print(f"✅ 成功: {success}")
-    print(f"❌ 失败: {failed}")
+    print(f"✅ 成功: {summary['success']}")
+    print(f"❌ 失败: {summary['failed']}")
     print(f"⏱️  耗时: {elapsed/60:.1f} 分钟")
-    print(f"🚀 速度: {total/elapsed*60:.1f} 文件/分钟")
+    print(f"🚀 速度: {summary['files_per_min']:.1f} 文件/分钟")
     
-    if failed_files:
-        print(f"\n失败文件:")
-        for f in failed_files:
-            print(f"  - {f}")
+    sink.print_failures()
     
     print(f"\n📁 结果: {output_dir}")
 
@@ -237,8 +168,31 @@ def main():
     parser.add_argument("--token")
     parser.add_argument("--workers", "-w", type=int, default=10, help="并发数")
     parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help=f"预读队列长度 (默认: {DEFAULT_BACKLOG})")
+    parser.add_argument("--results", help="逐个追加结果的 JSONL 文件 (旁边保留 .summary.json)")
+    add_scan_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
+    add_local_arguments(parser)
+    add_pages_arguments(parser)
     
     args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
+    setup_local(args)
+    setup_pages(args)
     
     global MAX_CONCURRENT
     MAX_CONCURRENT = args.workers
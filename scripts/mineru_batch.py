@@ -7,151 +7,92 @@ Usage:
 """
 
 import argparse
-import json
-import os
 import sys
 import time
-import zipfile
 from pathlib import Path
 from typing import Optional
 
-import requests
+from mineru_download import add_download_arguments, fetch_result, has_result, setup_download
+from mineru_engine import Engine, EngineSource, Policy, as_engine, batch_counts
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pipeline import chunked
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_tokens import TokenPool, add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace, span, traced_sleep
 
-API_BASE = "https://mineru.net/api/v4"
 DEFAULT_TIMEOUT = 1200
 DEFAULT_POLL_INTERVAL = 10
+UPLOAD_RETRIES = 3
 
 
-def get_token(args: argparse.Namespace) -> str:
-    """Get API token from args or environment."""
-    token = args.token or os.environ.get("MINERU_TOKEN")
+def get_token(args: argparse.Namespace) -> TokenPool:
+    """Get the API token(s) from args or environment."""
+    token = token_pool(args)
     if not token:
         raise ValueError("No API token provided. Set MINERU_TOKEN environment variable")
     return token
 
 
-def headers(token: str) -> dict:
-    """Return authorization headers."""
-    return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-        "Accept": "*/*",
-    }
-
-
-def create_batch_upload_urls(token: str, file_paths: list) -> tuple:
+def create_batch_upload_urls(engine: EngineSource, file_paths: list) -> tuple:
     """Get upload URLs for files. Returns (batch_id, [(file_path, upload_url), ...])."""
-    files = [{"name": Path(f).name, "data_id": Path(f).stem} for f in file_paths]
-    data = {"files": files, "model_version": "vlm", "enable_formula": True, "enable_table": True}
-
-    response = requests.post(
-        f"{API_BASE}/file-urls/batch",
-        headers=headers(token),
-        json=data,
-        timeout=60,
-    )
-    result = response.json()
-
-    if result.get("code") != 0:
-        raise Exception(f"Failed to get upload URLs: {result.get('msg', result)}")
-
-    batch_id = result["data"]["batch_id"]
-    upload_urls = result["data"]["file_urls"]
-
+    files = [(Path(f).name, Path(f).stem) for f in file_paths]
+    batch_id, upload_urls = as_engine(engine).create_upload_urls(files)
     return batch_id, list(zip(file_paths, upload_urls))
 
 
-def upload_file_with_retry(upload_url: str, file_path: str, max_retries: int = 3) -> bool:
+def upload_file_with_retry(engine: Engine, upload_url: str, file_path: str,
+                           max_retries: int = UPLOAD_RETRIES) -> bool:
     """Upload a file with retry logic."""
     for attempt in range(max_retries):
         try:
-            with open(file_path, "rb") as f:
-                response = requests.put(upload_url, data=f, timeout=600)
-            if response.status_code == 200:
-                return True
-            print(f"    上传失败 (状态码 {response.status_code}), 重试 {attempt+1}/{max_retries}")
+            engine.upload(upload_url, Path(file_path))
+            return True
         except Exception as e:
             print(f"    上传异常: {e}, 重试 {attempt+1}/{max_retries}")
-        time.sleep(5)
+        traced_sleep(5, "backoff")
     return False
 
 
-def get_batch_status(token: str, batch_id: str) -> list:
+def get_batch_status(engine: EngineSource, batch_id: str) -> list:
     """Get batch task status."""
-    response = requests.get(
-        f"{API_BASE}/extract-results/batch/{batch_id}",
-        headers=headers(token),
-        timeout=30,
-    )
-    result = response.json()
-
-    if result.get("code") != 0:
-        raise Exception(f"Failed to get batch status: {result.get('msg', result)}")
-
-    return result["data"]["extract_result"]
+    return as_engine(engine).batch_results(batch_id)
 
 
-def wait_for_batch(token: str, batch_id: str, total_files: int, poll_interval: int = 10, timeout: int = 1200, verbose: bool = True) -> list:
+def wait_for_batch(engine: EngineSource, batch_id: str, total_files: int, poll_interval: int = 10, timeout: int = 1200, verbose: bool = True) -> list:
     """Wait for batch to complete."""
-    start_time = time.time()
-
-    while True:
-        elapsed = time.time() - start_time
-        if elapsed > timeout:
-            raise TimeoutError(f"Batch timed out after {timeout} seconds")
-
-        results = get_batch_status(token, batch_id)
-
-        completed = sum(1 for r in results if r.get("state") == "done")
-        failed = sum(1 for r in results if r.get("state") == "failed")
-        running = sum(1 for r in results if r.get("state") == "running")
-        pending = total_files - completed - failed - running
 
-        if verbose:
-            print(f"    状态: ✅{completed} 🔄{running} ⏳{pending} ❌{failed}")
+    def show(results):
+        completed, running, pending, failed = batch_counts(results, total_files)
+        print(f"    状态: ✅{completed} 🔄{running} ⏳{pending} ❌{failed}")
 
-        if completed + failed == total_files:
-            return results
+    return as_engine(engine).wait_batch(batch_id, total_files, show if verbose else None,
+                                        poll_interval, timeout)
 
-        time.sleep(poll_interval)
 
-
-def download_result(url: str, output_dir: Path, filename: str) -> Optional[Path]:
-    """Download and extract result ZIP."""
+def download_result(engine: Engine, url: str, output_dir: Path, filename: str,
+                    source: Optional[dict] = None) -> Optional[Path]:
+    """Download and extract result ZIP (only record its URL with --defer-download)."""
     try:
-        zip_path = output_dir / f"{filename}.zip"
-
-        response = requests.get(url, stream=True, timeout=300)
-        response.raise_for_status()
-
-        with open(zip_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        extract_dir = output_dir / filename
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            zf.extractall(extract_dir)
-
-        zip_path.unlink()
-
-        # Rename full.md
-        md_file = extract_dir / "full.md"
-        if md_file.exists():
-            md_file.rename(extract_dir / f"{filename}.md")
-
-        return extract_dir
+        return fetch_result(url, output_dir, filename, source, session=engine.http)
     except Exception as e:
         print(f"    下载失败: {e}")
         return None
 
 
-def process_batch(token: str, file_paths: list, output_dir: Path, batch_num: int, total_batches: int, poll_interval: int = 10, timeout: int = 1200) -> tuple:
+def process_batch(engine: EngineSource, file_paths: list, output_dir: Path, batch_num: int, total_batches: Optional[int], poll_interval: int = 10, timeout: int = 1200) -> tuple:
     """Process a batch of files. Returns (success_count, failed_count, failed_files)."""
-    print(f"\n📦 批次 {batch_num}/{total_batches} ({len(file_paths)} 个文件)")
+    engine = as_engine(engine)
+    batch_tag = f"{batch_num}/{total_batches}" if total_batches else f"{batch_num}"
+    print(f"\n📦 批次 {batch_tag} ({len(file_paths)} 个文件)")
+    output_dir.mkdir(parents=True, exist_ok=True)
 
     # Get upload URLs
     print("  获取上传链接...")
-    batch_id, upload_pairs = create_batch_upload_urls(token, file_paths)
+    batch_id, upload_pairs = create_batch_upload_urls(engine, file_paths)
     print(f"  Batch ID: {batch_id}")
 
     # Upload files one by one
@@ -160,7 +101,7 @@ def process_batch(token: str, file_paths: list, output_dir: Path, batch_num: int
     for i, (file_path, upload_url) in enumerate(upload_pairs):
         filename = Path(file_path).name
         print(f"    [{i+1}/{len(file_paths)}] {filename}", end="")
-        if upload_file_with_retry(upload_url, file_path):
+        if upload_file_with_retry(engine, upload_url, file_path):
             print(" ✅")
         else:
             print(" ❌")
@@ -173,7 +114,7 @@ def process_batch(token: str, file_paths: list, output_dir: Path, batch_num: int
     # Wait for parsing
     print("  等待解析...")
     valid_files = len(file_paths) - len(failed_uploads)
-    results = wait_for_batch(token, batch_id, valid_files, poll_interval, timeout)
+    results = wait_for_batch(engine, batch_id, valid_files, poll_interval, timeout)
 
     # Download results
     print("  下载结果...")
@@ -187,7 +128,10 @@ def process_batch(token: str, file_paths: list, output_dir: Path, batch_num: int
 
         if state == "done":
             zip_url = result.get("full_zip_url")
-            extract_dir = download_result(zip_url, output_dir, filename)
+            source = {"batch_id": batch_id, "data_id": result.get("data_id"),
+                      "file_name": result.get("file_name"),
+                      "token_id": engine.tokens.owner(batch_id).id}
+            extract_dir = download_result(engine, zip_url, output_dir, filename, source)
             if extract_dir:
                 print(f"    ✅ {filename}")
                 success_count += 1
@@ -217,8 +161,24 @@ def main():
     parser.add_argument("--poll-interval", type=int, default=10)
     parser.add_argument("--timeout", type=int, default=1200)
     parser.add_argument("--resume", action="store_true", help="Skip already processed files")
+    add_scan_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
 
     args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
 
     # Get token
     try:
@@ -231,62 +191,69 @@ def main():
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Find PDF files
+    # Find PDF files - scanned lazily, batches are formed as files are discovered
     input_dir = Path(args.dir)
-    pdf_files = sorted(list(input_dir.glob("*.pdf")) + list(input_dir.glob("*.PDF")))
 
-    if not pdf_files:
-        print(f"No PDF files found in {args.dir}")
-        sys.exit(1)
-
-    print(f"📚 发现 {len(pdf_files)} 个 PDF 文件")
     print(f"📦 批次大小: {args.batch_size}")
     print(f"📁 输出目录: {output_dir}")
 
-    # Resume support: skip already processed files
-    if args.resume:
-        processed = set()
-        for d in output_dir.iterdir():
-            if d.is_dir():
-                processed.add(d.name)
-        pdf_files = [f for f in pdf_files if f.stem not in processed]
-        print(f"🔄 跳过已处理: {len(processed)} 个")
-        print(f"📝 待处理: {len(pdf_files)} 个")
-
-    if not pdf_files:
-        print("✅ 所有文件已处理完成!")
-        return
-
-    # Calculate batches
-    batch_size = args.batch_size
-    total_batches = (len(pdf_files) + batch_size - 1) // batch_size
-
-    # Process batches
+    skipped = 0
+
+    def iter_pending():
+        nonlocal skipped
+        for f in timed_iter("scan", scan_from_args(args, input_dir, {".pdf"}, output_dir)):
+            target = mirror_output_dir(f, input_dir, output_dir)
+            # Resume support: skip already processed files
+            if args.resume and has_result(target, f.stem):
+                skipped += 1
+                file_done("skipped")
+                continue
+            yield f, target
+
+    # Process batches (each batch shares one output directory)
     total_success = 0
     total_failed = 0
     all_failed_files = []
 
     start_time = time.time()
+    engine = Engine(token, Policy(timeout=args.timeout, poll_interval=args.poll_interval,
+                                  upload_timeout=600))
 
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min((batch_num + 1) * batch_size, len(pdf_files))
-        batch_files = pdf_files[start_idx:end_idx]
+    batches = chunked(iter_pending(), args.batch_size, key=lambda job: job[1])
+    for batch_num, batch in enumerate(batches, 1):
+        batch_files = [f for f, _ in batch]
+        target = batch[0][1]
 
         try:
-            success, failed, failed_names = process_batch(
-                token, [str(f) for f in batch_files],
-                output_dir, batch_num + 1, total_batches,
-                args.poll_interval, args.timeout
-            )
+            with span(f"batch {batch_num}", "item", files=len(batch_files)):
+                success, failed, failed_names = process_batch(
+                    engine, [str(f) for f in batch_files],
+                    target, batch_num, None,
+                    args.poll_interval, args.timeout
+                )
             total_success += success
             total_failed += failed
             all_failed_files.extend(failed_names)
+            file_done("success", success)
+            file_done("failed", failed)
         except Exception as e:
             print(f"  ❌ 批次处理失败: {e}")
             total_failed += len(batch_files)
+            file_done("failed", len(batch_files))
             all_failed_files.extend([f.name for f in batch_files])
 
+    close_events()
+
+    if args.resume:
+        print(f"🔄 跳过已处理: {skipped} 个")
+
+    if total_success + total_failed == 0:
+        if skipped:
+            print("✅ 所有文件已处理完成!")
+            return
+        print(f"No PDF files found in {args.dir}")
+        sys.exit(1)
+
     # Summary
     elapsed = time.time() - start_time
     print(f"\n{'='*50}")
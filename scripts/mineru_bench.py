@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+MinerU benchmark - end-to-end throughput of each engine against the mock API
+
+Starts `mineru_mock.py` on a free local port, generates a directory of dummy
+PDFs and runs every selected engine at every concurrency setting as a
+subprocess pointed at the mock (via MINERU_API_BASE). For each run it
+reports files/min, p50/p95/p99 time-to-result (upload-URL request to first
+ZIP byte served, measured by the mock), API request counts and the engine's
+peak RSS.
+
+Usage:
+    python mineru_bench.py --files 40 --concurrency 5,10
+    python mineru_bench.py --engines mineru_v2,mineru_async --parse-latency lognormal:1.5,0.5 \\
+        --fail-rate 0.05 --report bench.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import List, Optional
+
+from mineru_mock import add_mock_arguments, parse_size
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_ENGINES = "mineru_async,mineru_v2,mineru_parallel,mineru_batch"
+
+# engine -> argv builder (input dir, output dir, concurrency)
+ENGINES = {
+    "mineru_async": lambda i, o, c: ["--dir", i, "--output", o, "--workers", str(c)],
+    "mineru_v2": lambda i, o, c: ["--dir", i, "--output", o, "--workers", str(c)],
+    "mineru_parallel": lambda i, o, c: ["--dir", i, "--output", o, "--workers", str(c)],
+    "mineru_obsidian": lambda i, o, c: ["--dir", i, "--output", o, "--workers", str(c)],
+    "mineru_batch": lambda i, o, c: ["--dir", i, "--output", o, "--batch-size", str(c)],
+    "mineru_api": lambda i, o, c: ["--dir", i, "--output", o, "--batch-size", str(c)],
+    "mineru_stable": lambda i, o, c: ["--dir", i, "--output", o],
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http_json(url: str, method: str = "GET") -> dict:
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=10) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def make_inputs(directory: Path, count: int, size: int) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        body = b"%PDF-1.4\n" + os.urandom(max(0, size - 16)) + b"\n%%EOF\n"
+        (directory / f"bench_{i:05d}.pdf").write_bytes(body)
+
+
+def start_mock(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    cmd = [
+        sys.executable, str(SCRIPTS_DIR / "mineru_mock.py"), "--port", str(port),
+        "--queue-latency", args.queue_latency,
+        "--parse-latency", args.parse_latency,
+        "--result-size", args.result_size,
+        "--fail-rate", str(args.fail_rate),
+        "--error-rate", str(args.error_rate),
+        "--upload-error-rate", str(args.upload_error_rate),
+        "--download-delay", str(args.download_delay),
+        "--stall-rate", str(args.stall_rate),
+        "--stall-time", str(args.stall_time),
+        "--drop-rate", str(args.drop_rate),
+        "--url-ttl", str(args.url_ttl),
+    ]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            http_json(f"http://127.0.0.1:{port}/_mock/stats")
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("mock server did not start")
+
+
+def run_engine(engine: str, concurrency: int, input_dir: Path, work_dir: Path,
+               base: str, timeout: float) -> dict:
+    """Run one engine to completion. Returns wall time, exit code and peak RSS."""
+    output_dir = work_dir / f"{engine}_c{concurrency}"
+    log_path = work_dir / f"{engine}_c{concurrency}.log"
+    cmd = [sys.executable, str(SCRIPTS_DIR / f"{engine}.py")]
+    cmd += ENGINES[engine](str(input_dir), str(output_dir), concurrency)
+
+    env = dict(os.environ, MINERU_API_BASE=f"{base}/api/v4", MINERU_TOKEN="bench")
+    start = time.time()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        peak_rss = None
+        timed_out = False
+        if hasattr(os, "wait4"):
+            deadline = start + timeout
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid:
+                    proc.returncode = os.waitstatus_to_exitcode(status) if hasattr(
+                        os, "waitstatus_to_exitcode") else status >> 8
+                    # ru_maxrss is KiB on Linux, bytes on macOS
+                    scale = 1 if sys.platform == "darwin" else 1024
+                    peak_rss = usage.ru_maxrss * scale
+                    break
+                if time.time() > deadline:
+                    proc.kill()
+                    timed_out = True
+                    continue
+                time.sleep(0.05)
+        else:
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                timed_out = True
+    return {
+        "wall": time.time() - start,
+        "exit_code": proc.returncode,
+        "timed_out": timed_out,
+        "peak_rss": peak_rss,
+        "log": str(log_path),
+    }
+
+
+def summarize(engine: str, concurrency: int, run: dict, stats: dict) -> dict:
+    ttr = stats["time_to_result"]
+    wall = run["wall"]
+    return {
+        "engine": engine,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "files_done": stats["downloaded"],
+        "files_failed": stats["failed"],
+        "files_per_min": round(stats["downloaded"] / wall * 60, 2) if wall else 0.0,
+        "ttr_p50": percentile(ttr, 50),
+        "ttr_p95": percentile(ttr, 95),
+        "ttr_p99": percentile(ttr, 99),
+        "requests": stats["requests"],
+        "total_requests": stats["total_requests"],
+        "duplicate_downloads": stats["duplicate_downloads"],
+        "peak_rss_mb": round(run["peak_rss"] / 1024 ** 2, 1) if run["peak_rss"] else None,
+        "exit_code": run["exit_code"],
+        "timed_out": run["timed_out"],
+        "log": run["log"],
+    }
+
+
+def print_table(rows: List[dict]) -> None:
+    def fmt(v):
+        return "-" if v is None else f"{v:.2f}"
+
+    print(f"\n{'engine':<18}{'c':>4}{'files/min':>11}{'done':>6}{'fail':>6}"
+          f"{'p50':>8}{'p95':>8}{'p99':>8}{'reqs':>7}{'RSS MB':>8}")
+    print("-" * 84)
+    for r in rows:
+        rss = "-" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.1f}"
+        flag = " (timeout)" if r["timed_out"] else ""
+        print(f"{r['engine']:<18}{r['concurrency']:>4}{r['files_per_min']:>11.1f}"
+              f"{r['files_done']:>6}{r['files_failed']:>6}{fmt(r['ttr_p50']):>8}"
+              f"{fmt(r['ttr_p95']):>8}{fmt(r['ttr_p99']):>8}{r['total_requests']:>7}{rss:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MinerU engines against the offline mock API")
+    parser.add_argument("--engines", default=DEFAULT_ENGINES,
+                        help=f"Comma-separated engines (default: {DEFAULT_ENGINES}; "
+                             f"available: {','.join(ENGINES)})")
+    parser.add_argument("--concurrency", default="5",
+                        help="Comma-separated concurrency settings (default: 5)")
+    parser.add_argument("--files", type=int, default=20, help="Number of input files (default: 20)")
+    parser.add_argument("--input-size", default="64k", help="Size of each dummy PDF (default: 64k)")
+    parser.add_argument("--timeout", type=float, default=1800, help="Per-run timeout in seconds")
+    parser.add_argument("--report", help="Write the full results as JSON to this path")
+    parser.add_argument("--keep", action="store_true", help="Keep the work directory (outputs + logs)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    work_dir = Path(tempfile.mkdtemp(prefix="mineru_bench_"))
+    input_dir = work_dir / "input"
+    make_inputs(input_dir, args.files, parse_size(args.input_size))
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    mock = start_mock(port, args)
+    print(f"🧪 Mock API: {base}/api/v4  ({args.files} 个文件, 工作目录: {work_dir})")
+
+    rows = []
+    try:
+        for engine in engines:
+            for concurrency in levels:
+                http_json(f"{base}/_mock/reset", method="POST")
+                print(f"▶️  {engine} (c={concurrency}) ...", flush=True)
+                run = run_engine(engine, concurrency, input_dir, work_dir, base, args.timeout)
+                stats = http_json(f"{base}/_mock/stats")
+                row = summarize(engine, concurrency, run, stats)
+                rows.append(row)
+                print(f"   {row['files_per_min']:.1f} 文件/分钟, p95 {row['ttr_p95'] or 0:.1f}s, "
+                      f"{row['total_requests']} 请求")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print_table(rows)
+
+    if args.report:
+        report = {"config": vars(args), "results": rows, "time": time.time()}
+        Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n📝 报告: {args.report}")
+
+    if args.keep:
+        print(f"📁 工作目录: {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+MinerU client library - parse documents and get each result as it finishes
+
+`MinerU.parse()` is an async iterator. Each input runs through a bounded
+worker pool (upload or URL task, poll, download, extract), and a
+`ParseResult` is yielded as soon as that document is done, in completion
+order. Downstream work such as indexing can start on the first document
+while the rest are still parsing. `parse()` is the same thing as a plain
+generator for synchronous code.
+
+    from mineru_client import MinerU, parse
+
+    async with MinerU(output="./parsed", concurrency=10) as client:
+        async for result in client.parse(["a.pdf", "https://x.org/b.pdf"], is_ocr=True):
+            if result.ok:
+                index(result.name, result.markdown())
+            else:
+                log(result.source, result.error)
+
+    for result in parse(Path("./pdfs").glob("*.pdf"), output="./parsed"):
+        print(result.name, result.ok, result.timings)
+
+Inputs are local paths or http(s) URLs. They are read lazily, so a
+generator over millions of files is fine. Keyword options such as
+model_version, is_ocr, enable_formula, enable_table, language or
+page_ranges are passed to the API. Results land in the configured output
+backend: a folder per document by default, or `--archive` / `--store` /
+`--image-store` when mineru_download has been set up for those.
+"""
+
+import os
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+
+import aiohttp
+from mineru_engine import (
+    JOB_RETRIES,
+    AsyncEngine,
+    Job,
+    Policy,
+    iterate_in_thread,
+    open_session,
+    run_async,
+)
+from mineru_metrics import file_done
+from mineru_pipeline import DEFAULT_BACKLOG
+from mineru_tokens import TokenSource, as_pool
+
+DEFAULT_CONCURRENCY = 5
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_TIMEOUT = 600
+
+Source = Union[str, Path]
+
+# Results are engine jobs: source, name, ok, output, error, timings, skipped, job_id,
+# plus markdown() / images / read() / to_dict().
+ParseResult = Job
+
+
+class MinerU:
+    """Async MinerU client; use as `async with MinerU(...) as client`."""
+
+    def __init__(self, token: Optional[TokenSource] = None, output: Source = "./output",
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, timeout: float = DEFAULT_TIMEOUT,
+                 session: Optional[aiohttp.ClientSession] = None):
+        token = token or os.environ.get("MINERU_TOKEN")
+        if not token:
+            raise ValueError("No API token provided. Set MINERU_TOKEN or pass token=")
+        self.tokens = as_pool(token)  # one token, "a,b", a list or a TokenPool
+        self.output = Path(output)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.session = session
+        self._own_session = session is None
+
+    async def __aenter__(self) -> "MinerU":
+        if self.session is None:
+            self.session = open_session(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def parse(self, inputs: Iterable[Source], skip_existing: bool = False,
+                    backlog: int = DEFAULT_BACKLOG, **options) -> AsyncIterator[ParseResult]:
+        """Yield a ParseResult for every input as soon as it is finished (or has failed)."""
+        if self.session is None:
+            raise RuntimeError("use `async with MinerU(...) as client`")
+        policy = Policy(retries=JOB_RETRIES, poll_interval=self.poll_interval,
+                        timeout=self.timeout, skip_existing=skip_existing)
+        engine = AsyncEngine(self.tokens, self.session, policy)
+        self.output.mkdir(parents=True, exist_ok=True)
+        jobs = (Job(source, self.output, options=options) for source in inputs)
+        async for job in run_async(engine, jobs, self.concurrency, backlog):
+            file_done("skipped" if job.skipped else "success" if job.ok else "failed")
+            yield job
+
+
+def parse(inputs: Iterable[Source], token: Optional[TokenSource] = None, output: Source = "./output",
+          concurrency: int = DEFAULT_CONCURRENCY, poll_interval: float = DEFAULT_POLL_INTERVAL,
+          timeout: float = DEFAULT_TIMEOUT, skip_existing: bool = False,
+          **options) -> Iterator[ParseResult]:
+    """Synchronous wrapper around `MinerU.parse`: a generator yielding results as they finish.
+
+    The event loop runs in a background thread; closing the generator early
+    cancels the documents still in flight.
+    """
+    client = MinerU(token, output, concurrency, poll_interval, timeout)
+
+    async def results():
+        async with client:
+            async for result in client.parse(inputs, skip_existing, **options):
+                yield result
+
+    return iterate_in_thread(results)
@@ -0,0 +1,813 @@
+#!/usr/bin/env python3
+"""
+MinerU result download - resumable, segmented ZIP fetching for requests and aiohttp
+
+Result ZIPs are written to `<name>.zip.part` next to the destination, with
+the server's validators (ETag / Last-Modified, Content-Length) kept in
+`<name>.zip.part.json`. A dropped connection or read stall is retried with
+`Range: bytes=<have>-` plus `If-Range`, so only the missing bytes are
+fetched again; a server that answers 200 instead of 206 (validator changed,
+or no range support) restarts the file from zero. The finished file is
+length-checked and its ZIP central directory verified before it is renamed
+into place, so callers never extract a truncated archive.
+
+Large archives (image-heavy documents run to hundreds of MB) are fetched
+over several connections: when the first response advertises
+`Accept-Ranges: bytes` and a length of at least `--segment-threshold`, the
+`.part` file is preallocated and split into `--download-connections` byte
+ranges. The first response keeps streaming segment 0; the others are
+separate ranged requests. Per-segment progress is recorded in the sidecar,
+so a retry resumes each unfinished segment where it stopped.
+
+`fetch_result` / `async_fetch_result` add extraction on top (with
+`--archive` the verified ZIP is kept and indexed instead, see mineru_archive;
+with `--store` its files go into one SQLite database, see mineru_store); with
+`--defer-download` they only record the URL in the run ledger
+(see mineru_ledger), and running this module fetches what is pending:
+
+    python mineru_download.py ./output/mineru-pending.jsonl --workers 32
+
+An expired presigned URL (403/404/410) is refreshed by re-reading the
+batch or task status, and the download resumes from the existing `.part`.
+
+Usage:
+    nbytes = download_zip(zip_url, output_dir / "doc.zip")
+    nbytes = await async_download_zip(session, zip_url, output_dir / "doc.zip")
+    extract_dir = fetch_result(zip_url, output_dir, "doc", {"batch_id": batch_id})
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+import requests
+from mineru_archive import (
+    KEEP_KINDS,
+    add_to_index,
+    archive_path,
+    is_indexed,
+    keep_kinds,
+    rebuild_index,
+    unpack,
+)
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, async_hedged, hedged, setup_hedge
+from mineru_images import DEFAULT_IMAGE_DIR, IMAGES, LINK_MODES
+from mineru_ledger import DEFAULT_LEDGER, LEDGER, Ledger, read_pending
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed, timed_iter
+from mineru_pipeline import DEFAULT_BACKLOG, ResultSink, async_pipeline, progress_tag
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_store import DEFAULT_STORE, STORE
+from mineru_tokens import TokenPool, add_token_arguments, token_pool
+from mineru_trace import (
+    add_trace_arguments,
+    aiohttp_trace_configs,
+    async_traced_sleep,
+    setup_trace,
+    traced_sleep,
+)
+
+API_BASE = os.environ.get("MINERU_API_BASE", "https://mineru.net/api/v4")
+
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_RETRIES = 5
+CONNECT_TIMEOUT = 30
+READ_TIMEOUT = 120
+DEFAULT_CONNECTIONS = 4
+DEFAULT_SEGMENT_THRESHOLD_MB = 32.0
+DEFAULT_WORKERS = 32
+URL_EXPIRED_STATUS = (403, 404, 410)
+URL_REFRESHES = 2
+
+_received_lock = threading.Lock()  # segment threads add to one byte counter
+
+
+class IncompleteDownload(Exception):
+    """The transfer ended early; the partial file is kept for the next attempt."""
+
+
+class StalePartial(IncompleteDownload):
+    """The partial file no longer matches the server copy and is discarded."""
+
+
+class UrlExpired(IncompleteDownload):
+    """The presigned URL was refused; the partial file is kept for a fresh URL."""
+
+
+class DownloadOptions:
+    def __init__(self):
+        self.connections = DEFAULT_CONNECTIONS
+        self.threshold = int(DEFAULT_SEGMENT_THRESHOLD_MB * 2**20)
+        self.keep: Optional[Set[str]] = None  # member kinds to extract; None = all
+        self.referenced_images = False
+        self.archive = False  # keep <name>.zip instead of unpacking
+        # (output dir, name) whose existing result is outdated until a new one replaces it
+        self.replacing: Set[Tuple[str, str]] = set()
+
+
+OPTIONS = DownloadOptions()
+
+
+def part_paths(dest: Path) -> Tuple[Path, Path]:
+    return dest.with_name(dest.name + ".part"), dest.with_name(dest.name + ".part.json")
+
+
+def check_zip(path: Path) -> None:
+    """Verify the central directory and that every member lies inside the file.
+
+    This catches truncated or corrupted transfers without decompressing;
+    member CRCs are still verified during extraction.
+    """
+    size = path.stat().st_size
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if info.header_offset + info.compress_size > size:
+                raise zipfile.BadZipFile(f"{info.filename} extends past end of file")
+
+
+def _load_meta(meta_path: Path) -> dict:
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(meta_path: Path, meta: dict) -> None:
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _save_meta(meta_path: Path, headers) -> dict:
+    length = headers.get("Content-Length")
+    meta = {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        # Content-Encoding means the byte count on disk will differ from the header
+        "length": int(length) if length and not headers.get("Content-Encoding") else None,
+    }
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def _discard(dest: Path) -> None:
+    for path in part_paths(dest):
+        if path.exists():
+            path.unlink()
+
+
+def _validator(meta: dict) -> Optional[str]:
+    return meta.get("etag") or meta.get("last_modified")
+
+
+def _resume_headers(dest: Path) -> Tuple[int, dict, dict]:
+    """Return (offset, request headers, saved meta) for the next attempt."""
+    part, meta_path = part_paths(dest)
+    meta = _load_meta(meta_path)
+    offset = part.stat().st_size if part.exists() and meta else 0
+    headers = {}
+    if offset and not meta.get("segments"):
+        headers["Range"] = f"bytes={offset}-"
+        validator = _validator(meta)
+        if validator:
+            headers["If-Range"] = validator
+    return offset, headers, meta
+
+
+def _content_range(headers) -> Tuple[int, Optional[int]]:
+    """(first byte, total or None if `*`) from a Content-Range header."""
+    content_range = headers.get("Content-Range", "")
+    try:
+        span, total = content_range.split(" ", 1)[1].split("/")
+        return int(span.split("-")[0]), None if total == "*" else int(total)
+    except (IndexError, ValueError):
+        raise StalePartial(f"bad Content-Range: {content_range!r}")
+
+
+def _accept_partial(status: int, headers, offset: int, meta: dict) -> bool:
+    """True if a response continues the partial file, False if it replaces it."""
+    if status != 206 or not offset:
+        return False
+    start, total = _content_range(headers)
+    etag = headers.get("ETag")
+    if (start != offset
+            or (meta.get("length") and total is not None and total != meta["length"])
+            or (etag and meta.get("etag") and etag != meta["etag"])):
+        raise StalePartial("server copy changed")
+    return True
+
+
+def _finish(dest: Path, meta: dict) -> None:
+    part, meta_path = part_paths(dest)
+    if _pending(meta.get("segments") or []):
+        raise IncompleteDownload("segments incomplete")
+    size = part.stat().st_size
+    if meta.get("length") is not None and size != meta["length"]:
+        raise IncompleteDownload(f"got {size} of {meta['length']} bytes")
+    check_zip(part)
+    os.replace(part, dest)
+    meta_path.unlink()
+
+
+def _check_expired(status: int) -> None:
+    # Presigned object-store URLs answer 403 (or 404/410) once they expire
+    if status in URL_EXPIRED_STATUS:
+        raise UrlExpired(f"HTTP {status}")
+
+
+def _retry_or_raise(dest: Path, attempt: int, retries: int, error: Exception) -> float:
+    if isinstance(error, (StalePartial, zipfile.BadZipFile)):
+        _discard(dest)
+    if attempt >= retries - 1 or isinstance(error, UrlExpired):
+        raise error
+    return min(2 ** attempt, 30)
+
+
+def _http(session):
+    """What to call `get` on in this thread: `session()` for a per-thread session
+    factory (e.g. `Engine.http`), else `session` itself or the `requests` module."""
+    if callable(session):
+        return session()
+    return session or requests
+
+
+# ============ Segments ============
+# A segment is [start, end (inclusive), bytes written]; lists so progress can
+# be updated in place and round-trip through the JSON sidecar.
+
+def _start_segments(part: Path, meta_path: Path, meta: dict, headers) -> bool:
+    """Split a fresh download into ranges if it is large and the server allows it."""
+    length = meta.get("length")
+    if (OPTIONS.connections < 2 or length is None or length < OPTIONS.threshold
+            or headers.get("Accept-Ranges", "").lower() != "bytes"):
+        return False
+    size = -(-length // OPTIONS.connections)
+    meta["segments"] = [[start, min(start + size, length) - 1, 0] for start in range(0, length, size)]
+    with open(part, "wb") as f:
+        try:
+            os.posix_fallocate(f.fileno(), 0, length)
+        except (AttributeError, OSError):
+            f.truncate(length)  # sparse file where fallocate is unavailable
+    _write_meta(meta_path, meta)
+    return True
+
+
+def _pending(segments: List[list]) -> List[list]:
+    return [seg for seg in segments if seg[0] + seg[2] <= seg[1]]
+
+
+def _segment_headers(seg: list, meta: dict) -> dict:
+    headers = {"Range": f"bytes={seg[0] + seg[2]}-{seg[1]}"}
+    validator = _validator(meta)
+    if validator:
+        headers["If-Range"] = validator
+    return headers
+
+
+def _check_segment(status: int, headers, seg: list, meta: dict) -> None:
+    # 200 means the validator no longer matches (or ranges stopped working)
+    if status != 206:
+        raise StalePartial(f"segment request answered {status}")
+    start, total = _content_range(headers)
+    if start != seg[0] + seg[2] or (total is not None and total != meta["length"]):
+        raise StalePartial("server copy changed")
+
+
+def _write_segment(f, seg: list, chunk: bytes, received: List[int]) -> bool:
+    """Write `chunk` into the segment (clipped at its end); True once it is full."""
+    remaining = seg[1] + 1 - seg[0] - seg[2]
+    chunk = chunk[:remaining]
+    f.write(chunk)
+    seg[2] += len(chunk)
+    with _received_lock:
+        received[0] += len(chunk)
+    return len(chunk) == remaining
+
+
+def _segment_sync(session, url: str, part: Path, seg: list, meta: dict, timeout,
+                  received: List[int], resp=None) -> None:
+    if resp is None:
+        resp = _http(session).get(url, headers=_segment_headers(seg, meta), stream=True,
+                                  timeout=timeout)
+        _check_expired(resp.status_code)
+        resp.raise_for_status()
+        _check_segment(resp.status_code, resp.headers, seg, meta)
+    with resp, open(part, "r+b") as f:
+        f.seek(seg[0] + seg[2])
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if _write_segment(f, seg, chunk, received):
+                return
+    raise IncompleteDownload(f"segment {seg[0]}-{seg[1]} ended early")
+
+
+def _segments_sync(session, url: str, part: Path, meta_path: Path, meta: dict, timeout,
+                   received: List[int], first=None) -> None:
+    segments = meta["segments"]
+    todo = _pending(segments)
+    if not todo:
+        return  # all written before a crash: only _finish is left
+    try:
+        with ThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="segment") as pool:
+            futures = [
+                pool.submit(_segment_sync, session, url, part, seg, meta, timeout, received,
+                            first if seg is segments[0] else None)
+                for seg in todo
+            ]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+    finally:
+        _write_meta(meta_path, meta)
+    if errors:
+        raise errors[0]
+
+
+async def _segment_async(session, url: str, part: Path, seg: list, meta: dict, timeout,
+                         received: List[int], resp=None) -> None:
+    if resp is None:
+        resp = await session.get(url, headers=_segment_headers(seg, meta), timeout=timeout)
+        try:
+            _check_expired(resp.status)
+            resp.raise_for_status()
+            _check_segment(resp.status, resp.headers, seg, meta)
+        except Exception:
+            resp.release()
+            raise
+    async with resp:
+        with open(part, "r+b") as f:
+            f.seek(seg[0] + seg[2])
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                if _write_segment(f, seg, chunk, received):
+                    return
+    raise IncompleteDownload(f"segment {seg[0]}-{seg[1]} ended early")
+
+
+async def _segments_async(url: str, part: Path, meta_path: Path, meta: dict, timeout,
+                          received: List[int], first=None) -> None:
+    import aiohttp
+
+    segments = meta["segments"]
+    try:
+        # A private session: segment requests must not wait on the caller's
+        # connection limit while `first` is holding one of its slots
+        async with aiohttp.ClientSession(trace_configs=aiohttp_trace_configs()) as session:
+            outcomes = await asyncio.gather(*(
+                _segment_async(session, url, part, seg, meta, timeout, received,
+                               first if seg is segments[0] else None)
+                for seg in _pending(segments)
+            ), return_exceptions=True)
+    finally:
+        _write_meta(meta_path, meta)
+    errors = [o for o in outcomes if isinstance(o, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+# ============ Public API ============
+
+def download_zip(
+    url: str,
+    dest: Path,
+    session=None,
+    retries: int = DOWNLOAD_RETRIES,
+    timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+) -> int:
+    """Download `url` to `dest`, resuming partial transfers. Returns bytes fetched.
+
+    `session` may be a `requests.Session` (or anything with its `get`), or a
+    function returning the calling thread's session such as `Engine.http`, so
+    segment threads each use their own; defaults to the `requests` module.
+    """
+    http = _http(session)
+    dest = Path(dest)
+    part, meta_path = part_paths(dest)
+    received = [0]  # bytes over the wire, across attempts and segment threads
+    for attempt in range(retries):
+        try:
+            offset, headers, meta = _resume_headers(dest)
+            if meta.get("segments"):
+                _segments_sync(session, url, part, meta_path, meta, timeout, received)
+                _finish(dest, meta)
+                return received[0]
+            resp = hedged(
+                "download", lambda: http.get(url, headers=headers, stream=True, timeout=timeout)
+            )
+            with resp:
+                if resp.status_code == 416 and offset and offset == meta.get("length"):
+                    _finish(dest, meta)  # already complete
+                    return received[0]
+                _check_expired(resp.status_code)
+                resp.raise_for_status()
+                partial = _accept_partial(resp.status_code, resp.headers, offset, meta)
+                if not partial:
+                    meta = _save_meta(meta_path, resp.headers)
+                if not partial and _start_segments(part, meta_path, meta, resp.headers):
+                    _segments_sync(session, url, part, meta_path, meta, timeout, received,
+                                   first=resp)
+                else:
+                    with open(part, "ab" if partial else "wb") as f:
+                        for chunk in resp.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            received[0] += len(chunk)
+            _finish(dest, meta)
+            return received[0]
+        except (requests.RequestException, OSError, IncompleteDownload, zipfile.BadZipFile) as e:
+            traced_sleep(_retry_or_raise(dest, attempt, retries, e), "backoff")
+    raise IncompleteDownload(url)
+
+
+async def async_download_zip(
+    session,
+    url: str,
+    dest: Path,
+    retries: int = DOWNLOAD_RETRIES,
+    read_timeout: float = READ_TIMEOUT,
+) -> int:
+    """aiohttp counterpart of `download_zip`. Returns bytes fetched."""
+    import aiohttp
+
+    dest = Path(dest)
+    part, meta_path = part_paths(dest)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT, sock_read=read_timeout)
+    received = [0]  # bytes over the wire, across attempts and segment threads
+    for attempt in range(retries):
+        try:
+            offset, headers, meta = _resume_headers(dest)
+            if meta.get("segments"):
+                await _segments_async(url, part, meta_path, meta, timeout, received)
+                _finish(dest, meta)
+                return received[0]
+            resp = await async_hedged(
+                "download", lambda: session.get(url, headers=headers, timeout=timeout)
+            )
+            async with resp:
+                if resp.status == 416 and offset and offset == meta.get("length"):
+                    _finish(dest, meta)
+                    return received[0]
+                _check_expired(resp.status)
+                resp.raise_for_status()
+                partial = _accept_partial(resp.status, resp.headers, offset, meta)
+                if not partial:
+                    meta = _save_meta(meta_path, resp.headers)
+                if not partial and _start_segments(part, meta_path, meta, resp.headers):
+                    await _segments_async(url, part, meta_path, meta, timeout, received, first=resp)
+                else:
+                    with open(part, "ab" if partial else "wb") as f:
+                        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                            f.write(chunk)
+                            received[0] += len(chunk)
+            _finish(dest, meta)
+            return received[0]
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, IncompleteDownload,
+                zipfile.BadZipFile) as e:
+            await async_traced_sleep(_retry_or_raise(dest, attempt, retries, e), "backoff")
+    raise IncompleteDownload(url)
+
+
+def extract_result(zip_path: Path, extract_dir: Path, name: str) -> Path:
+    """Unpack a result ZIP into `extract_dir`, delete it and rename full.md to `<name>.md`.
+
+    The ZIP is unpacked into a sibling folder that then replaces `extract_dir`
+    as a whole, so an earlier result there stays intact until the new one is
+    complete and no stale files of it are left behind.
+    """
+    tmp = extract_dir.with_name(extract_dir.name + ".extracting")
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        with timed("extract") as t, zipfile.ZipFile(zip_path) as zf:
+            extract = IMAGES.unpack if IMAGES.enabled else unpack
+            t.bytes = extract(zf, tmp, name, OPTIONS.keep, OPTIONS.referenced_images)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if extract_dir.is_dir():
+        shutil.rmtree(extract_dir)  # --defer-download placeholder or the replaced result
+    tmp.rename(extract_dir)
+    zip_path.unlink()
+    return extract_dir
+
+
+def _drop_placeholder(output_dir: Path, name: str) -> None:
+    try:
+        (output_dir / name).rmdir()  # empty placeholder left by --defer-download
+    except OSError:
+        pass
+
+
+def keep_archive(zip_path: Path, output_dir: Path, name: str) -> Path:
+    """--archive: index the verified ZIP in place instead of unpacking it."""
+    _drop_placeholder(output_dir, name)
+    add_to_index(zip_path, name)
+    return zip_path
+
+
+def store_result(zip_path: Path, output_dir: Path, name: str) -> Path:
+    """--store: copy the selected members into the result database and delete the ZIP."""
+    with timed("extract") as t:
+        t.bytes = STORE.store.add_zip(STORE.store.key_for(output_dir, name), zip_path, name,
+                                      OPTIONS.keep, OPTIONS.referenced_images)
+    zip_path.unlink()
+    _drop_placeholder(output_dir, name)
+    return output_dir / name
+
+
+def finish_result(zip_path: Path, output_dir: Path, name: str) -> Path:
+    """Hand a downloaded ZIP to the active output backend: archive, store or folder.
+
+    Each backend replaces an earlier result of `name` in one step.
+    """
+    if OPTIONS.archive:
+        result = keep_archive(zip_path, output_dir, name)
+    else:
+        try:
+            if STORE.enabled:
+                result = store_result(zip_path, output_dir, name)
+            else:
+                result = extract_result(zip_path, output_dir / name, name)
+        except BaseException:
+            zip_path.unlink(missing_ok=True)  # not a result outside --archive
+            raise
+    OPTIONS.replacing.discard((str(output_dir), name))
+    return result
+
+
+def replace_result(output_dir: Path, name: str) -> None:
+    """Treat the existing result of `name` as outdated: `has_result` ignores it,
+    so the job runs, and the new result replaces it once it is downloaded."""
+    OPTIONS.replacing.add((str(output_dir), name))
+
+
+def has_result(output_dir: Path, name: str) -> bool:
+    """True if `name` was already handled: extracted folder, kept archive or stored rows.
+
+    A `<name>.zip` only counts with --archive, and once it is indexed: outside
+    archive mode it is a download that was never extracted.
+    """
+    if (str(output_dir), name) in OPTIONS.replacing:
+        return False
+    if (output_dir / name).exists():
+        return True
+    if OPTIONS.archive:
+        return archive_path(output_dir, name).exists() and is_indexed(output_dir, name)
+    return STORE.enabled and STORE.has(output_dir, name)
+
+
+def remove_result(output_dir: Path, name: str) -> bool:
+    """Delete what `has_result` finds for `name` (folder, indexed archive, stored rows)."""
+    removed = False
+    folder = output_dir / name
+    if folder.is_dir():
+        shutil.rmtree(folder)
+        removed = True
+    archive = archive_path(output_dir, name)
+    if archive.exists():
+        archive.unlink()
+        rebuild_index(output_dir)
+        removed = True
+    if STORE.enabled and STORE.remove(output_dir, name):
+        removed = True
+    return removed
+
+
+def _defer(url: str, output_dir: Path, name: str, source: Optional[dict]) -> Path:
+    extract_dir = output_dir / name
+    extract_dir.mkdir(parents=True, exist_ok=True)  # so --resume skips it
+    LEDGER.record(extract_dir, name, url, source)
+    OPTIONS.replacing.discard((str(output_dir), name))  # replaced when the ledger is fetched
+    return extract_dir
+
+
+def fetch_result(url: str, output_dir: Path, name: str, source: Optional[dict] = None,
+                 session=None) -> Path:
+    """Download and unpack a result into `output_dir/name` (or record it with --defer-download).
+
+    With --archive the verified `output_dir/name.zip` is kept and indexed
+    instead (see mineru_archive) and its path returned; with --store the files
+    go into the result database (see mineru_store).
+
+    `source` names the batch (`batch_id` + `data_id`/`file_name`) or URL task
+    (`task_id`) the result belongs to, for refreshing the URL later.
+    """
+    if LEDGER.enabled:
+        return _defer(url, output_dir, name, source)
+    zip_path = output_dir / f"{name}.zip"
+    with timed("download") as t:
+        t.bytes = download_zip(url, zip_path, session)
+    return finish_result(zip_path, output_dir, name)
+
+
+async def async_fetch_result(session, url: str, output_dir: Path, name: str,
+                             source: Optional[dict] = None) -> Path:
+    """aiohttp counterpart of `fetch_result`."""
+    if LEDGER.enabled:
+        return _defer(url, output_dir, name, source)
+    zip_path = output_dir / f"{name}.zip"
+    with timed("download") as t:
+        t.bytes = await async_download_zip(session, url, zip_path)
+    return finish_result(zip_path, output_dir, name)
+
+
+def add_download_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--download-connections", type=int, default=DEFAULT_CONNECTIONS,
+                        metavar="N",
+                        help=f"Parallel ranged connections for large result archives "
+                             f"(default: {DEFAULT_CONNECTIONS}, 1 = single stream)")
+    parser.add_argument("--segment-threshold", type=float, default=DEFAULT_SEGMENT_THRESHOLD_MB,
+                        metavar="MB",
+                        help=f"Minimum archive size for segmented download "
+                             f"(default: {DEFAULT_SEGMENT_THRESHOLD_MB:g} MB)")
+    parser.add_argument("--keep", type=keep_kinds, metavar="KINDS",
+                        help=f"Only extract these result files, comma-separated from "
+                             f"{','.join(KEEP_KINDS)} (e.g. md,images; default: all)")
+    parser.add_argument("--referenced-images", action="store_true",
+                        help="Skip images not referenced by the Markdown or content list")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--archive", action="store_true",
+                         help="Keep each result as its verified <name>.zip instead of extracting "
+                              "it; read members with mineru_archive.py")
+    backend.add_argument("--store", nargs="?", const="", metavar="DB",
+                         help=f"Write results into one SQLite file instead of a folder per "
+                              f"document (default: <output>/{DEFAULT_STORE}); "
+                              f"read with mineru_store.py")
+    backend.add_argument("--image-store", nargs="?", const="", metavar="DIR",
+                         help=f"Store extracted images once by content hash in a shared folder "
+                              f"(default: <output>/{DEFAULT_IMAGE_DIR})")
+    parser.add_argument("--image-links", choices=LINK_MODES, default="rewrite",
+                        help="With --image-store: rewrite Markdown image links to the shared "
+                             "copies (default) or keep images/ as hardlinks to them")
+
+
+def setup_download(args: argparse.Namespace) -> None:
+    OPTIONS.connections = max(1, getattr(args, "download_connections", DEFAULT_CONNECTIONS))
+    OPTIONS.threshold = int(getattr(args, "segment_threshold", DEFAULT_SEGMENT_THRESHOLD_MB) * 2**20)
+    OPTIONS.keep = getattr(args, "keep", None)
+    OPTIONS.referenced_images = getattr(args, "referenced_images", False)
+    OPTIONS.archive = getattr(args, "archive", False)
+    store = getattr(args, "store", None)
+    if store is not None:
+        if not store and not getattr(args, "output", None):
+            raise SystemExit("--store needs a database path")
+        STORE.enable(Path(store or Path(args.output) / DEFAULT_STORE))
+    image_store = getattr(args, "image_store", None)
+    if image_store is not None:
+        if not image_store and not getattr(args, "output", None):
+            raise SystemExit("--image-store needs a directory")
+        IMAGES.enable(Path(image_store or Path(args.output) / DEFAULT_IMAGE_DIR),
+                      getattr(args, "image_links", "rewrite"))
+
+
+# ============ Deferred download command ============
+
+def _headers(token: str) -> dict:
+    return {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+
+
+def _same_file(result: dict, entry: dict) -> bool:
+    if entry.get("data_id"):
+        return result.get("data_id") == entry["data_id"]
+    return bool(entry.get("file_name")) and result.get("file_name") == entry["file_name"]
+
+
+async def refresh_url(session, tokens: TokenPool, entry: dict) -> str:
+    """Re-read the status of a ledger entry's batch or task for a fresh `full_zip_url`,
+    with the token that created it when the pool has it."""
+    token = (tokens.get(entry.get("token_id")) or tokens.states[0]).token
+    if entry.get("task_id"):
+        url = f"{API_BASE}/extract/task/{entry['task_id']}"
+    else:
+        url = f"{API_BASE}/extract-results/batch/{entry['batch_id']}"
+    async with session.get(url, headers=_headers(token)) as resp:
+        result = await resp.json()
+    if result.get("code") != 0:
+        raise Exception(f"API error: {result.get('msg')}")
+    data = result["data"]
+    if not entry.get("task_id"):
+        results = data.get("extract_result") or []
+        data = next((r for r in results if _same_file(r, entry)),
+                    results[0] if len(results) == 1 else None)
+        if data is None:
+            raise Exception("批次中找不到该文件")
+    if data.get("state") != "done" or not data.get("full_zip_url"):
+        raise Exception(f"结果不可用: {data.get('state')}")
+    return data["full_zip_url"]
+
+
+async def download_entry(session, tokens: Optional[TokenPool], entry: dict, root: Path) -> Path:
+    """Fetch one ledger entry into output root `root`, refreshing its URL when the
+    old one has expired."""
+    extract_dir = root / entry["key"]  # an absolute key (older ledgers) ignores `root`
+    url = entry["zip_url"]
+    for refresh in range(URL_REFRESHES + 1):
+        try:
+            return await async_fetch_result(session, url, extract_dir.parent, entry["name"])
+        except UrlExpired:
+            if refresh == URL_REFRESHES or not tokens:
+                raise
+            url = await refresh_url(session, tokens, entry)
+
+
+async def main_async(args):
+    import aiohttp
+
+    tokens = token_pool(args)
+    ledgers = [Path(p) / DEFAULT_LEDGER if Path(p).is_dir() else Path(p) for p in args.ledger]
+    missing = [str(p) for p in ledgers if not p.exists()]
+    if missing:
+        print(f"❌ 找不到账本: {', '.join(missing)}")
+        sys.exit(1)
+
+    writers = {path: Ledger().open(path) for path in ledgers}
+    sink = ResultSink(args.results)
+
+    def iter_pending():
+        for path in ledgers:
+            for entry in read_pending(path):
+                yield entry, path
+
+    print(f"\n📥 开始下载待处理结果 (并发: {args.workers})\n")
+    start_time = time.time()
+    connector = aiohttp.TCPConnector(limit=args.workers * 2)
+
+    try:
+        async with aiohttp.ClientSession(
+            connector=connector, trace_configs=aiohttp_trace_configs()
+        ) as session:
+
+            async def handle(index, job):
+                entry, path = job
+                tag = progress_tag(index)
+                root = Path(args.output) if args.output else path.parent
+                try:
+                    await download_entry(session, tokens, entry, root)
+                except Exception as e:
+                    print(f"  {tag} ❌ {entry['name']}: {e}")
+                    return False, entry["name"]
+                writers[path].mark_done(entry["key"])
+                print(f"  {tag} ✅ {entry['name']}")
+                return True, entry["name"]
+
+            pending = timed_iter("scan", iter_pending())
+            async for ok, name in async_pipeline(pending, handle, args.workers, args.backlog):
+                sink.record(name, ok)
+                file_done("success" if ok else "failed")
+    finally:
+        summary = sink.close()
+        for writer in writers.values():
+            writer.close()
+        close_events()
+
+    if summary["total"] == 0:
+        print("✅ 没有待下载的结果")
+        return
+
+    elapsed = time.time() - start_time
+    print(f"\n{'='*50}")
+    print(f"✅ 成功: {summary['success']}")
+    print(f"❌ 失败: {summary['failed']}")
+    print(f"⏱️  耗时: {elapsed/60:.1f} 分钟")
+    print(f"🚀 速度: {summary['files_per_min']:.1f} 文件/分钟")
+    sink.print_failures()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download results recorded with --defer-download",
+    )
+    parser.add_argument("ledger", nargs="+",
+                        help=f"Ledger file(s), or output directories containing {DEFAULT_LEDGER}")
+    parser.add_argument("--output",
+                        help="Output root the ledger's result paths are relative to, e.g. after "
+                             "moving the output folder (default: the ledger's folder)")
+    parser.add_argument("--token", help="MinerU API token(s) for refreshing expired URLs, "
+                                        "comma-separated (or set MINERU_TOKEN env)")
+    add_token_arguments(parser)
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help=f"Entries read ahead of the workers (default: {DEFAULT_BACKLOG})")
+    parser.add_argument("--results", help="Append per-result outcomes to this JSONL file")
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+
+    args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,819 @@
+#!/usr/bin/env python3
+"""
+MinerU engine - one job model and one hot path behind every front-end
+
+A `Job` is one document: a local file or a URL, its output folder and
+its API options. After it has run, the same object holds the outcome:
+`ok`, `error`, `output`, `job_id` and per-stage `timings`. An `Engine`
+(requests, thread-safe) or `AsyncEngine` (aiohttp) runs a job end to end:
+
+    create batch / URL task -> upload -> poll (PollTracker, hedged) -> fetch_result
+
+A `Policy` gives the retries, backoff and timeouts. The same path serves
+every front-end, so connection reuse, hedged polls, resumable and segmented
+downloads, --archive / --store / --image-store and the metrics, trace and
+event hooks behave the same in all of them. Transient errors while polling
+are retried at the next interval; they do not restart the upload.
+
+Executors decide how jobs are scheduled:
+
+    run_serial(engine, jobs)                  one at a time
+    run_threaded(engine, jobs, workers)       thread pool, bounded read-ahead
+    run_async(async_engine, jobs, workers)    asyncio workers (async iterator)
+    execute(jobs, tokens, "thread"|"serial"|"async", workers)  any of them as a generator
+
+All of them yield finished jobs in completion order. `on_event(job, event)`
+is called with start / upload / parse / download / retry / done / failed /
+skip, so each CLI can print progress its own way.
+
+Usage:
+    engine = Engine(["tok-a", "tok-b"], Policy(retries=3))   # one token or a pool
+    jobs = (Job(path, out_dir) for path in paths)
+    for job in run_threaded(engine, jobs, workers=10):
+        print(job.name, job.ok, job.error, job.timings)
+"""
+
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
+
+import requests
+from mineru_archive import ResultArchive, member_kind
+from mineru_download import (
+    URL_REFRESHES,
+    IncompleteDownload,
+    async_fetch_result,
+    fetch_result,
+    has_result,
+)
+from mineru_events import item_context
+from mineru_hedge import async_hedged, hedged
+from mineru_local import LOCAL
+from mineru_metrics import PollTracker, collect_timings, timed
+from mineru_pages import PAGES
+from mineru_pipeline import DEFAULT_BACKLOG, async_pipeline, threaded_pipeline
+from mineru_route import ROUTER
+from mineru_store import STORE
+from mineru_tokens import QUARANTINE_CODES, TokenSource, TokenState, as_pool
+from mineru_trace import aiohttp_trace_configs, async_traced_sleep, span, traced_sleep
+
+API_BASE = os.environ.get("MINERU_API_BASE", "https://mineru.net/api/v4")
+DEFAULT_OPTIONS = {"model_version": "vlm", "enable_formula": True, "enable_table": True}
+FILE_OPTIONS = ("page_ranges",)
+UPLOAD_OK = (200, 203)
+UPLOAD_CHUNK = 1 << 20
+EXECUTORS = ("serial", "thread", "async")
+JOB_RETRIES = 3  # attempts per document for the async front-end, the library and the service
+
+Source = Union[str, Path]
+EventHook = Optional[Callable[["Job", str], None]]
+
+
+class ApiError(Exception):
+    """The API answered with a non-zero `code`."""
+
+    def __init__(self, message: str, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class Policy:
+    """Retry and timeout settings for one front-end."""
+
+    def __init__(self, retries: int = 5, backoff: Callable[[int], float] = lambda attempt: 2 ** attempt,
+                 poll_interval: float = 5, timeout: float = 600, create_timeout: float = 60,
+                 upload_timeout: float = 300, poll_timeout: float = 30, skip_existing: bool = True):
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.timeout = timeout  # waiting for the server to finish parsing
+        self.create_timeout = create_timeout
+        self.upload_timeout = upload_timeout
+        self.poll_timeout = poll_timeout
+        self.skip_existing = skip_existing
+
+
+# ============ Job model ============
+
+def is_url(source: Source) -> bool:
+    return isinstance(source, str) and urlparse(source).scheme in ("http", "https")
+
+
+class Job:
+    """One document: what to parse and, once run, what came out of it.
+
+    `output` is the extracted folder, the kept `<name>.zip` (--archive) or the
+    store location (--store); `markdown()`, `images` and `read()` work the
+    same for all three. `timings` holds seconds per stage (upload, queue,
+    parse, download, extract, ...) plus `total`. `local` is set when
+    --local converted the file in-process instead of the API; `route` holds
+    the --route decision that picked its model and OCR options. With --pages,
+    default names get the page selection suffix (`a__pages-1-3`), so triage
+    results never stand in for full ones.
+    """
+
+    def __init__(self, source: Source, output_dir: Source, name: Optional[str] = None,
+                 options: Optional[dict] = None, index: int = 0):
+        self.source = source if is_url(source) else Path(source)
+        self.output_dir = Path(output_dir)
+        self.index = index
+        if name is None:
+            name = (Path(urlparse(source).path).stem or f"document_{index}") if self.is_url \
+                else self.source.stem
+            if PAGES.enabled:
+                name = PAGES.result_name(name)
+        self.name = name
+        self.options = options or {}
+        self.ok = False
+        self.skipped = False
+        self.local = False
+        self.route: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.output: Optional[Path] = None
+        self.job_id: Optional[str] = None  # batch_id (uploads) or task_id (URLs)
+        self.attempts = 0
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def is_url(self) -> bool:
+        return is_url(self.source)
+
+    @property
+    def filename(self) -> str:
+        return Path(urlparse(self.source).path).name if self.is_url else self.source.name
+
+    def __repr__(self) -> str:
+        state = "skipped" if self.skipped else "ok" if self.ok else f"failed: {self.error}"
+        return f"<Job {self.name} {state}>"
+
+    def _existing(self) -> Path:
+        archive = self.output_dir / f"{self.name}.zip"
+        return archive if archive.exists() else self.output_dir / self.name
+
+    def _archive(self) -> Optional[ResultArchive]:
+        if self.output is not None and self.output.suffix == ".zip":
+            return ResultArchive(self.output)
+        return None
+
+    def _store_key(self) -> Optional[str]:
+        if self.output is not None and STORE.enabled and not self.output.exists():
+            return STORE.store.key_for(self.output.parent, self.output.name)
+        return None
+
+    @property
+    def markdown_path(self) -> Optional[Path]:
+        """`<name>.md` of an extracted result (None for archives and stores)."""
+        if self.output is None or not self.output.is_dir():
+            return None
+        path = self.output / f"{self.name}.md"
+        return path if path.exists() else None
+
+    def markdown(self) -> str:
+        if not self.ok or self.output is None:
+            raise ValueError(f"{self.name}: no result ({self.error})")
+        archive = self._archive()
+        if archive:
+            return archive.markdown()
+        key = self._store_key()
+        if key is not None:
+            return STORE.store.markdown(key)
+        path = self.markdown_path
+        if path is None:
+            raise FileNotFoundError(f"{self.output}/{self.name}.md")
+        return path.read_text(encoding="utf-8")
+
+    @property
+    def images(self) -> List[str]:
+        """Image files of the result, relative to it (e.g. `images/fig_0.jpg`)."""
+        if not self.ok or self.output is None:
+            return []
+        archive = self._archive()
+        if archive:
+            return [n for n in archive.names() if member_kind(n) == "images"]
+        key = self._store_key()
+        if key is not None:
+            return [m for m, kind, _ in STORE.store.members(key) if kind == "images"]
+        folder = self.output / "images"
+        if not folder.is_dir():
+            return []
+        return sorted(p.relative_to(self.output).as_posix() for p in folder.rglob("*") if p.is_file())
+
+    def read(self, member: str) -> bytes:
+        """Bytes of one file of the result, e.g. an entry of `images`."""
+        archive = self._archive()
+        if archive:
+            return archive.read(member)
+        key = self._store_key()
+        if key is not None:
+            return STORE.store.read(key, member)
+        return (self.output / member).read_bytes()
+
+    def to_dict(self) -> dict:
+        return {
+            "source": str(self.source),
+            "name": self.name,
+            "ok": self.ok,
+            "skipped": self.skipped,
+            "local": self.local,
+            "route": self.route,
+            "output": str(self.output) if self.output else None,
+            "error": self.error,
+            "job_id": self.job_id,
+            "attempts": self.attempts,
+            "timings": self.timings,
+        }
+
+
+# ============ Shared request pieces ============
+
+def headers(token: str) -> dict:
+    return {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+
+
+def batch_payload(files: Sequence[tuple], options: Optional[dict] = None) -> dict:
+    """Body of `POST /file-urls/batch` for (file name, data_id[, per-file options]) tuples.
+
+    `page_ranges` is a per-file field of a batch, so it goes into every file entry.
+    """
+    options = dict(options or {})
+    shared = {k: options.pop(k) for k in FILE_OPTIONS if k in options}
+    entries = []
+    for name, data_id, *extra in files:
+        entry = {"name": name, "data_id": data_id, **shared}
+        if extra:
+            entry.update(extra[0])
+        entries.append(entry)
+    payload = {"files": entries}
+    payload.update(DEFAULT_OPTIONS)
+    payload.update(options)
+    return payload
+
+
+def put_file(http, url: str, path: Path, timeout: float) -> None:
+    """Stream `path` to a presigned upload URL with `http` (a requests Session)."""
+    with timed("upload", os.path.getsize(path)), open(path, "rb") as f:
+        resp = http.put(url, data=f, timeout=timeout)
+    if resp.status_code not in UPLOAD_OK:
+        raise Exception(f"上传失败: {resp.status_code}")
+
+
+async def _read_chunks(path: Path) -> AsyncIterator[bytes]:
+    """File contents for an aiohttp request body, read off the event loop."""
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as f:
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, UPLOAD_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def url_payload(url: str, data_id: str, options: Optional[dict] = None) -> dict:
+    payload = {"url": url, "data_id": data_id}
+    payload.update(DEFAULT_OPTIONS)
+    payload.update(options or {})
+    return payload
+
+
+def check(result: dict) -> dict:
+    """`data` of an API response, or ApiError for a non-zero code."""
+    if result.get("code") != 0:
+        raise ApiError(f"API错误: {result.get('msg', result)}", result.get("code"))
+    return result["data"]
+
+
+def _error_body(status: int) -> dict:
+    """Stand-in result for a response that was not JSON (e.g. a 429 page)."""
+    return {"code": status, "msg": f"HTTP {status}"}
+
+
+def _quarantining(result: dict) -> bool:
+    """True if this response takes its token out of the pool (another token may work)."""
+    return str(result.get("code")) in QUARANTINE_CODES
+
+
+def batch_counts(results: List[dict], total: int) -> Tuple[int, int, int, int]:
+    """(done, running, pending, failed) files of a batch of `total` from its results."""
+    states = [r.get("state") for r in results]
+    done, running, failed = states.count("done"), states.count("running"), states.count("failed")
+    return done, running, total - done - running - failed, failed
+
+
+def _state(item: Optional[dict]) -> Tuple[Optional[str], Optional[str]]:
+    """(state, full_zip_url) of one status entry; raises on `failed`."""
+    if not item:
+        return None, None
+    state = item.get("state")
+    if state == "failed":
+        raise Exception(item.get("err_msg") or "解析失败")
+    return state, item.get("full_zip_url")
+
+
+def _try_local(job: Job) -> bool:
+    """Local steps before the first attempt: --pages resolves `page_ranges`, --local
+    converts a born-digital file in-process, --route picks model and OCR. True: settled
+    without the API (an error in these steps fails the job)."""
+    try:
+        if PAGES.enabled and not PAGES.apply(job):
+            return True  # none of the selected pages exist: fails without an upload
+        if job.is_url:
+            return False
+        if LOCAL.enabled:
+            job.output = LOCAL.convert(job.source, job.output_dir, job.name, job.options)
+            job.ok = job.local = job.output is not None
+            if job.local:
+                return True
+        if ROUTER.enabled:
+            ROUTER.route(job)
+    except Exception as e:
+        job.ok = job.local = False
+        job.error = str(e) or type(e).__name__
+        return True
+    return False
+
+
+def _emit(on_event: EventHook, job: Job, event: str) -> None:
+    if on_event:
+        on_event(job, event)
+
+
+# ============ Engines ============
+
+class Engine:
+    """Blocking engine on requests; one keep-alive Session per thread.
+
+    `tokens` is one token, a list of them or a TokenPool: new batches go to
+    the token with the most headroom and are polled with the token that
+    created them.
+    """
+
+    def __init__(self, tokens: TokenSource, policy: Optional[Policy] = None,
+                 api_base: Optional[str] = None):
+        self.tokens = as_pool(tokens)
+        self.policy = policy or Policy()
+        self.api_base = api_base or API_BASE
+        self._local = threading.local()
+
+    def http(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    # ---- API primitives ----
+
+    def _call(self, method: str, path: str, state: TokenState, timeout: float, **kwargs) -> dict:
+        resp = self.http().request(method, f"{self.api_base}{path}", headers=headers(state.token),
+                                   timeout=timeout, **kwargs)
+        try:
+            result = resp.json()
+        except ValueError:
+            result = _error_body(resp.status_code)
+        self.tokens.note(state, resp.status_code, result)
+        return result
+
+    def _create(self, path: str, payload: dict, key: str, cost: int = 1) -> dict:
+        """POST a new batch / task with the best token, skipping tokens that get quarantined."""
+        with timed("create_batch"):
+            while True:
+                state = self.tokens.acquire(cost)
+                result = self._call("POST", path, state, self.policy.create_timeout, json=payload)
+                if not _quarantining(result):
+                    break
+        data = check(result)
+        self.tokens.bind(data[key], state, cost)
+        return data
+
+    def create_upload_urls(self, files: Sequence[tuple],
+                           options: Optional[dict] = None) -> Tuple[str, List[str]]:
+        """Request presigned upload URLs; returns (batch_id, urls in `files` order)."""
+        data = self._create("/file-urls/batch", batch_payload(files, options), "batch_id", len(files))
+        return data["batch_id"], data["file_urls"]
+
+    def upload(self, url: str, path: Path) -> None:
+        put_file(self.http(), url, path, self.policy.upload_timeout)
+
+    def batch_results(self, batch_id: str) -> List[dict]:
+        state = self.tokens.owner(batch_id)
+        result = hedged("poll", lambda: self._call(
+            "GET", f"/extract-results/batch/{batch_id}", state, self.policy.poll_timeout,
+        ))
+        return check(result)["extract_result"]
+
+    def create_url_task(self, url: str, data_id: str, options: Optional[dict] = None) -> str:
+        return self._create("/extract/task", url_payload(url, data_id, options), "task_id")["task_id"]
+
+    def task_status(self, task_id: str) -> dict:
+        state = self.tokens.owner(task_id)
+        result = hedged("poll", lambda: self._call(
+            "GET", f"/extract/task/{task_id}", state, self.policy.poll_timeout,
+        ))
+        return check(result)
+
+    def wait(self, status: Callable[[], Optional[dict]]) -> str:
+        """Poll `status()` until done; returns full_zip_url. Failed polls are retried at
+        the next interval; only a `failed` state or the deadline end the wait."""
+        return self._poll(status, PollTracker(), self.policy.poll_interval, self.policy.timeout)
+
+    def _poll(self, status: Callable[[], Optional[dict]], tracker: Optional[PollTracker],
+              interval: float, timeout: float) -> str:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                item = status()
+            except (ApiError, requests.RequestException, ValueError, KeyError):
+                item = None  # transient (incl. a 429/5xx or error code); poll again
+            state, zip_url = _state(item)
+            if tracker:
+                tracker.update(state)
+            if state == "done":
+                return zip_url
+            traced_sleep(interval, "poll")
+        raise TimeoutError("等待超时")
+
+    def wait_batch(self, batch_id: str, total: int,
+                   on_status: Optional[Callable[[List[dict]], None]] = None,
+                   poll_interval: Optional[float] = None,
+                   timeout: Optional[float] = None) -> List[dict]:
+        """Poll a multi-file batch until all `total` files are done or failed; returns
+        its results. `on_status(results)` sees every successful poll; failed polls are
+        retried as in `wait`. `poll_interval` / `timeout` default to the policy's."""
+        start = time.time()
+        trackers: Dict[str, PollTracker] = {}
+        results: List[dict] = []
+
+        def status() -> dict:
+            nonlocal results
+            results = self.batch_results(batch_id)
+            for r in results:
+                key = r.get("data_id") or r.get("file_name")
+                if key not in trackers:
+                    trackers[key] = PollTracker(upload_end=start)
+                trackers[key].update(r.get("state"))
+            if on_status:
+                on_status(results)
+            settled = sum(1 for r in results if r.get("state") in ("done", "failed"))
+            return {"state": "done" if settled >= total else "running"}
+
+        self._poll(status, None,
+                   self.policy.poll_interval if poll_interval is None else poll_interval,
+                   self.policy.timeout if timeout is None else timeout)
+        return results
+
+    # ---- one job ----
+
+    def _first_result(self, batch_id: str) -> Optional[dict]:
+        return next(iter(self.batch_results(batch_id)), None)
+
+    def _attempt(self, job: Job, on_event: EventHook) -> None:
+        if job.is_url:
+            job.job_id = self.create_url_task(job.source, job.name, job.options)
+            source = {"task_id": job.job_id, "token_id": self.tokens.owner(job.job_id).id}
+            status = partial(self.task_status, job.job_id)
+            _emit(on_event, job, "parse")
+            zip_url = self.wait(status)
+        else:
+            job.job_id, urls = self.create_upload_urls([(job.filename, job.name)], job.options)
+            source = {"batch_id": job.job_id, "data_id": job.name,
+                      "token_id": self.tokens.owner(job.job_id).id}
+            _emit(on_event, job, "upload")
+            self.upload(urls[0], job.source)
+            status = partial(self._first_result, job.job_id)
+            _emit(on_event, job, "parse")
+            zip_url = self.wait(status)
+        _emit(on_event, job, "download")
+        # 断点续传：下载失败只重试下载（重新取链接、续传 .part），不重新上传/解析
+        for refresh in range(URL_REFRESHES + 1):
+            try:
+                job.output = fetch_result(zip_url, job.output_dir, job.name, source,
+                                          session=self.http)
+                return
+            except (IncompleteDownload, requests.RequestException):
+                if refresh == URL_REFRESHES:
+                    raise
+                traced_sleep(self.policy.backoff(refresh), "backoff")
+                zip_url = self.wait(status)  # the presigned URL may have expired
+
+    def run(self, job: Job, on_event: EventHook = None) -> Job:
+        """Run `job` to completion with the policy's retries; never raises."""
+        if self.policy.skip_existing and has_result(job.output_dir, job.name):
+            job.ok = job.skipped = True
+            job.output = job._existing()
+            _emit(on_event, job, "skip")
+            return job
+        job.output_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        _emit(on_event, job, "start")
+        with collect_timings() as timings:
+            for attempt in range(0 if _try_local(job) else self.policy.retries):
+                job.attempts = attempt + 1
+                try:
+                    self._attempt(job, on_event)
+                    job.ok, job.error = True, None
+                    break
+                except Exception as e:
+                    job.error = str(e) or type(e).__name__
+                    if attempt < self.policy.retries - 1:
+                        _emit(on_event, job, "retry")
+                        traced_sleep(self.policy.backoff(attempt), "backoff")
+        job.timings = dict(timings, total=round(time.perf_counter() - start, 4))
+        _emit(on_event, job, "done" if job.ok else "failed")
+        return job
+
+
+EngineSource = Union[TokenSource, Engine]
+
+
+def as_engine(tokens: EngineSource) -> Engine:
+    """An Engine as given, or a default one for a token / token list / TokenPool
+    (for helpers that took a `token` before the engine existed)."""
+    return tokens if isinstance(tokens, Engine) else Engine(tokens)
+
+
+class AsyncEngine:
+    """aiohttp engine; the caller owns the ClientSession (see `open_session`)."""
+
+    def __init__(self, tokens: TokenSource, session, policy: Optional[Policy] = None,
+                 api_base: Optional[str] = None):
+        self.tokens = as_pool(tokens)
+        self.session = session
+        self.policy = policy or Policy()
+        self.api_base = api_base or API_BASE
+
+    # ---- API primitives ----
+
+    async def _call(self, method: str, path: str, state: TokenState, timeout: float,
+                    **kwargs) -> dict:
+        import aiohttp
+
+        async with self.session.request(method, f"{self.api_base}{path}",
+                                        headers=headers(state.token),
+                                        timeout=aiohttp.ClientTimeout(total=timeout),
+                                        **kwargs) as resp:
+            try:
+                result = await resp.json(content_type=None)
+            except ValueError:
+                result = _error_body(resp.status)
+            self.tokens.note(state, resp.status, result)
+            return result
+
+    async def _create(self, path: str, payload: dict, key: str, cost: int = 1) -> dict:
+        with timed("create_batch"):
+            while True:
+                state = self.tokens.acquire(cost)
+                result = await self._call("POST", path, state, self.policy.create_timeout,
+                                          json=payload)
+                if not _quarantining(result):
+                    break
+        data = check(result)
+        self.tokens.bind(data[key], state, cost)
+        return data
+
+    async def create_upload_urls(self, files: Sequence[tuple],
+                                 options: Optional[dict] = None) -> Tuple[str, List[str]]:
+        data = await self._create("/file-urls/batch", batch_payload(files, options), "batch_id",
+                                  len(files))
+        return data["batch_id"], data["file_urls"]
+
+    async def upload(self, url: str, path: Path) -> None:
+        import aiohttp
+
+        # Streamed with an explicit length: presigned URLs do not take chunked bodies
+        size = os.path.getsize(path)
+        with timed("upload", size):
+            async with self.session.put(
+                url, data=_read_chunks(Path(path)), headers={"Content-Length": str(size)},
+                timeout=aiohttp.ClientTimeout(total=self.policy.upload_timeout),
+            ) as resp:
+                status = resp.status
+        if status not in UPLOAD_OK:
+            raise Exception(f"上传失败: {status}")
+
+    async def batch_results(self, batch_id: str) -> List[dict]:
+        state = self.tokens.owner(batch_id)
+        result = await async_hedged("poll", lambda: self._call(
+            "GET", f"/extract-results/batch/{batch_id}", state, self.policy.poll_timeout,
+        ))
+        return check(result)["extract_result"]
+
+    async def create_url_task(self, url: str, data_id: str, options: Optional[dict] = None) -> str:
+        data = await self._create("/extract/task", url_payload(url, data_id, options), "task_id")
+        return data["task_id"]
+
+    async def task_status(self, task_id: str) -> dict:
+        state = self.tokens.owner(task_id)
+        result = await async_hedged("poll", lambda: self._call(
+            "GET", f"/extract/task/{task_id}", state, self.policy.poll_timeout,
+        ))
+        return check(result)
+
+    async def wait(self, status: Callable[[], "asyncio.Future"]) -> str:
+        import aiohttp
+
+        tracker = PollTracker()
+        deadline = time.time() + self.policy.timeout
+        while time.time() < deadline:
+            try:
+                item = await status()
+            except (ApiError, aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError):
+                item = None  # transient (incl. a 429/5xx or error code); poll again
+            state, zip_url = _state(item)
+            tracker.update(state)
+            if state == "done":
+                return zip_url
+            await async_traced_sleep(self.policy.poll_interval, "poll")
+        raise TimeoutError("等待超时")
+
+    # ---- one job ----
+
+    async def _first_result(self, batch_id: str) -> Optional[dict]:
+        return next(iter(await self.batch_results(batch_id)), None)
+
+    async def _attempt(self, job: Job, on_event: EventHook) -> None:
+        import aiohttp
+
+        if job.is_url:
+            job.job_id = await self.create_url_task(job.source, job.name, job.options)
+            source = {"task_id": job.job_id, "token_id": self.tokens.owner(job.job_id).id}
+            status = partial(self.task_status, job.job_id)
+            _emit(on_event, job, "parse")
+            zip_url = await self.wait(status)
+        else:
+            job.job_id, urls = await self.create_upload_urls([(job.filename, job.name)], job.options)
+            source = {"batch_id": job.job_id, "data_id": job.name,
+                      "token_id": self.tokens.owner(job.job_id).id}
+            _emit(on_event, job, "upload")
+            await self.upload(urls[0], job.source)
+            status = partial(self._first_result, job.job_id)
+            _emit(on_event, job, "parse")
+            zip_url = await self.wait(status)
+        _emit(on_event, job, "download")
+        # 下载失败只重试下载（重新取链接、续传 .part），不重新上传/解析
+        for refresh in range(URL_REFRESHES + 1):
+            try:
+                job.output = await async_fetch_result(self.session, zip_url, job.output_dir,
+                                                      job.name, source)
+                return
+            except (IncompleteDownload, aiohttp.ClientError, asyncio.TimeoutError):
+                if refresh == URL_REFRESHES:
+                    raise
+                await async_traced_sleep(self.policy.backoff(refresh), "backoff")
+                zip_url = await self.wait(status)  # the presigned URL may have expired
+
+    async def run(self, job: Job, on_event: EventHook = None) -> Job:
+        """Run `job` to completion with the policy's retries; never raises."""
+        if self.policy.skip_existing and has_result(job.output_dir, job.name):
+            job.ok = job.skipped = True
+            job.output = job._existing()
+            _emit(on_event, job, "skip")
+            return job
+        job.output_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        _emit(on_event, job, "start")
+        with collect_timings() as timings:
+            # Local conversion is CPU-bound: keep it off the event loop (same timings context)
+            local = await asyncio.get_running_loop().run_in_executor(
+                None, contextvars.copy_context().run, _try_local, job)
+            for attempt in range(0 if local else self.policy.retries):
+                job.attempts = attempt + 1
+                try:
+                    await self._attempt(job, on_event)
+                    job.ok, job.error = True, None
+                    break
+                except Exception as e:
+                    job.error = str(e) or type(e).__name__
+                    if attempt < self.policy.retries - 1:
+                        _emit(on_event, job, "retry")
+                        await async_traced_sleep(self.policy.backoff(attempt), "backoff")
+        job.timings = dict(timings, total=round(time.perf_counter() - start, 4))
+        _emit(on_event, job, "done" if job.ok else "failed")
+        return job
+
+
+def open_session(workers: int):
+    """aiohttp session sized for `workers` concurrent jobs."""
+    import aiohttp
+
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=workers * 2),
+        timeout=aiohttp.ClientTimeout(total=3600),
+        trace_configs=aiohttp_trace_configs(),
+    )
+
+
+# ============ Executors ============
+
+def _indexed(jobs: Iterable[Job]) -> Iterator[Job]:
+    for index, job in enumerate(jobs):
+        job.index = index
+        yield job
+
+
+def run_serial(engine: Engine, jobs: Iterable[Job], on_event: EventHook = None) -> Iterator[Job]:
+    """Run jobs one at a time, in input order."""
+    for job in _indexed(jobs):
+        with item_context(job.filename, job.index), span(job.filename, "item", index=job.index) as args:
+            engine.run(job, on_event)
+            args["ok"] = job.ok
+        yield job
+
+
+def run_threaded(engine: Engine, jobs: Iterable[Job], workers: int,
+                 backlog: int = DEFAULT_BACKLOG, on_event: EventHook = None) -> Iterator[Job]:
+    """Run jobs on a thread pool; yields them in completion order."""
+    return threaded_pipeline(_indexed(jobs), lambda _, job: engine.run(job, on_event),
+                             workers, backlog)
+
+
+async def run_async(engine: AsyncEngine, jobs: Iterable[Job], workers: int,
+                    backlog: int = DEFAULT_BACKLOG, on_event: EventHook = None) -> AsyncIterator[Job]:
+    """Run jobs on `workers` asyncio workers; yields them in completion order."""
+
+    async def handle(_, job):
+        return await engine.run(job, on_event)
+
+    async for job in async_pipeline(_indexed(jobs), handle, workers, backlog):
+        if isinstance(job, Exception):
+            raise job
+        yield job
+
+
+def iterate_in_thread(make_aiter: Callable[[], AsyncIterator]) -> Iterator:
+    """Drive an async iterator on a private event loop in a background thread.
+
+    Items are handed over as they are produced; closing the returned
+    generator early cancels the async side.
+    """
+    items: "queue.Queue" = queue.Queue()
+    done = object()
+    loop = asyncio.new_event_loop()
+
+    async def produce():
+        try:
+            async for item in make_aiter():
+                items.put(item)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
+
+    def run():
+        loop.run_until_complete(task)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+
+    task = loop.create_task(produce())
+    thread = threading.Thread(target=run, name="mineru-loop", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if thread.is_alive():
+            loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        loop.close()
+
+
+def execute(jobs: Iterable[Job], tokens: TokenSource, executor: str = "thread", workers: int = 5,
+            policy: Optional[Policy] = None, backlog: int = DEFAULT_BACKLOG,
+            on_event: EventHook = None) -> Iterator[Job]:
+    """Run jobs with the named executor (serial / thread / async) as a plain generator."""
+    if executor == "serial":
+        return run_serial(Engine(tokens, policy), jobs, on_event)
+    if executor == "thread":
+        return run_threaded(Engine(tokens, policy), jobs, workers, backlog, on_event)
+    if executor != "async":
+        raise ValueError(f"unknown executor: {executor} (choose from {', '.join(EXECUTORS)})")
+
+    async def run():
+        async with open_session(workers) as session:
+            async for job in run_async(AsyncEngine(tokens, session, policy), jobs, workers,
+                                       backlog, on_event):
+                yield job
+
+    return iterate_in_thread(run)
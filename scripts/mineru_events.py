@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+MinerU events - structured JSONL event log and a single-line live progress view
+
+Event log (`--events PATH`): one JSON object per line, e.g.
+
+    {"ts": 1718000000.123, "event": "stage", "stage": "upload", "file": "a.pdf",
+     "seconds": 0.41, "bytes": 183211, "ok": true}
+
+Events are handed to a `logging.handlers.QueueHandler` and written by a
+`QueueListener` thread, so workers never block on disk I/O. Emitted events:
+`run_start`, `item_start`, `item_end`, `stage`, `poll` (state changes only),
+`file_done`, `console` (captured output) and `run_end`. The file an event
+belongs to comes from a context variable set by the pipeline workers.
+
+Progress view (`--progress`): per-file console output is captured (into the
+event log when one is open; lines with ❌ are still shown) and replaced by a
+single status line redrawn at most every PROGRESS_INTERVAL seconds with
+done/total, files/min, ETA and how many files are in each stage. When stderr
+is not a terminal (CI logs), a plain line is printed every PLAIN_INTERVAL
+seconds instead.
+"""
+
+import argparse
+import atexit
+import contextvars
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+PROGRESS_INTERVAL = 0.5
+PLAIN_INTERVAL = 30.0
+VIEW_STAGES = ("create_batch", "upload", "queue", "parse", "download", "extract")
+
+current_item: contextvars.ContextVar = contextvars.ContextVar("mineru_item", default=None)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"ts": round(record.created, 3), "event": record.getMessage()}
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class EventLog:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._listener = None
+        self._logger = logging.getLogger("mineru.events")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+
+    def enable(self, path: Path) -> None:
+        """Start the background writer for `path` (appended to, one event per line)."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(self.path, encoding="utf-8")
+        handler.setFormatter(_JsonFormatter())
+        events: queue.Queue = queue.Queue(-1)
+        self._listener = logging.handlers.QueueListener(events, handler)
+        self._logger.addHandler(logging.handlers.QueueHandler(events))
+        self._listener.start()
+        self.enabled = True
+
+    def emit(self, event: str, **fields) -> None:
+        if not self.enabled:
+            return
+        item = current_item.get()
+        if item is not None and "file" not in fields:
+            fields["file"] = item
+        self._logger.info(event, extra={"fields": fields})
+
+    def close(self) -> None:
+        if self._listener:
+            self.enabled = False
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+
+class _ConsoleCapture(io.TextIOBase):
+    """Stand-in for sys.stdout while the progress view owns the terminal.
+
+    Reassembles lines per thread (workers print fragments with end=""),
+    forwards them to the event log and lets failure lines through.
+    """
+
+    def __init__(self, view: "ProgressView"):
+        self.view = view
+        self._local = threading.local()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", "") + text
+        *lines, self._local.buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                self.view.console(line)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class ProgressView:
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self.found = 0
+        self.total: Optional[int] = None
+        self.results: Dict[str, int] = {}
+        self.active: Dict[str, int] = {}
+        self.trackers = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stdout = None
+        self._tty = False
+        self._width = 0
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.started = time.time()
+        self._tty = sys.stderr.isatty()
+        self._stdout = sys.stdout
+        sys.stdout = _ConsoleCapture(self)
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+
+    # -- counters ---------------------------------------------------------
+
+    def discovered(self) -> None:
+        with self._lock:
+            self.found += 1
+
+    def scan_finished(self) -> None:
+        with self._lock:
+            self.total = self.found
+
+    def enter(self, stage: str, delta: int = 1) -> None:
+        with self._lock:
+            self.active[stage] = self.active.get(stage, 0) + delta
+
+    def track(self, tracker) -> None:
+        """Follow a PollTracker's queue/parse state until it is garbage collected."""
+        with self._lock:
+            self.trackers.add(tracker)
+
+    def done(self, result: str, n: int = 1) -> None:
+        with self._lock:
+            self.results[result] = self.results.get(result, 0) + n
+
+    # -- rendering --------------------------------------------------------
+
+    def line(self) -> str:
+        with self._lock:
+            results = dict(self.results)
+            active = dict(self.active)
+            found, total = self.found, self.total
+            trackers = list(self.trackers)
+        for tracker in trackers:
+            if not tracker.finished:
+                stage = "queue" if tracker.running_seen is None else "parse"
+                active[stage] = active.get(stage, 0) + 1
+
+        done = sum(results.values())
+        processed = done - results.get("skipped", 0)
+        elapsed = max(time.time() - self.started, 1e-6)
+        rate = processed / elapsed * 60
+
+        if total is not None:
+            count = f"{done}/{total}"
+        else:
+            count = f"{done}/{found}+" if found else f"{done}"
+        parts = [
+            f"⏳ {count}",
+            f"✅{results.get('success', 0)} ❌{results.get('failed', 0)} ⏭️{results.get('skipped', 0)}",
+            f"{rate:.1f} 文件/分钟",
+        ]
+        if total is not None and processed and total > done:
+            parts.append(f"ETA {_duration((total - done) / (processed / elapsed))}")
+        stages = " · ".join(f"{s} {active[s]}" for s in VIEW_STAGES if active.get(s))
+        if stages:
+            parts.append(stages)
+        return " | ".join(parts)
+
+    def _draw(self) -> None:
+        text = self.line()
+        if self._tty:
+            pad = max(0, self._width - len(text))
+            sys.stderr.write("\r" + text + " " * pad)
+            self._width = len(text)
+        else:
+            sys.stderr.write(text + "\n")
+        sys.stderr.flush()
+
+    def _clear(self) -> None:
+        if self._tty and self._width:
+            sys.stderr.write("\r" + " " * self._width + "\r")
+            self._width = 0
+
+    def _run(self) -> None:
+        interval = PROGRESS_INTERVAL if self._tty else PLAIN_INTERVAL
+        while not self._stop.wait(interval):
+            with _draw_lock:
+                self._draw()
+
+    def console(self, line: str) -> None:
+        EVENTS.emit("console", text=line.strip())
+        if "❌" in line:
+            with _draw_lock:
+                self._clear()
+                self._stdout.write(line + "\n")
+                self._stdout.flush()
+
+    def close(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stop.set()
+        self._thread.join()
+        with _draw_lock:
+            self._draw()
+            if self._tty:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+        sys.stdout = self._stdout
+
+
+_draw_lock = threading.Lock()
+
+EVENTS = EventLog()
+PROGRESS = ProgressView()
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def enabled() -> bool:
+    return EVENTS.enabled or PROGRESS.enabled
+
+
+def emit(event: str, **fields) -> None:
+    EVENTS.emit(event, **fields)
+
+
+def file_result(result: str, n: int = 1) -> None:
+    """Record finished files (`success`, `failed`, `skipped`)."""
+    if n and (PROGRESS.enabled or EVENTS.enabled):
+        PROGRESS.done(result, n)
+        EVENTS.emit("file_done", result=result, count=n)
+
+
+@contextmanager
+def item_context(name: str, index: Optional[int] = None) -> Iterator[None]:
+    """Attribute events in the enclosed block to the file `name`."""
+    token = current_item.set(name)
+    EVENTS.emit("item_start", index=index)
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        EVENTS.emit("item_end", seconds=round(time.perf_counter() - start, 4), ok=ok)
+        current_item.reset(token)
+
+
+@contextmanager
+def active(stage: str) -> Iterator[None]:
+    """Count the enclosed block as a file currently in `stage` (progress view)."""
+    if not PROGRESS.enabled:
+        yield
+        return
+    PROGRESS.enter(stage)
+    try:
+        yield
+    finally:
+        PROGRESS.enter(stage, -1)
+
+
+def add_event_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--events", metavar="PATH",
+                        help="Append structured per-file events to PATH (JSONL)")
+    parser.add_argument("--progress", action="store_true",
+                        help="Replace per-file output with a single live progress line")
+
+
+def setup_events(args: argparse.Namespace) -> None:
+    if getattr(args, "events", None):
+        EVENTS.enable(Path(args.events))
+        EVENTS.emit("run_start", argv=sys.argv[1:])
+    if getattr(args, "progress", False):
+        PROGRESS.enable()
+    atexit.register(close_events)
+
+
+def close_events() -> None:
+    """Finish the progress line and flush the event log (safe to call twice)."""
+    PROGRESS.close()
+    if EVENTS.enabled:
+        EVENTS.emit("run_end", results=dict(PROGRESS.results))
+        EVENTS.close()
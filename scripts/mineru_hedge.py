@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+MinerU request hedging - cut the latency tail of idempotent requests
+
+Status polls and result downloads are safe to repeat. With hedging on, a
+request that has not answered (response headers received) within the recent
+p95 latency for its kind gets a second identical request; whichever finishes
+first wins and the other is cancelled or its response discarded.
+
+The threshold adapts: each kind ("poll", "download") keeps a window of the
+last WINDOW latencies and uses its p95 once MIN_SAMPLES are in (a fixed
+default before that). A budget caps hedges at `budget` x requests (+ a small
+burst), so total load grows by at most that fraction.
+
+Usage:
+    resp = hedged("poll", lambda: session.get(url, timeout=30))
+    resp = await async_hedged("poll", lambda: session.get(url))
+"""
+
+import argparse
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from mineru_events import emit
+
+DEFAULT_BUDGET = 0.05
+BURST = 3
+WINDOW = 200
+MIN_SAMPLES = 20
+MIN_DELAY = 0.05
+DEFAULT_DELAYS = {"poll": 5.0, "download": 10.0}
+POOL_SIZE = 256
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies with a p95 estimate."""
+
+    def __init__(self, size: int = WINDOW):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class Hedger:
+    def __init__(self):
+        self.enabled = False
+        self.budget = DEFAULT_BUDGET
+        self.windows: Dict[str, LatencyWindow] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def enable(self, budget: float = DEFAULT_BUDGET) -> None:
+        self.budget = budget
+        self._pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="hedge")
+        self.enabled = True
+
+    def window(self, kind: str) -> LatencyWindow:
+        with self._lock:
+            if kind not in self.windows:
+                self.windows[kind] = LatencyWindow()
+            return self.windows[kind]
+
+    def threshold(self, kind: str) -> float:
+        p95 = self.window(kind).p95()
+        if p95 is None:
+            return DEFAULT_DELAYS.get(kind, 10.0)
+        return max(MIN_DELAY, p95)
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self.hedges < self.budget * self.calls + BURST:
+                self.hedges += 1
+                return True
+            return False
+
+    def _won(self, kind: str, seconds: float, hedge: bool) -> None:
+        self.window(kind).add(seconds)
+        if hedge:
+            with self._lock:
+                self.wins += 1
+            emit("hedge_won", kind=kind, seconds=round(seconds, 4))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.calls, "hedges": self.hedges, "hedge_wins": self.wins}
+
+    # -- sync -------------------------------------------------------------
+
+    def call(self, kind: str, fn: Callable[[], T]) -> T:
+        if not self.enabled:
+            return fn()
+        self._count_call()
+        futures = [self._submit(fn)]
+        done, _ = wait(futures, timeout=self.threshold(kind))
+        if not done and self._allow():
+            emit("hedge", kind=kind, after=round(self.threshold(kind), 4))
+            futures.append(self._submit(fn))
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                result, seconds = future.result()
+                self._won(kind, seconds, future is not futures[0])
+                for other in futures:
+                    if other is not future:
+                        _abandon(other)
+                return result
+        raise errors[0]
+
+    def _submit(self, fn: Callable[[], T]) -> Future:
+        # Run under a copy of the caller's context so event/trace attribution follows
+        return self._pool.submit(contextvars.copy_context().run, _measure, fn)
+
+    # -- async ------------------------------------------------------------
+
+    async def acall(self, kind: str, factory: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await factory()
+        self._count_call()
+        tasks = [asyncio.ensure_future(_ameasure(factory))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.threshold(kind))
+            if not done and self._allow():
+                emit("hedge", kind=kind, after=round(self.threshold(kind), 4))
+                tasks.append(asyncio.ensure_future(_ameasure(factory)))
+
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    result, seconds = task.result()
+                    self._won(kind, seconds, task is not tasks[0])
+                    tasks.remove(task)
+                    return result
+            raise errors[0]
+        finally:
+            for task in tasks:
+                _acancel(task)
+
+
+def _measure(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+async def _ameasure(factory):
+    start = time.perf_counter()
+    result = await factory()
+    return result, time.perf_counter() - start
+
+
+def _discard(result) -> None:
+    # Losing responses hold a pooled connection until closed/released
+    release = getattr(result, "release", None) or getattr(result, "close", None)
+    if callable(release):
+        try:
+            release()
+        except Exception:
+            pass
+
+
+def _abandon(future: Future) -> None:
+    if future.cancel():
+        return
+
+    def cleanup(f):
+        if not f.cancelled() and f.exception() is None:
+            _discard(f.result()[0])
+
+    future.add_done_callback(cleanup)
+
+
+def _acancel(task: asyncio.Future) -> None:
+    if not task.done():
+        task.cancel()
+        # Retrieve a late failure so asyncio does not log it as unhandled
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    elif not task.cancelled() and task.exception() is None:
+        _discard(task.result()[0])
+
+
+HEDGER = Hedger()
+
+
+def hedged(kind: str, fn: Callable[[], T]) -> T:
+    """Call `fn()` (an idempotent request), hedging it when hedging is enabled."""
+    return HEDGER.call(kind, fn)
+
+
+async def async_hedged(kind: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """Async counterpart of `hedged`; `factory()` must return a fresh awaitable."""
+    return await HEDGER.acall(kind, factory)
+
+
+def add_hedge_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge slow status polls and downloads with a second request "
+                             "after the recent p95 latency")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_BUDGET,
+                        help=f"Max extra requests as a fraction of all hedgeable requests "
+                             f"(default: {DEFAULT_BUDGET})")
+
+
+def setup_hedge(args: argparse.Namespace) -> None:
+    if getattr(args, "hedge", False):
+        HEDGER.enable(args.hedge_budget)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+MinerU image store - content-addressed images shared across documents
+
+Documents from one publisher repeat the same logos, headers and watermarks,
+and every extracted result (or Obsidian note) would get its own copy. With
+`--image-store [DIR]` (default `<output>/_images`) each extracted image is
+stored once, under its SHA-256:
+
+    _images/3f/3fa9c0...e1.jpg
+
+By default (`--image-links rewrite`) a document gets no `images/` folder.
+The `images/...` references in its Markdown and content list are rewritten
+to relative links into the store, e.g. `![](../_images/3f/3fa9c0...e1.jpg)`,
+which Obsidian resolves like any other attachment. With `--image-links
+hardlink` the document keeps its usual `images/` paths, but each file there
+is a hardlink to the stored copy (falling back to a copy across
+filesystems), so the Markdown is untouched and the bytes are on disk once.
+
+Writers in parallel threads or processes may store the same image at the
+same time. Each one writes a temporary file and renames it into place, so
+the stored copy is always complete.
+"""
+
+import atexit
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from mineru_archive import IMAGE_REF, member_kind, select_members
+
+DEFAULT_IMAGE_DIR = "_images"
+LINK_MODES = ("rewrite", "hardlink")
+
+
+class ImageStore:
+    def __init__(self):
+        self.root: Optional[Path] = None
+        self.mode = "rewrite"
+        self.stored = 0
+        self.reused = 0
+        self.saved_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def enable(self, root: Path, mode: str = "rewrite") -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        atexit.register(self.report)
+
+    def put(self, data: bytes, suffix: str) -> Tuple[Path, bool]:
+        """Store `data` under its hash; returns the stored path and whether it is new."""
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        path = self.root / digest[:2] / f"{digest}{suffix.lower()}"
+        if path.exists():
+            with self._lock:
+                self.reused += 1
+                self.saved_bytes += len(data)
+            return path, False
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stored += 1
+        return path, True
+
+    def unpack(self, zf: zipfile.ZipFile, dest: Path, name: str, keep: Optional[Set[str]] = None,
+               referenced_only: bool = False) -> int:
+        """Counterpart of mineru_archive.unpack that routes images through the store;
+        returns bytes written (images only count when first stored)."""
+        members = select_members(zf, keep, referenced_only)
+        images = [i for i in members if member_kind(i.filename) == "images"]
+        others = [i for i in members if member_kind(i.filename) != "images"]
+        zf.extractall(dest, members=others)
+        written = sum(i.file_size for i in others)
+
+        stored: Dict[str, Path] = {}
+        for info in images:
+            stored[info.filename], new = self.put(zf.read(info), Path(info.filename).suffix)
+            if new:
+                written += info.file_size
+        if self.mode == "hardlink":
+            for member, path in stored.items():
+                _link(path, dest / member)
+        else:
+            _rewrite_links(dest, others, stored)
+
+        md = dest / "full.md"
+        if md.exists():
+            md.rename(dest / f"{name}.md")
+        return written
+
+    def report(self) -> None:
+        if self.reused:
+            print(f"🖼️  图片去重: 新增 {self.stored} 张, 复用 {self.reused} 张, "
+                  f"节省 {self.saved_bytes / 2**20:.1f} MB", file=sys.stderr)
+
+
+IMAGES = ImageStore()
+
+
+def _link(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if dst.exists():
+            dst.unlink()
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)  # different filesystem, or no hardlink support
+
+
+def _rewrite_links(dest: Path, members: List[zipfile.ZipInfo], stored: Dict[str, Path]) -> None:
+    """Point `images/...` references in the Markdown / content list at the stored copies."""
+    for info in members:
+        if member_kind(info.filename) not in ("md", "content_list"):
+            continue
+        path = dest / info.filename
+        prefix = info.filename[:len(info.filename) - len(path.name)]
+
+        def target(match):
+            image = stored.get(prefix + match.group(0))
+            if image is None:
+                return match.group(0)
+            rel = Path(os.path.relpath(image, path.parent)).as_posix()
+            return f"<{rel}>" if " " in rel and info.filename.endswith(".md") else rel
+
+        text = path.read_text(encoding="utf-8")
+        path.write_text(IMAGE_REF.sub(target, text), encoding="utf-8")
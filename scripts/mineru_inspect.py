@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+MinerU document inspection - a cheap local look at a file before upload
+
+Reads a PDF's structure with the optional `pypdf` package (`pip install
+pypdf`, or `pip install .[local]`) and summarizes what matters for deciding
+how to parse it: page count, how much of it has a text layer, embedded
+images and how much of the page they cover, math fonts and table-like
+layout. Without pypdf, or for files it
+cannot read, `inspect_pdf` returns None and callers fall back to the remote
+defaults.
+
+    info = inspect_pdf(Path("memo.pdf"))
+    if info and info.text_pages == info.pages:
+        ...
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional
+
+MIN_PAGE_CHARS = 20  # fewer extracted characters than this: no usable text layer on that page
+MATH_FONT = re.compile(r"CMMI|CMSY|CMEX|MSBM|MSAM|Math|STIX|Euclid|Symbol", re.IGNORECASE)
+MATH_CHARS = set("∑∏∫∮√∂∇∞≤≥≠≈≡±∓×÷∈∉∋⊂⊃⊆⊇∪∩∀∃∄→←↔⇒⇐⇔∝∠⊥∥αβγδεζηθικλμνξπρστυφχψωΓΔΘΛΞΠΣΦΨΩ")
+# Two or more runs of 3+ spaces between words in layout-mode text look like table columns
+COLUMN_GAPS = re.compile(r"\S {3,}\S.* {3,}\S")
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+    return pypdf
+
+
+def have_pypdf() -> bool:
+    return _pypdf() is not None
+
+
+class PdfInfo:
+    """What `inspect_pdf` found in the first `inspected` of `pages` pages;
+    `page_text` holds each inspected page's layout-mode text."""
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.inspected = 0
+        self.text_pages = 0
+        self.chars = 0
+        self.image_pages = 0
+        self.image_cover = 0.0  # summed per-page share of the page area drawn as images
+        self.math_fonts = False
+        self.math_chars = 0
+        self.garbled = 0
+        self.table_lines = 0
+        self.page_text: List[str] = []
+
+    @property
+    def has_text_layer(self) -> bool:
+        return self.text_pages > 0
+
+    @property
+    def image_share(self) -> float:
+        """Average share of an inspected page covered by images (0..1)."""
+        return self.image_cover / self.inspected if self.inspected else 0.0
+
+    def to_dict(self) -> dict:
+        data = {k: v for k, v in vars(self).items() if k != "page_text"}
+        data["image_cover"] = round(self.image_cover, 3)
+        return data
+
+
+def _resources(obj) -> dict:
+    res = obj.get("/Resources")
+    return res.get_object() if res is not None else {}
+
+
+def _has_image(resources, depth: int = 0) -> bool:
+    """True if the page (or a form XObject it draws, one level down) uses an image."""
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return False
+    for ref in xobjects.get_object().values():
+        xobj = ref.get_object()
+        subtype = xobj.get("/Subtype")
+        if subtype == "/Image":
+            return True
+        if subtype == "/Form" and depth == 0 and _has_image(_resources(xobj), 1):
+            return True
+    return False
+
+
+def _mul(m, n):
+    """Product of two PDF matrices [a b c d e f] (m applied first)."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
+
+
+def _drawn_area(contents, resources, ctm, reader, depth: int = 0) -> float:
+    """Area (in default user space) of the images a content stream draws; form
+    XObjects are followed one level down."""
+    from pypdf.generic import ContentStream
+
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    area = 0.0
+    stack = []
+    for operands, op in contents.operations:
+        if op == b"q":
+            stack.append(ctm)
+        elif op == b"Q":
+            ctm = stack.pop() if stack else ctm
+        elif op == b"cm" and len(operands) == 6:
+            ctm = _mul([float(x) for x in operands], ctm)
+        elif op == b"Do" and operands:
+            ref = xobjects.get(operands[0])
+            if ref is None:
+                continue
+            xobj = ref.get_object()
+            subtype = xobj.get("/Subtype")
+            if subtype == "/Image":
+                # An image fills the unit square; its area is the matrix determinant
+                area += abs(ctm[0] * ctm[3] - ctm[1] * ctm[2])
+            elif subtype == "/Form" and depth == 0:
+                matrix = [float(x) for x in xobj.get("/Matrix", (1, 0, 0, 1, 0, 0))]
+                area += _drawn_area(ContentStream(xobj, reader), _resources(xobj),
+                                    _mul(matrix, ctm), reader, 1)
+    return area
+
+
+def _image_cover(page, resources) -> float:
+    """Share of the page covered by images, capped at 1 (overlaps count twice)."""
+    box = page.mediabox
+    page_area = float(box.width) * float(box.height)
+    contents = page.get_contents()
+    if not page_area or contents is None:
+        return 0.0
+    ctm = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    return min(1.0, _drawn_area(contents, resources, ctm, page.pdf) / page_area)
+
+
+def _math_font(resources) -> bool:
+    fonts = resources.get("/Font")
+    if fonts is None:
+        return False
+    return any(MATH_FONT.search(str(ref.get_object().get("/BaseFont", "")))
+               for ref in fonts.get_object().values())
+
+
+def page_count(path: Path) -> Optional[int]:
+    """Number of pages, or None without pypdf / for unreadable files."""
+    pypdf = _pypdf()
+    if pypdf is None:
+        return None
+    try:
+        reader = pypdf.PdfReader(str(path))
+        if reader.is_encrypted and not reader.decrypt(""):
+            return None
+        return len(reader.pages)
+    except Exception:
+        return None
+
+
+def inspect_pdf(path: Path, max_pages: Optional[int] = None) -> Optional[PdfInfo]:
+    """Summarize a PDF's text layer and content, looking at no more than `max_pages`
+    pages; None without pypdf or for unreadable files."""
+    pypdf = _pypdf()
+    if pypdf is None:
+        return None
+    try:
+        reader = pypdf.PdfReader(str(path))
+        if reader.is_encrypted and not reader.decrypt(""):
+            return None
+        info = PdfInfo(len(reader.pages))
+        for page in reader.pages[:max_pages]:
+            info.inspected += 1
+            resources = _resources(page)
+            text = page.extract_text(extraction_mode="layout") or ""
+            info.page_text.append(text)
+            stripped = "".join(text.split())
+            info.chars += len(stripped)
+            if len(stripped) >= MIN_PAGE_CHARS:
+                info.text_pages += 1
+            info.garbled += sum(1 for c in stripped if c == "\ufffd" or "\ue000" <= c <= "\uf8ff")
+            info.garbled += text.count("(cid:")
+            info.math_chars += sum(1 for c in stripped if c in MATH_CHARS)
+            info.table_lines += sum(1 for line in text.splitlines() if COLUMN_GAPS.search(line.strip()))
+            if _has_image(resources):
+                info.image_pages += 1
+                info.image_cover += _image_cover(page, resources)
+            if not info.math_fonts and _math_font(resources):
+                info.math_fonts = True
+        return info
+    except Exception:
+        return None
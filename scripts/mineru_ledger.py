@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+MinerU run ledger - defer result downloads to a separate bulk phase
+
+With `--defer-download [LEDGER]` a run records every finished file's
+`full_zip_url` instead of downloading it. The record also holds the batch or
+task the file came from, so an expired URL can be refreshed later. The empty
+output folder is created right away, so `--resume` treats the file as
+handled. Remote parsing then finishes at upload/poll speed, and
+
+    python mineru_download.py LEDGER --workers 32
+
+pulls everything still pending with its own concurrency, possibly on another
+machine closer to the storage. The ledger is append-only JSONL, one line per
+result plus a `done` line once it has been downloaded:
+
+    {"key": "sub/a", "name": "a", "zip_url": "https://...", "batch_id": "...",
+     "data_id": "a", "time": 1718000000.1}
+    {"key": "sub/a", "done": true, "time": 1718000100.4}
+
+`key` is the result folder relative to the run's `--output`, so the output
+tree can be moved or mounted elsewhere: mineru_download.py resolves keys
+against its `--output` (default: the ledger's folder, which is the output
+root for the default ledger). Absolute keys of older ledgers still work.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+DEFAULT_LEDGER = "mineru-pending.jsonl"
+
+
+class Ledger:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.root: Optional[Path] = None  # keys are relative to this (the run's --output)
+        self.recorded = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self, path: Path) -> "Ledger":
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def enable(self, path: Path, root: Path) -> None:
+        """Record results under output root `root` into `path` instead of downloading them."""
+        self.open(path)
+        self.root = Path(root)
+        self.enabled = True
+        atexit.register(self.close)
+
+    def _append(self, entry: dict) -> None:
+        entry["time"] = time.time()
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def record(self, extract_dir: Path, name: str, zip_url: str, source: Optional[dict] = None) -> None:
+        """Add a finished result; `source` identifies its batch (`batch_id`, `data_id`,
+        `file_name`) or URL task (`task_id`) for refreshing the URL."""
+        entry = {"key": self.key(extract_dir), "name": name, "zip_url": zip_url}
+        entry.update({k: v for k, v in (source or {}).items() if v is not None})
+        self._append(entry)
+        with self._lock:
+            self.recorded += 1
+
+    def key(self, extract_dir: Path) -> str:
+        """`extract_dir` relative to the output root, with `/` separators."""
+        return Path(os.path.relpath(Path(extract_dir).resolve(), self.root.resolve())).as_posix()
+
+    def mark_done(self, key: str) -> None:
+        self._append({"key": key, "done": True})
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file:
+                return
+            self._file.close()
+            self._file = None
+        if self.enabled and self.recorded:
+            rebase = "" if self.path.parent.resolve() == self.root.resolve() else f" --output {self.root}"
+            print(f"📝 {self.recorded} 个结果待下载: python mineru_download.py {self.path}{rebase}",
+                  file=sys.stderr)
+
+
+LEDGER = Ledger()
+
+
+def read_pending(path: Path) -> Iterator[dict]:
+    """Yield the entries of a ledger that have no `done` line, in recording order."""
+    pending: Dict[str, dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if entry.get("done"):
+                pending.pop(entry["key"], None)
+            else:
+                pending[entry["key"]] = entry
+    yield from pending.values()
+
+
+def add_ledger_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--defer-download", nargs="?", const="", metavar="LEDGER",
+                        help=f"Record result URLs instead of downloading them "
+                             f"(default ledger: <output>/{DEFAULT_LEDGER}); "
+                             f"fetch later with mineru_download.py")
+
+
+def setup_ledger(args: argparse.Namespace) -> None:
+    ledger = getattr(args, "defer_download", None)
+    if ledger is not None:
+        LEDGER.enable(Path(ledger or Path(args.output) / DEFAULT_LEDGER), Path(args.output))
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+MinerU local fast path - born-digital documents converted in-process
+
+With `--local`, files that do not need the remote VLM become Markdown
+without uploading them, so there is no network or queue latency:
+
+    .docx   paragraphs, headings, lists, bold/italic, links, simple tables
+            and embedded images, read straight from the OOXML (stdlib only)
+    .pdf    text-layer PDFs with no images, formulas or table-like layout
+            and at most LOCAL_MAX_PAGES pages (needs `pypdf`, see
+            mineru_inspect)
+
+Anything the checks are unsure about still goes to the API. That covers
+equations, charts, text boxes, footnotes and merged table cells in Word
+files; scanned or sparse pages, images, math fonts, column layouts and
+garbled text in PDFs; and requests with `is_ocr` or `page_ranges`. The result is packed like
+an API result (`full.md` + `images/`) and handed to the same output backend,
+so --keep, --archive, --store and --image-store work unchanged. The run
+ends with a count of local conversions and of fallback reasons.
+"""
+
+import argparse
+import atexit
+import re
+import sys
+import threading
+import zipfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from mineru_download import finish_result
+from mineru_inspect import have_pypdf, inspect_pdf
+from mineru_metrics import timed
+
+LOCAL_EXTS = {".docx", ".pdf"}
+LOCAL_MAX_PAGES = 30
+MIN_AVG_CHARS = 200  # per page; less is more likely a scan, slides or a form
+MAX_TABLE_LINES = 2
+MAX_MATH_CHARS = 4
+MAX_GARBLED = 0.005  # share of extracted characters
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Word content the local converter cannot render faithfully: (namespace or tag, reason)
+DOCX_UNSURE = (
+    ("{http://schemas.openxmlformats.org/officeDocument/2006/math}", "公式"),
+    ("{http://schemas.openxmlformats.org/drawingml/2006/chart}", "图表"),
+    ("{http://schemas.openxmlformats.org/drawingml/2006/diagram}", "图表"),
+    (f"{W}txbxContent", "文本框"),
+    (f"{W}footnoteReference", "脚注"),
+    (f"{W}endnoteReference", "脚注"),
+    (f"{W}object", "嵌入对象"),
+    (f"{W}altChunk", "嵌入对象"),
+    (f"{W}vMerge", "合并单元格"),
+    ("{urn:schemas-microsoft-com:vml}", "旧式图形"),
+)
+HEADING_STYLE = re.compile(r"^(?:heading|标题)\s*(\d)$", re.IGNORECASE)
+NUMBERED_HEADING = re.compile(r"^\d+(?:\.\d+)*\.?\s+\S")
+SENTENCE_END = tuple(".:!?;。！？；：")
+LIST_ITEM = re.compile(r"^\s*(?:-|1\.) ")
+
+
+class Unsure(Exception):
+    """The local path cannot convert this file faithfully; the reason is the message."""
+
+
+# ============ .docx ============
+
+def _on(element, tag: str) -> bool:
+    """A run property like <w:b/> is on unless w:val says 0/false/none."""
+    prop = element.find(tag)
+    return prop is not None and prop.get(f"{W}val", "true") not in ("0", "false", "none")
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    try:
+        root = ElementTree.fromstring(zf.read(part))
+    except KeyError:
+        return {}
+    return {r.get("Id"): r.get("Target") for r in root.iter(f"{PKG_REL}Relationship")}
+
+
+class DocxConverter:
+    def __init__(self, zf: zipfile.ZipFile):
+        self.zf = zf
+        self.rels = _rels(zf, "word/_rels/document.xml.rels")
+        self.images: Dict[str, bytes] = {}
+        self.headings: Dict[str, int] = {}  # styleId -> heading level
+        self.list_styles: Dict[str, object] = {}  # styleId -> its <w:numPr>
+        self._read_styles()
+        self.ordered = self._ordered_lists()
+
+    def _read_styles(self) -> None:
+        """Heading levels and list numbering by style (built-in style names are English
+        in any UI language)."""
+        try:
+            root = ElementTree.fromstring(self.zf.read("word/styles.xml"))
+        except KeyError:
+            return
+        for style in root.iter(f"{W}style"):
+            style_id = style.get(f"{W}styleId")
+            name = style.find(f"{W}name")
+            name = (name.get(f"{W}val") if name is not None else "") or ""
+            match = HEADING_STYLE.match(name.strip())
+            if match:
+                self.headings[style_id] = int(match.group(1))
+            elif name.lower() == "title":
+                self.headings[style_id] = 1
+            num = style.find(f"{W}pPr/{W}numPr")
+            if num is not None:
+                self.list_styles[style_id] = num
+
+    def _ordered_lists(self) -> Dict[Tuple[str, str], bool]:
+        """(numId, ilvl) -> True for numbered, False for bulleted list levels."""
+        try:
+            root = ElementTree.fromstring(self.zf.read("word/numbering.xml"))
+        except KeyError:
+            return {}
+        abstract = {}
+        for a in root.iter(f"{W}abstractNum"):
+            for lvl in a.iter(f"{W}lvl"):
+                fmt = lvl.find(f"{W}numFmt")
+                ordered = fmt is not None and fmt.get(f"{W}val") not in ("bullet", "none")
+                abstract[(a.get(f"{W}abstractNumId"), lvl.get(f"{W}ilvl"))] = ordered
+        ordered = {}
+        for num in root.iter(f"{W}num"):
+            ref = num.find(f"{W}abstractNumId")
+            if ref is None:
+                continue
+            for (abstract_id, ilvl), value in abstract.items():
+                if abstract_id == ref.get(f"{W}val"):
+                    ordered[(num.get(f"{W}numId"), ilvl)] = value
+        return ordered
+
+    def _image(self, rel_id: str) -> str:
+        target = self.rels.get(rel_id, "")
+        member = target.lstrip("/") if target.startswith("/") else "word/" + target
+        name = Path(target).name
+        try:
+            self.images.setdefault(name, self.zf.read(member))
+        except KeyError:
+            raise Unsure("图片缺失")
+        return f"![](images/{name})"
+
+    def _runs(self, parent, link: Optional[str] = None) -> List[Tuple[str, bool, bool, Optional[str]]]:
+        """(text, bold, italic, link) segments of a paragraph, in document order."""
+        segments = []
+        for child in parent:
+            if child.tag == f"{W}r":
+                props = child.find(f"{W}rPr")
+                bold = props is not None and _on(props, f"{W}b")
+                italic = props is not None and _on(props, f"{W}i")
+                for node in child:
+                    if node.tag == f"{W}t":
+                        segments.append((node.text or "", bold, italic, link))
+                    elif node.tag == f"{W}tab":
+                        segments.append(("\t", bold, italic, link))
+                    elif node.tag in (f"{W}br", f"{W}cr"):
+                        segments.append(("  \n", False, False, None))
+                    elif node.tag == f"{W}drawing":
+                        for blip in node.iter(f"{A}blip"):
+                            segments.append((self._image(blip.get(f"{R}embed")), False, False, None))
+            elif child.tag == f"{W}hyperlink":
+                target = self.rels.get(child.get(f"{R}id"))
+                segments += self._runs(child, target or link)
+            elif child.tag in (f"{W}ins", f"{W}smartTag", f"{W}sdt", f"{W}sdtContent",
+                               f"{W}fldSimple"):
+                segments += self._runs(child, link)
+        return segments
+
+    @staticmethod
+    def _render(segments) -> str:
+        merged: List[list] = []
+        for text, bold, italic, link in segments:
+            if merged and merged[-1][1:] == [bold, italic, link]:
+                merged[-1][0] += text
+            else:
+                merged.append([text, bold, italic, link])
+        out = []
+        for text, bold, italic, link in merged:
+            core = text.strip()
+            if not core or text.startswith("!["):
+                out.append(text)
+                continue
+            if italic:
+                core = f"*{core}*"
+            if bold:
+                core = f"**{core}**"
+            if link:
+                core = f"[{core}]({link})"
+            lead = text[:len(text) - len(text.lstrip())]
+            trail = text[len(text.rstrip()):]
+            out.append(lead + core + trail)
+        return "".join(out).strip()
+
+    def paragraph(self, p) -> str:
+        props = p.find(f"{W}pPr")
+        text = self._render(self._runs(p))
+        if not text or props is None:
+            return text
+        style = props.find(f"{W}pStyle")
+        style = style.get(f"{W}val") if style is not None else None
+        level = self.headings.get(style)
+        if level:
+            return "#" * min(level, 6) + " " + text.replace("  \n", " ")
+        num = props.find(f"{W}numPr")
+        if num is None:
+            num = self.list_styles.get(style)
+        if num is not None:
+            ilvl = num.find(f"{W}ilvl")
+            num_id = num.find(f"{W}numId")
+            ilvl = ilvl.get(f"{W}val", "0") if ilvl is not None else "0"
+            num_id = num_id.get(f"{W}val") if num_id is not None else None
+            if num_id not in (None, "0"):
+                marker = "1." if self.ordered.get((num_id, ilvl)) else "-"
+                return "   " * int(ilvl) + f"{marker} {text}"
+        return text
+
+    def table(self, tbl) -> str:
+        rows = []
+        for tr in tbl.iter(f"{W}tr"):
+            cells = []
+            for tc in tr.findall(f"{W}tc"):
+                span = tc.find(f"{W}tcPr/{W}gridSpan")
+                if span is not None and span.get(f"{W}val", "1") != "1":
+                    raise Unsure("合并单元格")
+                if tc.find(f".//{W}tbl") is not None:
+                    raise Unsure("嵌套表格")
+                text = "<br>".join(filter(None, (self.paragraph(p) for p in tc.iter(f"{W}p"))))
+                cells.append(text.replace("|", "\\|").replace("\n", " "))
+            rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(r) for r in rows)
+        rows = [r + [""] * (width - len(r)) for r in rows]
+        lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+        lines += ["| " + " | ".join(r) + " |" for r in rows[1:]]
+        return "\n".join(lines)
+
+    def blocks(self, parent) -> List[str]:
+        out = []
+        for child in parent:
+            if child.tag == f"{W}p":
+                out.append(self.paragraph(child))
+            elif child.tag == f"{W}tbl":
+                out.append(self.table(child))
+            elif child.tag in (f"{W}sdt", f"{W}sdtContent", f"{W}customXml"):
+                out += self.blocks(child)
+        return out
+
+    def convert(self) -> str:
+        root = ElementTree.fromstring(self.zf.read("word/document.xml"))
+        for element in root.iter():
+            for marker, reason in DOCX_UNSURE:
+                if element.tag.startswith(marker):
+                    raise Unsure(reason)
+        body = root.find(f"{W}body")
+        blocks = [b for b in self.blocks(body) if b] if body is not None else []
+        if not blocks:
+            raise Unsure("内容为空")
+        # Consecutive list items stay together; everything else is one block per paragraph
+        text = blocks[0]
+        for prev, block in zip(blocks, blocks[1:]):
+            text += ("\n" if LIST_ITEM.match(prev) and LIST_ITEM.match(block) else "\n\n") + block
+        return text + "\n"
+
+
+def docx_markdown(path: Path) -> Tuple[str, Dict[str, bytes]]:
+    """Markdown and images of a .docx; raises Unsure for content it cannot render."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            converter = DocxConverter(zf)
+            return converter.convert(), converter.images
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        raise Unsure("无法读取")
+
+
+# ============ text-layer .pdf ============
+
+def _pdf_unsure(info) -> Optional[str]:
+    if info.pages > LOCAL_MAX_PAGES:
+        return "页数过多"
+    if info.text_pages < info.pages:
+        return "无文字层"
+    if info.chars < MIN_AVG_CHARS * info.pages:
+        return "文字稀疏"
+    if info.image_pages:
+        return "图片"
+    if info.math_fonts or info.math_chars > MAX_MATH_CHARS:
+        return "公式"
+    if info.table_lines > MAX_TABLE_LINES:
+        return "表格"
+    if info.garbled > MAX_GARBLED * info.chars:
+        return "乱码"
+    return None
+
+
+def _page_lines(text: str) -> List[str]:
+    """Layout-mode lines with spacing collapsed; blank lines kept, page numbers dropped."""
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return [line for line in lines if not line.isdigit()]
+
+
+def _join(a: str, b: str) -> str:
+    if a.endswith("-") and len(a) > 1 and a[-2].isalpha() and b[:1].islower():
+        return a[:-1] + b
+    if re.search(r"[\u3000-\u9fff\uff00-\uffef]$", a) and re.match(r"[\u3000-\u9fff\uff00-\uffef]", b):
+        return a + b
+    return f"{a} {b}"
+
+
+def text_markdown(pages: List[str]) -> str:
+    """Paragraphs (and numbered section headings) from layout-mode page text."""
+    lines = [line for page in pages for line in _page_lines(page) + [""]]
+    widths = sorted(len(line) for line in lines if line)
+    full = widths[int(len(widths) * 0.9)] if widths else 0
+    blocks: List[str] = []
+    current = ""
+    for line in lines + [""]:
+        if not line:
+            if current:
+                blocks.append(current)
+            current = ""
+            continue
+        heading = (NUMBERED_HEADING.match(line) and len(line) < 80
+                   and not line.endswith(SENTENCE_END) and not current)
+        if heading:
+            blocks.append("# " + line)
+            continue
+        current = _join(current, line) if current else line
+        # A short line that ends a sentence closes the paragraph
+        if line.endswith(SENTENCE_END) and len(line) < 0.7 * full:
+            blocks.append(current)
+            current = ""
+    return "\n\n".join(blocks) + "\n"
+
+
+def pdf_markdown(path: Path) -> str:
+    """Markdown of a clean text-layer PDF; raises Unsure for anything else."""
+    if not have_pypdf():
+        raise Unsure("未安装 pypdf")
+    info = inspect_pdf(path, LOCAL_MAX_PAGES + 1)
+    if info is None:
+        raise Unsure("无法读取")
+    reason = _pdf_unsure(info)
+    if reason:
+        raise Unsure(reason)
+    return text_markdown(info.page_text)
+
+
+# ============ output ============
+
+class LocalPath:
+    """The --local switch plus counts for the end-of-run report."""
+
+    def __init__(self):
+        self.enabled = False
+        self.converted = 0
+        self.fallbacks: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+        atexit.register(self.report)
+
+    def convert(self, source: Path, output_dir: Path, name: str,
+                options: Optional[dict] = None) -> Optional[Path]:
+        """Convert `source` in-process into the output backend; None to use the API."""
+        suffix = source.suffix.lower()
+        if suffix not in LOCAL_EXTS:
+            return None
+        zip_path = output_dir / f"{name}.zip"
+        try:
+            with timed("local"):
+                if (options or {}).get("is_ocr"):
+                    raise Unsure("需要 OCR")
+                if (options or {}).get("page_ranges"):
+                    raise Unsure("页码范围")
+                if suffix == ".docx":
+                    markdown, images = docx_markdown(source)
+                else:
+                    markdown, images = pdf_markdown(source), {}
+                with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+                    zf.writestr("full.md", markdown)
+                    for image, data in images.items():
+                        zf.writestr(f"images/{image}", data)
+            output = finish_result(zip_path, output_dir, name)
+        except Exception as e:
+            zip_path.unlink(missing_ok=True)  # half-written, or not taken by the backend
+            reason = str(e) if isinstance(e, Unsure) else "转换出错"
+            with self._lock:
+                self.fallbacks[reason] += 1
+            return None
+        with self._lock:
+            self.converted += 1
+        return output
+
+    def report(self) -> None:
+        if not self.converted and not self.fallbacks:
+            return
+        reasons = ", ".join(f"{r} {n}" for r, n in self.fallbacks.most_common())
+        print(f"⚡ 本地转换: {self.converted} 个"
+              + (f", 转交 API: {sum(self.fallbacks.values())} 个 ({reasons})" if reasons else ""),
+              file=sys.stderr)
+
+
+LOCAL = LocalPath()
+
+
+def add_local_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--local", action="store_true",
+                        help="Convert .docx and clean text-layer PDFs in-process instead of "
+                             "uploading them (unsure files still go to the API)")
+
+
+def setup_local(args: argparse.Namespace) -> None:
+    if getattr(args, "local", False):
+        LOCAL.enable()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+MinerU stage metrics - per-file lifecycle timings as histograms
+
+Every file passes through the same stages:
+
+    scan          time the input scanner spent before yielding the file
+    hash          content hashing (sync/dedup modes)
+    create_batch  requesting upload URLs / creating the task
+    upload        PUT of the file body
+    queue         server-side `pending` (upload finished -> first seen `running`)
+    parse         server-side `running` (first seen `running` -> first seen `done`)
+    detect        poll gap before `done` was noticed (upper bound of detection lag)
+    download      fetching the result ZIP
+    extract       unpacking the ZIP
+    local         in-process conversion instead of the API (--local)
+    route         local inspection that picks model and OCR (--route)
+
+Durations (and byte counts where relevant) are aggregated into fixed-bucket
+histograms and written as JSON plus a Prometheus textfile-collector file.
+Collection is off unless `enable()` is called, in which case recording costs
+one lock acquisition per stage.
+
+Usage:
+    with timed("upload") as t:
+        upload(...)
+        t.bytes = size
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from mineru_events import EVENTS, PROGRESS, active, file_result
+from mineru_events import enabled as events_enabled
+from mineru_hedge import HEDGER
+from mineru_profile import PROFILER
+from mineru_trace import TRACER, server_span, span
+
+STAGES = (
+    "scan", "hash", "create_batch", "upload", "queue", "parse", "detect", "download", "extract",
+    "local", "route",
+)
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+FLUSH_INTERVAL = 15.0
+
+_item_timings: contextvars.ContextVar = contextvars.ContextVar("mineru_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram compatible with the Prometheus text format."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.bytes = 0
+
+    def observe(self, seconds: float, nbytes: int = 0) -> None:
+        self.count += 1
+        self.sum += seconds
+        self.bytes += nbytes
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(BUCKETS, self.counts):
+            if n and seen + n >= target:
+                estimate = lower + (bound - lower) * (target - seen) / n
+                return min(max(estimate, self.min), self.max)
+            seen += n
+            lower = bound
+        return self.max
+
+    def to_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(BUCKETS, self.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "bytes": self.bytes,
+            "buckets": buckets,
+        }
+
+
+class _Timer:
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.stages: Dict[str, Histogram] = {}
+        self.files: Dict[str, int] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def enable(self, path: Path, flush_interval: float = FLUSH_INTERVAL) -> None:
+        """Start collecting; write `<path>` (JSON) and `<path stem>.prom` periodically and at exit."""
+        self.enabled = True
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atexit.register(self.flush)
+        if flush_interval and self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, args=(flush_interval,), name="metrics-flush", daemon=True
+            )
+            self._flusher.start()
+
+    def observe(self, stage: str, seconds: float, nbytes: int = 0) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(max(0.0, seconds), nbytes)
+
+    def file_done(self, result: str, n: int = 1) -> None:
+        """Count finished files by result (`success`, `failed`, `skipped`)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.files[result] = self.files.get(result, 0) + n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snap = {
+                "started": self.started,
+                "elapsed": round(time.time() - self.started, 3),
+                "files": dict(self.files),
+                "stages": {
+                    name: self.stages[name].to_dict()
+                    for name in sorted(self.stages, key=_stage_order)
+                },
+            }
+        if HEDGER.enabled:
+            snap["hedging"] = HEDGER.stats()
+        return snap
+
+    def prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            "# HELP mineru_stage_seconds Time spent per file in each pipeline stage.",
+            "# TYPE mineru_stage_seconds histogram",
+        ]
+        for stage, data in snap["stages"].items():
+            for bound, cumulative in data["buckets"].items():
+                lines.append(f'mineru_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'mineru_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+            lines.append(f'mineru_stage_seconds_sum{{stage="{stage}"}} {data["sum"]}')
+            lines.append(f'mineru_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+        lines += [
+            "# HELP mineru_stage_bytes_total Bytes transferred per pipeline stage.",
+            "# TYPE mineru_stage_bytes_total counter",
+        ]
+        for stage, data in snap["stages"].items():
+            if data["bytes"]:
+                lines.append(f'mineru_stage_bytes_total{{stage="{stage}"}} {data["bytes"]}')
+        lines += [
+            "# HELP mineru_files_total Files finished, by result.",
+            "# TYPE mineru_files_total counter",
+        ]
+        for result, n in sorted(snap["files"].items()):
+            lines.append(f'mineru_files_total{{result="{result}"}} {n}')
+        lines += [
+            "# HELP mineru_run_started_seconds Unix time the run started.",
+            "# TYPE mineru_run_started_seconds gauge",
+            f"mineru_run_started_seconds {snap['started']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """Write the JSON and Prometheus files atomically (textfile collectors need that)."""
+        if not self.enabled or not self.path:
+            return
+        _atomic_write(self.path, json.dumps(self.snapshot(), indent=2))
+        _atomic_write(self.path.with_suffix(".prom"), self.prometheus())
+
+    def _flush_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+
+def _stage_order(name: str) -> tuple:
+    return (STAGES.index(name) if name in STAGES else len(STAGES), name)
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def timed(stage: str, nbytes: int = 0) -> Iterator[_Timer]:
+    """Time the enclosed block as one observation of `stage`.
+
+    Set `.bytes` on the yielded object to attach a byte count. Nothing is
+    recorded in the histograms if the block raises; with tracing on, the
+    block is also emitted as a span (failed ones included).
+    """
+    timer = _Timer()
+    timer.bytes = nbytes
+    timings = _item_timings.get()
+    if not (METRICS.enabled or TRACER.enabled or PROFILER.enabled or events_enabled()
+            or timings is not None):
+        yield timer
+        return
+    start = time.perf_counter()
+    ok = False
+    try:
+        with active(stage), span(stage) as args:
+            yield timer
+            if timer.bytes:
+                args["bytes"] = timer.bytes
+        ok = True
+    finally:
+        PROFILER.stage_boundary(stage)
+        seconds = time.perf_counter() - start
+        EVENTS.emit("stage", stage=stage, seconds=round(seconds, 4), bytes=timer.bytes, ok=ok)
+    observe(stage, seconds, timer.bytes)
+
+
+def observe(stage: str, seconds: float, nbytes: int = 0) -> None:
+    METRICS.observe(stage, seconds, nbytes)
+    timings = _item_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + max(0.0, seconds), 4)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """Also sum the stage timings of the enclosed block (one document) into the yielded dict.
+
+    Works without --metrics; the dict follows the current thread / asyncio task.
+    """
+    timings: Dict[str, float] = {}
+    token = _item_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _item_timings.reset(token)
+
+
+def file_done(result: str, n: int = 1) -> None:
+    METRICS.file_done(result, n)
+    file_result(result, n)
+
+
+def timed_iter(stage: str, items: Iterable) -> Iterator:
+    """Yield from `items`, recording the time spent producing each item as `stage`."""
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            PROGRESS.scan_finished()
+            return
+        METRICS.observe(stage, time.perf_counter() - start)
+        PROGRESS.discovered()
+        yield item
+
+
+class PollTracker:
+    """Turn a file's sequence of polled states into queue/parse/detect timings.
+
+    Call `uploaded()` when the upload finishes and `update(state)` after every
+    status poll. The server's transitions are only visible at poll times, so
+    `queue`/`parse` are measured between first sightings and `detect` is the
+    gap between the last poll that did not see `done` and the one that did.
+    """
+
+    def __init__(self, upload_end: Optional[float] = None):
+        self.upload_end = time.time() if upload_end is None else upload_end
+        self.running_seen = None
+        self.last_poll = None
+        self.last_state = None
+        self.finished = False
+        if PROGRESS.enabled:
+            PROGRESS.track(self)
+
+    def uploaded(self) -> None:
+        self.upload_end = time.time()
+
+    def update(self, state: Optional[str]) -> None:
+        if self.finished or not (METRICS.enabled or TRACER.enabled or events_enabled()
+                                 or _item_timings.get() is not None):
+            return
+        now = time.time()
+        if state != self.last_state:
+            self.last_state = state
+            EVENTS.emit("poll", state=state, waited=round(now - self.upload_end, 3))
+        if state == "running" and self.running_seen is None:
+            self.running_seen = now
+            observe("queue", now - self.upload_end)
+            server_span("queue", self.upload_end, now)
+        elif state in ("done", "failed"):
+            self.finished = True
+            if self.running_seen is None:
+                # Never saw `running`: attribute the whole wait to the queue stage
+                observe("queue", now - self.upload_end)
+                server_span("queue", self.upload_end, now, state=state)
+            else:
+                observe("parse", now - self.running_seen)
+                server_span("parse", self.running_seen, now, state=state)
+            if self.last_poll is not None:
+                observe("detect", now - self.last_poll)
+        self.last_poll = now
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write per-stage timing histograms to PATH (JSON) and "
+                             "PATH with .prom suffix (Prometheus textfile)")
+
+
+def setup_metrics(args: argparse.Namespace) -> None:
+    if getattr(args, "metrics", None):
+        METRICS.enable(Path(args.metrics))
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+MinerU mock server - offline stand-in for the MinerU v4 API
+
+Implements the endpoints the scripts use, with configurable latency, result
+size and failure rates, so engines can be compared without touching the real
+API or the daily quota:
+
+    POST /api/v4/file-urls/batch              upload URLs for local files
+    PUT  /upload/{batch_id}/{index}           presigned upload target
+    GET  /api/v4/extract-results/batch/{id}   batch status
+    POST /api/v4/extract/task                 URL task
+    GET  /api/v4/extract/task/{task_id}       URL task status
+    GET  /download/{key}.zip                  result archive (supports Range/ETag)
+
+    GET  /_mock/stats                         request counts + per-file timings
+    POST /_mock/reset                         clear all state
+
+`--bad-tokens` and `--token-quota` make tokens fail with A0202 / -60018, and a
+batch or task polled with a token other than the one that created it is
+"not found", as with separate accounts.
+
+Distributions are written as `fixed:S`, `uniform:A,B`, `normal:MEAN,SD`,
+`lognormal:MU,SIGMA` (of ln seconds) or `exp:MEAN`. Sizes accept k/m suffixes.
+
+Usage:
+    python mineru_mock.py --port 18080 --parse-latency uniform:2,8 --fail-rate 0.02
+    MINERU_API_BASE=http://127.0.0.1:18080/api/v4 MINERU_TOKEN=x python mineru_v2.py --dir ...
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+DEFAULT_PORT = 18080
+
+
+def parse_distribution(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Turn a `kind:args` spec into a sampler returning non-negative floats."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda: max(0.0, values[0])
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"unknown distribution: {spec}")
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def parse_size_distribution(spec: str, rng: random.Random) -> Callable[[], int]:
+    kind, _, params = spec.partition(":")
+    if not params:
+        size = parse_size(kind)
+        return lambda: size
+    values = [parse_size(v) for v in params.split(",")]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.randint(values[0], values[1])
+    raise ValueError(f"unknown size distribution: {spec}")
+
+
+class MockDoc:
+    """One document in a batch (or one URL task) and its simulated lifecycle."""
+
+    def __init__(self, name: str, data_id: Optional[str]):
+        self.key = uuid.uuid4().hex
+        self.name = name
+        self.data_id = data_id
+        self.created = time.time()
+        self.uploaded = None
+        self.queue_time = 0.0
+        self.parse_time = 0.0
+        self.fail = False
+        self.size = 0
+        self.first_download = None
+        self.downloads = 0
+
+    def start(self, queue_time: float, parse_time: float, fail: bool, size: int) -> None:
+        self.uploaded = time.time()
+        self.queue_time = queue_time
+        self.parse_time = parse_time
+        self.fail = fail
+        self.size = size
+
+    def state(self, now: float) -> str:
+        if self.uploaded is None:
+            return "waiting-file"
+        elapsed = now - self.uploaded
+        if elapsed < self.queue_time:
+            return "pending"
+        if elapsed < self.queue_time + self.parse_time:
+            return "running"
+        return "failed" if self.fail else "done"
+
+
+class MockMinerU:
+    def __init__(self, args: argparse.Namespace):
+        self.rng = random.Random(args.seed)
+        self.queue_latency = parse_distribution(args.queue_latency, self.rng)
+        self.parse_latency = parse_distribution(args.parse_latency, self.rng)
+        self.result_size = parse_size_distribution(args.result_size, self.rng)
+        self.fail_rate = args.fail_rate
+        self.error_rate = args.error_rate
+        self.upload_error_rate = args.upload_error_rate
+        self.download_delay = args.download_delay
+        self.stall_rate = args.stall_rate
+        self.stall_time = args.stall_time
+        self.drop_rate = args.drop_rate
+        self.url_ttl = args.url_ttl
+        self.bad_tokens = set(filter(None, (args.bad_tokens or "").split(",")))
+        self.token_quota = args.token_quota
+        self.zip_dir = Path(tempfile.mkdtemp(prefix="mineru_mock_"))
+        self.reset()
+
+    def reset(self) -> None:
+        self.batches: Dict[str, list] = {}
+        self.tasks: Dict[str, MockDoc] = {}
+        self.docs: Dict[str, MockDoc] = {}
+        self.requests = Counter()
+        self.token_requests = Counter()
+        self.token_docs = Counter()
+        self.owners: Dict[str, str] = {}
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.started = time.time()
+        shutil.rmtree(self.zip_dir, ignore_errors=True)
+        self.zip_dir.mkdir(parents=True, exist_ok=True)
+
+    # ============ Helpers ============
+
+    def _api_error(self) -> Optional[web.Response]:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            if self.rng.random() < 0.5:
+                return web.Response(status=500, text="mock internal error")
+            return web.json_response({"code": -500, "msg": "mock transient error"})
+        return None
+
+    def _auth(self, request: web.Request, docs: int = 0) -> Tuple[str, Optional[web.Response]]:
+        token = request.headers.get("Authorization", "")[len("Bearer "):]
+        self.token_requests[token] += 1
+        if token in self.bad_tokens:
+            return token, web.json_response({"code": "A0202", "msg": "token error"})
+        if self.token_quota and self.token_docs[token] + docs > self.token_quota:
+            return token, web.json_response({"code": -60018, "msg": "daily parse limit reached"})
+        self.token_docs[token] += docs
+        return token, None
+
+    def _foreign(self, request: web.Request, job_id: str) -> bool:
+        token, _ = self._auth(request)
+        return self.owners.get(job_id, token) != token
+
+    def _start(self, doc: MockDoc) -> None:
+        doc.start(
+            self.queue_latency(),
+            self.parse_latency(),
+            self.rng.random() < self.fail_rate,
+            self.result_size(),
+        )
+
+    def _result(self, doc: MockDoc, base: str) -> dict:
+        state = doc.state(time.time())
+        entry = {"file_name": doc.name, "state": state, "err_msg": "", "full_zip_url": ""}
+        if doc.data_id is not None:
+            entry["data_id"] = doc.data_id
+        if state == "running":
+            entry["extract_progress"] = {"extracted_pages": 1, "total_pages": 2,
+                                         "start_time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        elif state == "done":
+            entry["full_zip_url"] = f"{base}/download/{doc.key}.zip"
+            if self.url_ttl:
+                entry["full_zip_url"] += f"?expires={time.time() + self.url_ttl:.0f}"
+        elif state == "failed":
+            entry["err_msg"] = "mock parse failure"
+        return entry
+
+    def _build_zip(self, doc: MockDoc) -> Path:
+        path = self.zip_dir / f"{doc.key}.zip"
+        if path.exists():
+            return path
+        stem = Path(doc.name).stem or "document"
+        image_names = ["images/fig_0.jpg", "images/fig_1.jpg", "images/unused.jpg"]
+        markdown = (
+            f"# {stem}\n\nMock parse result.\n\n"
+            f"![]({image_names[0]})\n\nSome text with $E=mc^2$.\n\n![]({image_names[1]})\n"
+        )
+        content_list = [{"type": "text", "text": stem, "page_idx": 0}]
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr("full.md", markdown)
+            zf.writestr("layout.json", json.dumps({"pdf_info": []}))
+            zf.writestr(f"{stem}_content_list.json", json.dumps(content_list))
+            zf.writestr(f"{stem}_model.json", "[]")
+            zf.writestr(f"{stem}_origin.pdf", b"%PDF-1.4\n%mock\n")
+            # Pad with incompressible image bytes to reach the sampled size
+            padding = max(0, doc.size - 2048)
+            per_image = padding // len(image_names)
+            for name in image_names:
+                zf.writestr(name, os.urandom(per_image))
+        tmp.replace(path)
+        return path
+
+    # ============ API handlers ============
+
+    async def file_urls(self, request: web.Request) -> web.Response:
+        self.requests["file-urls/batch"] += 1
+        error = self._api_error()
+        if error:
+            return error
+        body = await request.json()
+        token, denied = self._auth(request, len(body.get("files", [])))
+        if denied:
+            return denied
+        batch_id = uuid.uuid4().hex
+        self.owners[batch_id] = token
+        docs = [MockDoc(f.get("name", "document.pdf"), f.get("data_id")) for f in body.get("files", [])]
+        self.batches[batch_id] = docs
+        for doc in docs:
+            self.docs[doc.key] = doc
+        base = f"{request.scheme}://{request.host}"
+        urls = [f"{base}/upload/{batch_id}/{i}" for i in range(len(docs))]
+        return web.json_response({"code": 0, "msg": "ok", "data": {"batch_id": batch_id, "file_urls": urls}})
+
+    async def upload(self, request: web.Request) -> web.Response:
+        self.requests["upload"] += 1
+        docs = self.batches.get(request.match_info["batch_id"])
+        index = int(request.match_info["index"])
+        if not docs or index >= len(docs):
+            return web.Response(status=404)
+        size = 0
+        async for chunk in request.content.iter_chunked(1 << 16):
+            size += len(chunk)
+        self.bytes_uploaded += size
+        if self.upload_error_rate and self.rng.random() < self.upload_error_rate:
+            return web.Response(status=503)
+        self._start(docs[index])
+        return web.Response(status=200)
+
+    async def batch_status(self, request: web.Request) -> web.Response:
+        self.requests["extract-results/batch"] += 1
+        await self._maybe_stall()
+        error = self._api_error()
+        if error:
+            return error
+        batch_id = request.match_info["batch_id"]
+        docs = self.batches.get(batch_id)
+        if docs is None or self._foreign(request, batch_id):
+            return web.json_response({"code": -60012, "msg": "batch not found"})
+        base = f"{request.scheme}://{request.host}"
+        results = [self._result(d, base) for d in docs if d.uploaded is not None]
+        return web.json_response({"code": 0, "msg": "ok",
+                                  "data": {"batch_id": batch_id, "extract_result": results}})
+
+    async def create_task(self, request: web.Request) -> web.Response:
+        self.requests["extract/task"] += 1
+        error = self._api_error()
+        if error:
+            return error
+        body = await request.json()
+        token, denied = self._auth(request, 1)
+        if denied:
+            return denied
+        url = body.get("url", "")
+        name = Path(url.split("?")[0]).name or "document.pdf"
+        doc = MockDoc(name, body.get("data_id"))
+        self._start(doc)
+        task_id = uuid.uuid4().hex
+        self.owners[task_id] = token
+        self.tasks[task_id] = doc
+        self.docs[doc.key] = doc
+        return web.json_response({"code": 0, "msg": "ok", "data": {"task_id": task_id}})
+
+    async def task_status(self, request: web.Request) -> web.Response:
+        self.requests["extract/task/{id}"] += 1
+        await self._maybe_stall()
+        error = self._api_error()
+        if error:
+            return error
+        task_id = request.match_info["task_id"]
+        doc = self.tasks.get(task_id)
+        if doc is None or self._foreign(request, task_id):
+            return web.json_response({"code": -60012, "msg": "task not found"})
+        data = self._result(doc, f"{request.scheme}://{request.host}")
+        data["task_id"] = task_id
+        return web.json_response({"code": 0, "msg": "ok", "data": data})
+
+    async def _maybe_stall(self) -> None:
+        # Tail-latency injection for polls/downloads (exercises request hedging)
+        if self.stall_rate and self.rng.random() < self.stall_rate:
+            self.requests["stalled"] += 1
+            await asyncio.sleep(self.stall_time)
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        self.requests["download"] += 1
+        doc = self.docs.get(request.match_info["key"])
+        if doc is None or doc.state(time.time()) != "done":
+            return web.Response(status=404)
+        if "expires" in request.query and float(request.query["expires"]) < time.time():
+            self.requests["expired"] += 1
+            return web.Response(status=403, text="Request has expired")
+        if self.download_delay:
+            await asyncio.sleep(self.download_delay)
+        await self._maybe_stall()
+        path = await asyncio.get_running_loop().run_in_executor(None, self._build_zip, doc)
+        doc.downloads += 1
+        if doc.first_download is None:
+            doc.first_download = time.time()
+        self.bytes_downloaded += path.stat().st_size
+        if self.drop_rate and self.rng.random() < self.drop_rate:
+            return await self._dropped(request, path)
+        return web.FileResponse(path, headers={"Content-Type": "application/zip"})
+
+    async def _dropped(self, request: web.Request, path: Path) -> web.StreamResponse:
+        # Promise the whole (remaining) body, send half, then cut the connection
+        self.requests["dropped"] += 1
+        st = path.stat()
+        rng = request.http_range
+        start = rng.start or 0
+        stop = rng.stop if rng.stop is not None else st.st_size
+        body = path.read_bytes()[start:stop]
+        ranged = start or stop < st.st_size
+        resp = web.StreamResponse(status=206 if ranged else 200, headers={
+            "Content-Type": "application/zip",
+            "Content-Length": str(len(body)),
+            "ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            "Accept-Ranges": "bytes",
+        })
+        if ranged:
+            resp.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{st.st_size}"
+        await resp.prepare(request)
+        await resp.write(body[:len(body) // 2])
+        request.transport.close()
+        return resp
+
+    # ============ Control ============
+
+    def stats(self) -> dict:
+        ttr = sorted(d.first_download - d.created for d in self.docs.values() if d.first_download)
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "requests": dict(self.requests),
+            "total_requests": sum(self.requests.values()),
+            "documents": len(self.docs),
+            "downloaded": len(ttr),
+            "failed": sum(1 for d in self.docs.values() if d.fail and d.uploaded),
+            "duplicate_downloads": sum(max(0, d.downloads - 1) for d in self.docs.values()),
+            "bytes_uploaded": self.bytes_uploaded,
+            "bytes_downloaded": self.bytes_downloaded,
+            "time_to_result": ttr,
+            "tokens": {t: {"requests": n, "documents": self.token_docs[t]}
+                       for t, n in self.token_requests.items()},
+        }
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({"ok": True})
+
+
+def create_app(mock: MockMinerU) -> web.Application:
+    app = web.Application(client_max_size=1024 ** 3)
+    app.add_routes([
+        web.post("/api/v4/file-urls/batch", mock.file_urls),
+        web.put("/upload/{batch_id}/{index}", mock.upload),
+        web.get("/api/v4/extract-results/batch/{batch_id}", mock.batch_status),
+        web.post("/api/v4/extract/task", mock.create_task),
+        web.get("/api/v4/extract/task/{task_id}", mock.task_status),
+        web.get("/download/{key}.zip", mock.download),
+        web.get("/_mock/stats", mock.handle_stats),
+        web.post("/_mock/reset", mock.handle_reset),
+    ])
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--queue-latency", default="uniform:0.5,2",
+                        help="Time spent 'pending' after upload (default: uniform:0.5,2)")
+    parser.add_argument("--parse-latency", default="uniform:2,6",
+                        help="Time spent 'running' (default: uniform:2,6)")
+    parser.add_argument("--result-size", default="256k",
+                        help="Result ZIP size, e.g. 256k or uniform:100k,5m (default: 256k)")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Probability a document ends in state 'failed'")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Probability an API call returns HTTP 500 / code != 0")
+    parser.add_argument("--upload-error-rate", type=float, default=0.0,
+                        help="Probability an upload PUT returns 503")
+    parser.add_argument("--download-delay", type=float, default=0.0,
+                        help="Extra seconds before each ZIP download starts")
+    parser.add_argument("--stall-rate", type=float, default=0.0,
+                        help="Probability a status poll or download stalls for --stall-time")
+    parser.add_argument("--stall-time", type=float, default=20.0,
+                        help="Seconds a stalled request hangs (default: 20)")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="Probability a download connection is cut halfway through")
+    parser.add_argument("--url-ttl", type=float, default=0.0,
+                        help="Seconds until a result URL expires (403); 0 = never")
+    parser.add_argument("--bad-tokens", help="Comma-separated tokens answered with A0202")
+    parser.add_argument("--token-quota", type=int, default=0,
+                        help="Documents per token before -60018 (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline mock of the MinerU v4 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = MockMinerU(args)
+    print(f"🧪 MinerU mock: http://{args.host}:{args.port}/api/v4", flush=True)
+    try:
+        web.run_app(create_app(mock), host=args.host, port=args.port, print=None)
+    finally:
+        shutil.rmtree(mock.zip_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
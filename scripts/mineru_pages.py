@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+MinerU page selection - parse only some pages of each document (triage)
+
+For classification the first few pages (title, abstract, TOC) are usually
+enough, and parsing whole files spends the daily page quota. With
+`--pages SPEC` only the selected pages are parsed. SPEC is a comma-separated
+list of:
+
+    7          one page
+    1-3        a range (1-based, inclusive)
+    5-         page 5 to the end
+    first:5    the first 5 pages
+    last:2     the last 2 pages
+
+It is resolved per document against the page count, read locally (see
+mineru_inspect), into the API's `page_ranges`. For example, `first:5,last:2`
+on a 40-page PDF becomes `1-5,39-40`. Overlapping parts are merged and parts
+past the end are clipped. When the page count is unknown (URLs, non-PDF
+files, no `pypdf`), only the parts that do not need it (`7`, `1-3`,
+`first:5`) are sent. If no part is left, the whole document is parsed, and
+the end-of-run report counts it.
+
+Triage results are stored as `<name>__pages-<spec>` (e.g.
+`report__pages-first5_last2`) in the same output folder, archive index or
+store. --resume, --sync and a later full parse therefore treat them as
+separate results: a full parse is not skipped because a triage result
+exists, and neither overwrites the other. With --sync, a triage run keeps
+its own manifest (`mineru-manifest__pages-<spec>.jsonl`).
+"""
+
+import argparse
+import atexit
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from mineru_inspect import page_count
+
+Part = Tuple[str, int, Optional[int]]  # ("range", first, last or None) / ("first" | "last", n, None)
+
+PART = re.compile(r"^(?:(first|last):(\d+)|(\d+)(?:(-)(\d*))?)$")
+
+
+def parse_spec(spec: str) -> List[Part]:
+    """Parts of a --pages SPEC; ValueError if it is malformed."""
+    parts: List[Part] = []
+    for text in spec.replace(" ", "").split(","):
+        m = PART.match(text)
+        if not m:
+            raise ValueError(f"invalid page selection: {text!r} (use e.g. 1-3, 5-, first:5, last:2)")
+        if m.group(1):
+            n = int(m.group(2))
+            if n < 1:
+                raise ValueError(f"invalid page selection: {text!r}")
+            parts.append((m.group(1), n, None))
+            continue
+        first = int(m.group(3))
+        last = first if not m.group(4) else int(m.group(5)) if m.group(5) else None
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"invalid page selection: {text!r}")
+        parts.append(("range", first, last))
+    return parts
+
+
+def resolve(parts: List[Part], pages: Optional[int]) -> List[Tuple[int, int]]:
+    """Merged (first, last) page spans of `parts` in a document of `pages` pages
+    (None: unknown, parts that need it are left out)."""
+    spans = []
+    for kind, a, b in parts:
+        if kind == "first":
+            lo, hi = 1, a
+        elif kind == "last":
+            if pages is None:
+                continue
+            lo, hi = pages - a + 1, pages
+        else:
+            lo, hi = a, b if b is not None else pages
+            if hi is None:
+                continue
+        lo = max(lo, 1)
+        if pages is not None:
+            hi = min(hi, pages)
+        if lo <= hi:
+            spans.append((lo, hi))
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def format_ranges(spans: List[Tuple[int, int]]) -> str:
+    """API `page_ranges` text, e.g. `1-5,39-40`."""
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in spans)
+
+
+def pages_suffix(spec: str) -> str:
+    """Suffix of result names for a SPEC: `first:5,last:2` -> `__pages-first5_last2`."""
+    slug = "_".join(re.sub(r"[^0-9A-Za-z-]", "", part) for part in spec.replace(" ", "").split(","))
+    return f"__pages-{slug}"
+
+
+class PageSelection:
+    """The --pages SPEC plus counts for the end-of-run report."""
+
+    def __init__(self):
+        self.enabled = False
+        self.spec = ""
+        self.parts: List[Part] = []
+        self.suffix = ""
+        self.selected = 0
+        self.whole = 0
+        self.outside = 0
+        self._lock = threading.Lock()
+
+    def enable(self, spec: str) -> None:
+        self.parts = parse_spec(spec)
+        self.spec = spec
+        self.suffix = pages_suffix(spec)
+        self.enabled = True
+        atexit.register(self.report)
+
+    def result_name(self, stem: str) -> str:
+        """Name the result of a document called `stem` is stored under."""
+        return stem + self.suffix
+
+    def page_ranges(self, source) -> Optional[str]:
+        """`page_ranges` for one document; None to parse all of it (page count
+        unknown); ValueError if the selection lies past the document's end."""
+        pages = None
+        if isinstance(source, Path) and source.suffix.lower() == ".pdf":
+            pages = page_count(source)
+        ranges = format_ranges(resolve(self.parts, pages)) or None
+        if ranges is None and pages is not None:
+            with self._lock:
+                self.outside += 1
+            raise ValueError(f"页码范围 {self.spec} 超出文档页数 ({pages} 页)")
+        with self._lock:
+            if ranges:
+                self.selected += 1
+            else:
+                self.whole += 1
+        return ranges
+
+    def apply(self, job) -> bool:
+        """Add the resolved `page_ranges` to `job.options`; False (with `job.error`)
+        if none of the selected pages exist."""
+        try:
+            ranges = self.page_ranges(job.source)
+        except ValueError as e:
+            job.error = str(e)
+            return False
+        if ranges:
+            job.options = dict(job.options, page_ranges=ranges)
+        return True
+
+    def report(self) -> None:
+        if not self.selected and not self.whole and not self.outside:
+            return
+        print(f"📑 页码范围 {self.spec}: {self.selected} 个文件"
+              + (f", 页数未知整篇解析 {self.whole} 个" if self.whole else "")
+              + (f", 超出页数 {self.outside} 个" if self.outside else ""), file=sys.stderr)
+
+
+PAGES = PageSelection()
+
+
+def _spec(text: str) -> str:
+    try:
+        parse_spec(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def add_pages_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--pages", type=_spec, metavar="SPEC",
+                        help="Only parse these pages of each document, e.g. 1-3 or first:5,last:2 "
+                             "(stored as <name>__pages-<spec>, apart from full results)")
+
+
+def setup_pages(args: argparse.Namespace) -> None:
+    spec = getattr(args, "pages", None)
+    if spec:
+        PAGES.enable(spec)
+
+
+def result_name(path: Path) -> str:
+    """Result name of an input file: its stem, plus the --pages suffix when set."""
+    return PAGES.result_name(path.stem) if PAGES.enabled else path.stem
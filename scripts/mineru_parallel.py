@@ -7,153 +7,44 @@ Usage:
 """
 
 import argparse
-import json
-import os
 import sys
 import time
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-import requests
-
-API_BASE = "https://mineru.net/api/v4"
-
-# 全局统计
-stats = {"success": 0, "failed": 0, "total": 0}
+from mineru_download import add_download_arguments, setup_download
+from mineru_engine import Engine, Job, Policy, run_threaded
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_local import add_local_arguments, setup_local
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pages import add_pages_arguments, setup_pages
+from mineru_pipeline import DEFAULT_BACKLOG, progress_tag
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_queue import add_queue_arguments, coordinate, handled_elsewhere, setup_queue
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_sync import add_sync_arguments, finish_sync, is_current, setup_sync, track_sync
+from mineru_tokens import add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace
+
+# 单次尝试，10 秒轮询；失败的文件留给 --resume 重跑
+POLICY = Policy(retries=1, poll_interval=10, timeout=600, create_timeout=30,
+                upload_timeout=600, skip_existing=False)
 
 
 def get_token(args):
-    return args.token or os.environ.get("MINERU_TOKEN")
-
+    """单个 token 或 token 池（--token a,b / --tokens-file / MINERU_TOKENS）"""
+    return token_pool(args)
 
-def headers(token):
-    return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
 
-
-def create_single_task(token, file_path):
-    """为单个文件创建上传任务"""
-    filename = Path(file_path).name
-    data_id = Path(file_path).stem
-    
-    # 获取上传链接
-    resp = requests.post(
-        f"{API_BASE}/file-urls/batch",
-        headers=headers(token),
-        json={
-            "files": [{"name": filename, "data_id": data_id}],
-            "model_version": "vlm",
-            "enable_formula": True,
-            "enable_table": True,
-        },
-        timeout=30,
-    )
-    result = resp.json()
-    
-    if result.get("code") != 0:
-        return None, f"获取上传链接失败: {result.get('msg')}"
-    
-    batch_id = result["data"]["batch_id"]
-    upload_url = result["data"]["file_urls"][0]
-    
-    # 上传文件
-    with open(file_path, "rb") as f:
-        upload_resp = requests.put(upload_url, data=f, timeout=600)
-    
-    if upload_resp.status_code != 200:
-        return None, f"上传失败: {upload_resp.status_code}"
-    
-    return batch_id, data_id
-
-
-def wait_and_download(token, batch_id, data_id, output_dir, timeout=600, poll=10):
-    """等待解析完成并下载结果"""
-    start = time.time()
-    
-    while time.time() - start < timeout:
-        try:
-            resp = requests.get(
-                f"{API_BASE}/extract-results/batch/{batch_id}",
-                headers=headers(token),
-                timeout=30,
-            )
-            results = resp.json()["data"]["extract_result"]
-            
-            if not results:
-                time.sleep(poll)
-                continue
-            
-            state = results[0].get("state")
-            
-            if state == "done":
-                # 下载结果
-                zip_url = results[0].get("full_zip_url")
-                return download_result(zip_url, output_dir, data_id)
-            
-            elif state == "failed":
-                return None, results[0].get("err_msg", "解析失败")
-            
-            time.sleep(poll)
-            
-        except Exception as e:
-            time.sleep(poll)
-    
-    return None, "超时"
-
-
-def download_result(url, output_dir, filename):
-    """下载并解压结果"""
-    zip_path = output_dir / f"{filename}.zip"
-    
-    resp = requests.get(url, stream=True, timeout=300)
-    
-    with open(zip_path, "wb") as f:
-        for chunk in resp.iter_content(8192):
-            f.write(chunk)
-    
-    extract_dir = output_dir / filename
-    with zipfile.ZipFile(zip_path) as zf:
-        zf.extractall(extract_dir)
-    
-    zip_path.unlink()
-    
-    # 重命名
-    md = extract_dir / "full.md"
-    if md.exists():
-        md.rename(extract_dir / f"{filename}.md")
-    
-    return extract_dir, None
-
-
-def process_file(token, file_path, output_dir, index, total):
-    """处理单个文件"""
-    filename = Path(file_path).name
-    print(f"  [{index+1}/{total}] 开始: {filename}")
-    
-    try:
-        # 创建任务并上传
-        batch_id, data_id = create_single_task(token, file_path)
-        
-        if not batch_id:
-            print(f"  [{index+1}/{total}] ❌ {filename}: {data_id}")
-            return False, filename
-        
-        # 等待并下载
-        result, error = wait_and_download(token, batch_id, data_id, output_dir)
-        
-        if result:
-            print(f"  [{index+1}/{total}] ✅ {filename}")
-            return True, filename
-        else:
-            print(f"  [{index+1}/{total}] ❌ {filename}: {error}")
-            return False, filename
-            
-    except Exception as e:
-        print(f"  [{index+1}/{total}] ❌ {filename}: {e}")
-        return False, filename
+def print_progress(job, event):
+    tag = progress_tag(job.index)
+    if event == "start":
+        print(f"  {tag} 开始: {job.filename}")
+    elif event == "done":
+        print(f"  {tag} ✅ {job.filename}")
+    elif event == "failed":
+        print(f"  {tag} ❌ {job.filename}: {job.error}")
 
 
 def main():
@@ -163,8 +54,32 @@ def main():
     parser.add_argument("--token")
     parser.add_argument("--workers", "-w", type=int, default=10, help="并发数")
     parser.add_argument("--resume", action="store_true", help="跳过已处理的文件")
+    add_scan_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
+    add_queue_arguments(parser)
+    add_sync_arguments(parser)
+    add_local_arguments(parser)
+    add_pages_arguments(parser)
     
     args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
+    setup_queue(args)
+    setup_sync(args)
+    setup_local(args)
+    setup_pages(args)
     
     token = get_token(args)
     if not token:
@@ -174,16 +89,21 @@ def main():
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # 收集文件
+    # 收集文件：边扫描边提交
     input_dir = Path(args.dir)
-    pdf_files = sorted(list(input_dir.glob("*.pdf")) + list(input_dir.glob("*.PDF")))
-    
-    if not pdf_files:
-        print("❌ 未找到 PDF 文件")
-        sys.exit(1)
+    skipped = 0
+    
+    def iter_pending():
+        nonlocal skipped
+        for f in timed_iter("scan", scan_from_args(args, input_dir, {".pdf"}, output_dir)):
+            target = mirror_output_dir(f, input_dir, output_dir)
+            if is_current(f, target, args.resume):
+                skipped += 1
+                file_done("skipped")
+                continue
+            yield Job(f, target)
     
-    total = len(pdf_files)
-    print(f"\n📚 开始并行处理 {total} 个文件 (并发: {args.workers})\n")
+    print(f"\n📚 开始并行处理 (并发: {args.workers})\n")
     
     success = 0
     failed = 0
@@ -192,19 +112,30 @@ def main():
     start_time = time.time()
     
     # 并行处理
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {
-            executor.submit(process_file, token, str(f), output_dir, i, total): f
-            for i, f in enumerate(pdf_files)
-        }
-        
-        for future in as_completed(futures):
-            ok, filename = future.result()
-            if ok:
-                success += 1
-            else:
-                failed += 1
-                failed_files.append(filename)
+    engine = Engine(token, POLICY)
+    # --queue 时只处理本节点认领到的文件，且不预读（未开始的文件留给其他节点）
+    jobs, on_event = coordinate(iter_pending(), input_dir, track_sync(print_progress))
+    backlog = 0 if args.queue is not None else DEFAULT_BACKLOG
+    for job in run_threaded(engine, jobs, args.workers, backlog, on_event):
+        file_done("success" if job.ok else "failed")
+        if job.ok:
+            success += 1
+        else:
+            failed += 1
+            failed_files.append(job.filename)
+    
+    finish_sync()
+    close_events()
+
+    if skipped:
+        print(f"⏭️  跳过已处理: {skipped} 个")
+    
+    if success + failed == 0:
+        if skipped or handled_elsewhere():
+            print("✅ 所有文件已处理完成!")
+            return
+        print("❌ 未找到 PDF 文件")
+        sys.exit(1)
     
     # 汇总
     elapsed = time.time() - start_time
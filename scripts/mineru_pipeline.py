@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+MinerU streaming pipeline - bounded producer/consumer helpers
+
+Inputs are read lazily and handed to a fixed pool of workers through a
+bounded queue, so memory stays constant no matter how long the input list
+is. Results are yielded (and optionally appended to a JSONL file) the moment
+each item finishes instead of after the whole run.
+
+Usage:
+    async for result in async_pipeline(iter_lines("urls.txt"), handler, concurrency=10):
+        sink.record(...)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, Optional
+
+from mineru_events import enabled as events_enabled
+from mineru_events import item_context
+from mineru_trace import TRACER, item_name, span
+
+DEFAULT_BACKLOG = 100
+SUMMARY_INTERVAL = 5.0
+MAX_REPORTED_FAILURES = 50
+
+_DONE = object()
+
+
+def iter_lines(path) -> Iterator[str]:
+    """Lazily yield stripped, non-empty, non-comment lines from a text file."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def progress_tag(index: int, total: Optional[int] = None) -> str:
+    """Format a `[n/total]` tag, or `[n]` when the total is not known up front."""
+    if total:
+        return f"[{index+1}/{total}]"
+    return f"[{index+1}]"
+
+
+async def async_pipeline(
+    items: Iterable,
+    handler: Callable[[int, object], Awaitable],
+    concurrency: int,
+    backlog: int = DEFAULT_BACKLOG,
+) -> AsyncIterator:
+    """Run `handler(index, item)` over `items` with `concurrency` workers.
+
+    At most `backlog` items are read ahead of the workers and at most
+    `backlog` finished results wait for the consumer, so neither the input
+    nor the output is ever fully materialized. Results are yielded in
+    completion order. An exception raised by `handler` is yielded as the
+    result for that item; an exception raised while reading `items` is
+    re-raised once the in-flight work has drained.
+    """
+    in_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, backlog))
+    out_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, backlog))
+    producer_error = []
+
+    async def produce():
+        try:
+            for index, item in enumerate(items):
+                await in_queue.put((index, item))
+        except Exception as e:
+            producer_error.append(e)
+        finally:
+            for _ in range(concurrency):
+                await in_queue.put(_DONE)
+
+    async def work():
+        while True:
+            job = await in_queue.get()
+            if job is _DONE:
+                break
+            index, item = job
+            name = item_name(item)
+            try:
+                with item_context(name, index), span(name, "item", index=index):
+                    result = await handler(index, item)
+            except Exception as e:
+                result = e
+            await out_queue.put(result)
+        await out_queue.put(_DONE)
+
+    tasks = [asyncio.ensure_future(produce())]
+    tasks += [asyncio.ensure_future(work()) for _ in range(concurrency)]
+
+    try:
+        finished = 0
+        while finished < concurrency:
+            result = await out_queue.get()
+            if result is _DONE:
+                finished += 1
+                continue
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if producer_error:
+        raise producer_error[0]
+
+
+def threaded_pipeline(
+    items: Iterable,
+    handler: Callable[[int, object], object],
+    workers: int,
+    backlog: int = DEFAULT_BACKLOG,
+) -> Iterator:
+    """Thread-pool counterpart of `async_pipeline`.
+
+    Items are submitted as they are pulled from `items`, with at most
+    `workers + backlog` futures outstanding, and results are yielded in
+    completion order. Exceptions raised by `handler` propagate to the caller,
+    as with `future.result()`.
+    """
+    limit = workers + max(0, backlog)
+    if TRACER.enabled or events_enabled():
+        handler = _instrumented(handler)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="worker") as executor:
+        pending = set()
+        for index, item in enumerate(items):
+            pending.add(executor.submit(handler, index, item))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _instrumented(handler: Callable[[int, object], object]) -> Callable[[int, object], object]:
+    """Wrap `handler` so each item gets a trace span and an event-log file context."""
+    def run(index, item):
+        name = item_name(item)
+        with item_context(name, index), span(name, "item", index=index):
+            return handler(index, item)
+    return run
+
+
+def chunked(items: Iterable, size: int, key: Optional[Callable] = None) -> Iterator[List]:
+    """Group `items` into lists of at most `size`, lazily.
+
+    When `key` is given, a new chunk is also started whenever `key(item)`
+    changes, so every chunk shares one key (e.g. one output directory).
+    """
+    chunk = []
+    chunk_key = None
+    for item in items:
+        item_key = key(item) if key else None
+        if chunk and (len(chunk) >= size or item_key != chunk_key):
+            yield chunk
+            chunk = []
+        chunk_key = item_key
+        chunk.append(item)
+    if chunk:
+        yield chunk
+
+
+class ResultSink:
+    """Stream per-item results to a JSONL file and keep constant-size totals.
+
+    Every `record()` call appends one line immediately. A summary JSON file
+    (`<results>.summary.json`) is rewritten atomically every few seconds and
+    on `close()`, so an interrupted run still leaves an up-to-date summary on
+    disk. Only the first `MAX_REPORTED_FAILURES` failure names are kept in
+    memory for the console report; the full list lives in the JSONL file.
+    """
+
+    def __init__(self, path: Optional[Path] = None, summary_interval: float = SUMMARY_INTERVAL):
+        self.path = Path(path) if path else None
+        self.summary_path = (
+            self.path.with_name(self.path.name + ".summary.json") if self.path else None
+        )
+        self.summary_interval = summary_interval
+        self.success = 0
+        self.failed = 0
+        self.skipped = 0
+        self.failed_names = []
+        self.start_time = time.time()
+        self._last_summary = 0.0
+        self._lock = threading.Lock()
+        self._file = None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    @property
+    def total(self) -> int:
+        return self.success + self.failed + self.skipped
+
+    def record(self, name: str, ok: bool, skipped: bool = False, **fields) -> None:
+        """Record one finished item."""
+        with self._lock:
+            if skipped:
+                self.skipped += 1
+            elif ok:
+                self.success += 1
+            else:
+                self.failed += 1
+                if len(self.failed_names) < MAX_REPORTED_FAILURES:
+                    self.failed_names.append(name)
+
+            if self._file:
+                entry = {"name": name, "ok": ok, "skipped": skipped, "time": time.time()}
+                entry.update(fields)
+                self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+            now = time.time()
+            if self.summary_path and now - self._last_summary >= self.summary_interval:
+                self._write_summary(now)
+
+    def summary(self) -> dict:
+        elapsed = time.time() - self.start_time
+        return {
+            "success": self.success,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "total": self.total,
+            "elapsed": round(elapsed, 3),
+            "files_per_min": round((self.success + self.failed) / elapsed * 60, 2) if elapsed else 0.0,
+        }
+
+    def _write_summary(self, now: float) -> None:
+        self._last_summary = now
+        tmp_path = self.summary_path.with_name(self.summary_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.summary(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.summary_path)
+
+    def close(self) -> dict:
+        """Flush the final summary and close the JSONL stream. Returns the summary."""
+        with self._lock:
+            if self.summary_path:
+                self._write_summary(time.time())
+            if self._file:
+                self._file.close()
+                self._file = None
+        return self.summary()
+
+    def print_failures(self) -> None:
+        if not self.failed_names:
+            return
+        print("\n失败文件:")
+        for name in self.failed_names:
+            print(f"  - {name}")
+        if self.failed > len(self.failed_names):
+            more = self.failed - len(self.failed_names)
+            where = f" (见 {self.path})" if self.path else ""
+            print(f"  ... 另有 {more} 个{where}")
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+MinerU profiling - CPU and memory hot spots of a real run
+
+Two CPU modes:
+
+    sample    (default) a background thread samples the Python stack of every
+              thread every few milliseconds via sys._current_frames(). Low
+              overhead, covers thread pools and the asyncio loop alike, and
+              also writes collapsed stacks (`.folded`) for flamegraph.pl /
+              speedscope. Samples are wall-clock: blocked threads count too.
+    cprofile  deterministic cProfile. On Python < 3.12 every new thread gets
+              its own profiler (threading.setprofile) and the results are
+              merged; on 3.12+ a single profiler already sees all threads.
+              Also writes the raw `.pstats`.
+
+Memory is tracked with tracemalloc. At every stage boundary (the end of each
+`mineru_metrics.timed` block) the traced size is recorded per stage, and a
+full snapshot is taken at most every SNAPSHOT_INTERVAL seconds; the largest
+one is used for the allocation-site table.
+
+The text report is written at exit.
+"""
+
+import argparse
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_REPORT = "mineru-profile.txt"
+SAMPLE_INTERVAL = 0.005
+SNAPSHOT_INTERVAL = 2.0
+TRACEMALLOC_FRAMES = 16
+MAX_STACK_DEPTH = 64
+TOP_N = 30
+
+
+class StackSampler:
+    """Periodically record the Python stack of every other thread."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.folded: Counter = Counter()
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid != own:
+                    self._record(frame)
+
+    def _record(self, frame) -> None:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        if not stack:
+            return
+        self.samples += 1
+        self.self_counts[stack[0]] += 1
+        for key in set(stack):
+            self.total_counts[key] += 1
+        self.folded[";".join(_label(key) for key in reversed(stack))] += 1
+
+    def report(self, out: io.StringIO) -> None:
+        elapsed = (self.stopped or time.perf_counter()) - (self.started or 0)
+        out.write(f"mode: sample ({self.interval * 1000:.1f} ms, {self.samples} samples "
+                  f"over {elapsed:.1f} s, wall-clock)\n\n")
+        for title, counts in (("self", self.self_counts), ("inclusive", self.total_counts)):
+            out.write(f"== Top functions ({title}) ==\n")
+            out.write(f"{'samples':>9} {'%':>6}  function\n")
+            for key, n in counts.most_common(TOP_N):
+                out.write(f"{n:>9} {100.0 * n / max(1, self.samples):>6.1f}  {_label(key)}\n")
+            out.write("\n")
+
+    def write_folded(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.folded.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class ThreadedCProfile:
+    """cProfile for the main thread plus every thread started afterwards."""
+
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.threads = []
+        self._lock = threading.Lock()
+        # 3.12+ profiles through sys.monitoring, which already covers all threads
+        self._per_thread = sys.version_info < (3, 12)
+
+    def start(self) -> None:
+        if self._per_thread:
+            threading.setprofile(self._bootstrap)
+        self.main.enable()
+
+    def _bootstrap(self, frame, event, arg):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            self.threads.append(profile)
+        profile.enable()
+
+    def stop(self) -> None:
+        self.main.disable()
+        if self._per_thread:
+            threading.setprofile(None)
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main)
+        with self._lock:
+            for profile in self.threads:
+                try:
+                    stats.add(profile)
+                except (TypeError, ValueError):
+                    pass  # thread never made a call after enabling
+        return stats
+
+    def report(self, out: io.StringIO) -> None:
+        stats = self.stats()
+        stats.stream = out
+        out.write(f"mode: cprofile ({len(self.threads) + 1} threads)\n\n")
+        for key, title in (("tottime", "self"), ("cumulative", "inclusive")):
+            out.write(f"== Top functions ({title}) ==\n")
+            stats.sort_stats(key).print_stats(TOP_N)
+
+    def write_pstats(self, path: Path) -> None:
+        self.stats().dump_stats(str(path))
+
+
+class MemoryTracker:
+    """tracemalloc bookkeeping at stage boundaries."""
+
+    def __init__(self, snapshot_interval: float = SNAPSHOT_INTERVAL):
+        self.snapshot_interval = snapshot_interval
+        self.stages: Dict[str, list] = {}  # stage -> [boundaries, max traced bytes]
+        self.best: Optional[tracemalloc.Snapshot] = None
+        self.best_size = 0
+        self.best_stage = None
+        self._last_snapshot = 0.0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def boundary(self, stage: str) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        now = time.monotonic()
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0])
+            entry[0] += 1
+            entry[1] = max(entry[1], current)
+            take = current > self.best_size and now - self._last_snapshot >= self.snapshot_interval
+            if take:
+                self._last_snapshot = now
+        if take:
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                if current > self.best_size:
+                    self.best, self.best_size, self.best_stage = snapshot, current, stage
+
+    def report(self, out: io.StringIO) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        out.write("== Memory by stage (tracemalloc, traced size at stage end) ==\n")
+        out.write(f"current {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB\n")
+        out.write(f"{'stage':<14}{'boundaries':>11}{'max MB':>10}\n")
+        with self._lock:
+            for stage, (count, high) in sorted(self.stages.items(), key=lambda kv: -kv[1][1]):
+                out.write(f"{stage:<14}{count:>11}{high / 2**20:>10.1f}\n")
+            snapshot, size, stage = self.best, self.best_size, self.best_stage
+        out.write("\n")
+        if snapshot is None:
+            snapshot, size, stage = tracemalloc.take_snapshot(), current, "exit"
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__, all_frames=True),  # the profiler itself
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        out.write(f"== Top allocation sites (snapshot after `{stage}`, "
+                  f"{size / 2**20:.1f} MB traced) ==\n")
+        out.write(f"{'KB':>10}{'blocks':>9}  site  <-  nearest script frame\n")
+        for (site, caller), (size, count) in _group_by_site(snapshot)[:TOP_N]:
+            via = f"  <-  {caller}" if caller and caller != site else ""
+            out.write(f"{size / 1024:>10.1f}{count:>9}  {site}{via}\n")
+        out.write("\n")
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.cpu = None
+        self.memory = None
+
+    def enable(self, path: Path, mode: str = "sample", interval: float = SAMPLE_INTERVAL) -> None:
+        """Start CPU + memory profiling; the report is written to `path` at exit."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory = MemoryTracker()
+        self.memory.start()
+        self.cpu = ThreadedCProfile() if mode == "cprofile" else StackSampler(interval)
+        self.cpu.start()
+        self.enabled = True
+        atexit.register(self.finish)
+
+    def stage_boundary(self, stage: str) -> None:
+        if self.enabled:
+            self.memory.boundary(stage)
+
+    def finish(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.cpu.stop()
+
+        out = io.StringIO()
+        out.write(f"MinerU profile report - {' '.join(sys.argv)}\n")
+        self.cpu.report(out)
+        self.memory.report(out)
+        tracemalloc.stop()
+
+        if isinstance(self.cpu, StackSampler):
+            extra = self.path.with_suffix(".folded")
+            self.cpu.write_folded(extra)
+        else:
+            extra = self.path.with_suffix(".pstats")
+            self.cpu.write_pstats(extra)
+        self.path.write_text(out.getvalue(), encoding="utf-8")
+        print(f"🔬 性能报告: {self.path} ({extra.name})", file=sys.stderr)
+
+
+PROFILER = Profiler()
+
+
+def _group_by_site(snapshot: tracemalloc.Snapshot) -> list:
+    """Aggregate traces by (allocation line, innermost frame in the scripts directory).
+
+    The allocation line alone is often inside the stdlib (pathlib, zipfile,
+    json); the script frame shows which of our calls caused it.
+    """
+    scripts_dir = str(Path(__file__).resolve().parent)
+    groups: Dict[tuple, list] = {}
+    for trace in snapshot.traces:
+        frames = list(trace.traceback)  # oldest first
+        site = f"{frames[-1].filename}:{frames[-1].lineno}"
+        caller = next(
+            (f"{Path(f.filename).name}:{f.lineno}" for f in reversed(frames)
+             if f.filename.startswith(scripts_dir)),
+            None,
+        )
+        entry = groups.setdefault((site, caller), [0, 0])
+        entry[0] += trace.size
+        entry[1] += 1
+    return sorted(groups.items(), key=lambda kv: -kv[1][0])
+
+
+def _label(key: tuple) -> str:
+    filename, lineno, name = key
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_REPORT, metavar="REPORT",
+                        help=f"Profile CPU and memory, writing a report to REPORT "
+                             f"(default: {DEFAULT_REPORT})")
+    parser.add_argument("--profile-mode", choices=["sample", "cprofile"], default="sample",
+                        help="CPU profiler: stack sampling (default) or deterministic cProfile")
+
+
+def setup_profile(args: argparse.Namespace) -> None:
+    if getattr(args, "profile", None):
+        PROFILER.enable(Path(args.profile), args.profile_mode)
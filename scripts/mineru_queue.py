@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+MinerU shared work queue - several nodes, one input tree, no duplicate work
+
+With `--queue [DIR]` every node that runs the same command against a shared
+(e.g. NFS) input and output tree claims each file before uploading it. The
+claims live in a plain directory (default `<output>/.mineru-queue`), so no
+service or database is needed:
+
+    leases/<id>   held by one node; holds node name and expiry time
+    done/<id>     finished (by any node)
+    failed/<id>   failed attempts so far; claimable again until MAX_ATTEMPTS
+
+Done and failed records hold the input's size and mtime when it was claimed,
+so a file that is changed or replaced later (--sync, --watch) is claimable
+again, with fresh attempts.
+
+A lease is taken by hard-linking a fully written temp file into place.
+`link()` is atomic and fails if the target exists, even over NFS, where
+`O_EXCL` and SQLite locking are not reliable. While a node works, a
+heartbeat thread pushes its lease expiry forward every `lease / 4` seconds.
+If a node dies, its leases expire and the next node that meets the file
+renames the stale lease aside and claims the file itself.
+
+A node scans the whole tree and claims what it can. It then waits for files
+leased elsewhere until they are done or their lease expires, so each node
+exits once the queue is drained. Expiry times come from the nodes' own
+clocks; keep them NTP-synced well within the lease length. To retry files
+that failed MAX_ATTEMPTS times, delete `failed/`.
+
+    queue = WorkQueue(Path("/nfs/out/.mineru-queue"))
+    jobs = queue.claimed(jobs, root)          # only files this node won
+    for job in run_threaded(engine, jobs, 8, on_event=queue.track(hook)):
+        ...                                   # settled as done/failed by the hook
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from mineru_engine import EventHook, Job
+from mineru_pages import PAGES
+
+DEFAULT_QUEUE = ".mineru-queue"
+DEFAULT_LEASE = 120.0
+MAX_ATTEMPTS = 3
+
+
+def _version(job: Job) -> Optional[List[int]]:
+    """[size, mtime_ns] of a job's input file (None for URLs or unreadable files)."""
+    if job.is_url:
+        return None
+    try:
+        st = os.stat(job.source)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class WorkQueue:
+    """Lease-based claims on files, shared by all nodes that see `root`."""
+
+    def __init__(self, root: Path, lease: float = DEFAULT_LEASE, node: Optional[str] = None):
+        self.root = Path(root)
+        self.lease = lease
+        self.node = node or f"{socket.gethostname()}:{os.getpid()}"
+        self.leases = self.root / "leases"
+        self.done = self.root / "done"
+        self.failed = self.root / "failed"
+        for d in (self.leases, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+        self.claims = 0
+        self.reclaimed = 0
+        self.elsewhere = 0
+        self._held: Dict[str, float] = {}  # key -> time claimed
+        self._keys: Dict[int, Tuple[str, Optional[List[int]]]] = {}  # id(job) -> key, version
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _id(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+    def _write(self, path: Path, record: dict) -> Path:
+        """Write `record` to a private temp file next to `path`."""
+        tmp = path.with_name(f".{path.name}.{self.node.replace('/', '_')}.{threading.get_ident()}")
+        tmp.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        return tmp
+
+    def _record(self, key: str) -> dict:
+        return {"key": key, "node": self.node, "expires": time.time() + self.lease}
+
+    # ---- claims ----
+
+    def attempts(self, key: str, version: Optional[List[int]] = None) -> int:
+        """Failed attempts on this version of `key` (an earlier version's do not count)."""
+        record = _read_json(self.failed / self._id(key)) or {}
+        return record.get("attempts", 0) if record.get("version") == version else 0
+
+    def is_done(self, key: str, version: Optional[List[int]] = None) -> bool:
+        """True if this version of `key` was finished by some node."""
+        record = _read_json(self.done / self._id(key))
+        return record is not None and record.get("version") == version
+
+    def leased(self, key: str) -> bool:
+        """True if another node holds a live lease on `key`."""
+        lease = _read_json(self.leases / self._id(key))
+        return bool(lease) and lease.get("node") != self.node and lease.get("expires", 0) > time.time()
+
+    def claim(self, key: str, version: Optional[List[int]] = None) -> bool:
+        """Take the lease on `key`; False if this version of it is done, failed out or
+        leased elsewhere."""
+        if self.is_done(key, version) or self.attempts(key, version) >= MAX_ATTEMPTS:
+            return False
+        path = self.leases / self._id(key)
+        tmp = self._write(path, self._record(key))
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, path)
+                    break
+                except FileExistsError:
+                    if not self._reclaim(path):
+                        return False
+            else:
+                return False
+        finally:
+            tmp.unlink()
+        # Finished by its previous holder between the done check and the link
+        if self.is_done(key, version):
+            path.unlink()
+            return False
+        with self._lock:
+            self._held[key] = time.time()
+            self.claims += 1
+        self._start_heartbeat()
+        return True
+
+    def _reclaim(self, path: Path) -> bool:
+        """Move an expired lease aside; True if the caller may link a new one."""
+        lease = _read_json(path)
+        if lease is None:
+            # Removed by its holder meanwhile, or unreadable: only the former is free
+            return not path.exists()
+        if lease.get("expires", 0) > time.time():
+            return False
+        stale = path.with_name(f".{path.name}.stale.{self.node.replace('/', '_')}")
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return True  # another node reclaimed or released it first
+        taken = _read_json(stale)
+        if taken and taken.get("expires", 0) > time.time():
+            # Lost a race: a fresh lease was linked after our read; put it back
+            try:
+                os.link(stale, path)
+            except FileExistsError:
+                pass
+            stale.unlink()
+            return False
+        stale.unlink()
+        with self._lock:
+            self.reclaimed += 1
+        print(f"♻️  回收过期租约: {lease.get('key')} (节点 {lease.get('node')})", file=sys.stderr)
+        return True
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._held.pop(key, None)
+        path = self.leases / self._id(key)
+        lease = _read_json(path)
+        if lease and lease.get("node") == self.node:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def complete(self, key: str, version: Optional[List[int]] = None) -> None:
+        path = self.done / self._id(key)
+        record = {"key": key, "version": version, "node": self.node, "time": time.time()}
+        os.replace(self._write(path, record), path)
+        self._release(key)
+
+    def fail(self, key: str, error: Optional[str] = None,
+             version: Optional[List[int]] = None) -> None:
+        path = self.failed / self._id(key)
+        record = {"key": key, "version": version, "node": self.node, "time": time.time(),
+                  "attempts": self.attempts(key, version) + 1, "error": error}
+        os.replace(self._write(path, record), path)
+        self._release(key)
+
+    # ---- heartbeat ----
+
+    def _start_heartbeat(self) -> None:
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._beat, name="queue-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease / 4):
+            with self._lock:
+                keys = list(self._held)
+            for key in keys:
+                self.renew(key)
+
+    def renew(self, key: str) -> None:
+        path = self.leases / self._id(key)
+        lease = _read_json(path)
+        if not lease or lease.get("node") != self.node:
+            with self._lock:
+                lost = self._held.pop(key, None) is not None
+            if lost:
+                print(f"⚠️  租约已被其他节点回收: {key}", file=sys.stderr)
+            return
+        os.replace(self._write(path, self._record(key)), path)
+
+    # ---- job streams ----
+
+    def key_for(self, job: Job, root: Path) -> str:
+        """Queue key of a job: its input path relative to `root` (plus the --pages suffix)."""
+        try:
+            key = Path(job.source).resolve().relative_to(Path(root).resolve()).as_posix()
+        except ValueError:
+            key = job.filename
+        return key + PAGES.suffix if PAGES.enabled else key
+
+    def claimed(self, jobs: Iterable[Job], root: Path) -> Iterator[Job]:
+        """Yield the jobs this node wins, then wait out leases held by other nodes."""
+        waiting: Dict[str, Job] = {}
+        for job in jobs:
+            key, version = self.key_for(job, root), _version(job)
+            if self.claim(key, version):
+                self._keys[id(job)] = (key, version)
+                yield job
+            elif self.leased(key):
+                waiting[key] = job
+            else:
+                self.elsewhere += 1
+        if waiting:
+            print(f"⏳ 等待其他节点: {len(waiting)} 个文件租约中", file=sys.stderr)
+        while waiting:
+            time.sleep(self.lease / 4)
+            for key, job in list(waiting.items()):
+                version = _version(job)
+                if self.claim(key, version):
+                    del waiting[key]
+                    self._keys[id(job)] = (key, version)
+                    yield job
+                elif not self.leased(key):
+                    del waiting[key]
+                    self.elsewhere += 1
+
+    def finish(self, job: Job) -> None:
+        """Mark a claimed job done or failed and drop its lease."""
+        claimed = self._keys.pop(id(job), None)
+        if claimed is None:
+            return
+        key, version = claimed
+        if job.ok:
+            self.complete(key, version)
+        else:
+            self.fail(key, job.error, version)
+
+    def track(self, on_event: EventHook = None) -> EventHook:
+        """Wrap an engine event hook so finished jobs are settled in the queue."""
+
+        def hook(job: Job, event: str) -> None:
+            if event in ("done", "failed", "skip"):
+                self.finish(job)
+            if on_event:
+                on_event(job, event)
+
+        return hook
+
+    def close(self) -> None:
+        """Stop heartbeats and give back leases of unfinished work (e.g. on Ctrl+C)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        with self._lock:
+            keys = list(self._held)
+        for key in keys:
+            self._release(key)
+        if self.claims or self.elsewhere:
+            print(f"🗂️  队列: 本节点认领 {self.claims} 个 (回收 {self.reclaimed} 个), "
+                  f"其他节点完成 {self.elsewhere} 个", file=sys.stderr)
+
+
+QUEUE: Optional[WorkQueue] = None
+
+
+def add_queue_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--queue", nargs="?", const="", metavar="DIR",
+                        help=f"Coordinate several nodes on a shared tree through lease files in DIR "
+                             f"(default: <output>/{DEFAULT_QUEUE})")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE, metavar="SECONDS",
+                        help=f"Seconds a claim lives without a heartbeat before other nodes "
+                             f"reclaim it (default: {DEFAULT_LEASE:g})")
+
+
+def setup_queue(args: argparse.Namespace) -> None:
+    global QUEUE
+    queue = getattr(args, "queue", None)
+    if queue is not None:
+        QUEUE = WorkQueue(Path(queue or Path(args.output) / DEFAULT_QUEUE), args.lease)
+
+
+def handled_elsewhere() -> int:
+    """Files this node left to other nodes (finished, failed out or still leased)."""
+    return QUEUE.elsewhere if QUEUE else 0
+
+
+def coordinate(jobs: Iterable[Job], root: Path,
+               on_event: EventHook = None) -> Tuple[Iterable[Job], EventHook]:
+    """`jobs` and `on_event` routed through the --queue, or unchanged without one."""
+    if QUEUE is None:
+        return jobs, on_event
+    return QUEUE.claimed(jobs, root), QUEUE.track(on_event)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+MinerU routing - per-file model and OCR choice from a local look at each PDF
+
+`--model` and `--ocr` apply to a whole run, so a scanned PDF and a clean
+born-digital one get the same (often the most expensive) settings. With
+`--route POLICY`, every PDF is inspected locally just before upload (the
+first ROUTE_SAMPLE_PAGES pages, see mineru_inspect). It is sorted into one
+of these kinds:
+
+    digital     text layer on (nearly) every page, little else
+    complex     text layer plus formulas, table-like layout or large images
+    scanned     (mostly) no text layer: page images only
+    scan_text   page images with a hidden text layer (an earlier OCR pass)
+    garbled     a text layer that does not decode to real text
+
+The policy then picks `model_version` / `is_ocr` for that kind:
+
+                speed            balanced         quality
+    digital     pipeline         pipeline         vlm
+    complex     pipeline         vlm              vlm
+    scanned     pipeline + OCR   vlm + OCR        vlm + OCR
+    scan_text   pipeline         vlm + OCR        vlm + OCR
+    garbled     pipeline + OCR   pipeline + OCR   vlm + OCR
+
+With `balanced`, documents of more than LONG_DOC_PAGES pages go to
+`pipeline` (with OCR where the table says so) to keep long jobs cheap.
+Files that are not PDFs, or cannot be read (or without `pypdf`), keep
+`--model`. `--ocr` still forces OCR for every file. Each decision is set on
+the job (`job.route`, in `to_dict()`), written to the event log as a `route`
+event, and summed up at the end of the run.
+"""
+
+import argparse
+import atexit
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from mineru_events import emit
+from mineru_inspect import inspect_pdf
+from mineru_metrics import timed
+
+ROUTE_POLICIES = ("speed", "balanced", "quality")
+ROUTE_SAMPLE_PAGES = 8
+LONG_DOC_PAGES = 100
+TEXT_SHARE = 0.8  # share of inspected pages that need a text layer to count as digital
+SCAN_SHARE = 0.7  # average image coverage of a page above which it is a page scan
+IMAGE_SHARE = 0.2  # average image coverage that makes a digital page complex
+MAX_TABLE_LINES = 2
+MAX_MATH_CHARS = 4
+MAX_GARBLED = 0.01  # share of extracted characters
+
+KIND_NAMES = {
+    "digital": "数字版",
+    "complex": "复杂版式",
+    "scanned": "扫描件",
+    "scan_text": "扫描件(带文字层)",
+    "garbled": "乱码文字层",
+    "long": "长文档",
+    "unknown": "未检查",
+}
+
+# kind -> policy -> (model_version, is_ocr)
+ROUTES: Dict[str, Dict[str, Tuple[str, bool]]] = {
+    "digital": {"speed": ("pipeline", False), "balanced": ("pipeline", False),
+                "quality": ("vlm", False)},
+    "complex": {"speed": ("pipeline", False), "balanced": ("vlm", False),
+                "quality": ("vlm", False)},
+    "scanned": {"speed": ("pipeline", True), "balanced": ("vlm", True),
+                "quality": ("vlm", True)},
+    "scan_text": {"speed": ("pipeline", False), "balanced": ("vlm", True),
+                  "quality": ("vlm", True)},
+    "garbled": {"speed": ("pipeline", True), "balanced": ("pipeline", True),
+                "quality": ("vlm", True)},
+}
+
+
+def classify(info) -> Tuple[str, str]:
+    """(kind, detail) of an inspected PDF (a `mineru_inspect.PdfInfo`)."""
+    if not info.inspected:
+        return "scanned", "无页面内容"
+    text_share = info.text_pages / info.inspected
+    if text_share < TEXT_SHARE:
+        return "scanned", f"文字层 {info.text_pages}/{info.inspected} 页"
+    if info.image_share >= SCAN_SHARE:
+        return "scan_text", f"图片覆盖 {info.image_share:.0%}"
+    if info.garbled > MAX_GARBLED * info.chars:
+        return "garbled", f"乱码字符 {info.garbled}"
+    if info.math_fonts or info.math_chars > MAX_MATH_CHARS:
+        return "complex", "公式"
+    if info.table_lines > MAX_TABLE_LINES:
+        return "complex", "表格"
+    if info.image_share >= IMAGE_SHARE:
+        return "complex", f"图片覆盖 {info.image_share:.0%}"
+    return "digital", "纯文本"
+
+
+class Router:
+    """The --route policy plus counts for the end-of-run report."""
+
+    def __init__(self):
+        self.enabled = False
+        self.policy = "balanced"
+        self.models: Counter = Counter()
+        self.kinds: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def enable(self, policy: str) -> None:
+        if policy not in ROUTE_POLICIES:
+            raise ValueError(f"unknown route policy: {policy} (choose from {', '.join(ROUTE_POLICIES)})")
+        self.policy = policy
+        self.enabled = True
+        atexit.register(self.report)
+
+    def decide(self, source: Path, options: Optional[dict] = None) -> dict:
+        """The routing decision for one file: model_version, is_ocr, kind, reason."""
+        options = options or {}
+        forced_ocr = bool(options.get("is_ocr"))
+        decision = {"policy": self.policy, "model_version": options.get("model_version", "vlm"),
+                    "is_ocr": forced_ocr, "kind": "unknown", "reason": "非 PDF", "pages": None}
+        if Path(source).suffix.lower() != ".pdf":
+            return decision
+        with timed("route"):
+            info = inspect_pdf(Path(source), ROUTE_SAMPLE_PAGES)
+        if info is None:
+            decision["reason"] = "无法检查"
+            return decision
+        kind, detail = classify(info)
+        model, ocr = ROUTES[kind][self.policy]
+        if self.policy == "balanced" and info.pages > LONG_DOC_PAGES and model == "vlm":
+            model, detail = "pipeline", f"{detail}, {KIND_NAMES['long']} {info.pages} 页"
+        decision.update(model_version=model, is_ocr=ocr or forced_ocr, kind=kind,
+                        reason=detail, pages=info.pages)
+        return decision
+
+    def options_for(self, source: Path, options: Optional[dict] = None) -> Tuple[dict, dict]:
+        """(API options with the routed model_version / is_ocr, decision); counted and logged."""
+        decision = self.decide(source, options)
+        routed = dict(options or {}, model_version=decision["model_version"],
+                      is_ocr=decision["is_ocr"])
+        with self._lock:
+            self.models[_label(decision)] += 1
+            self.kinds[decision["kind"]] += 1
+        emit("route", file=Path(source).name, **decision)
+        return routed, decision
+
+    def route(self, job) -> None:
+        """Set `job.options` and `job.route` from the decision for `job.source`."""
+        job.options, job.route = self.options_for(job.source, job.options)
+
+    def report(self) -> None:
+        if not self.models:
+            return
+        models = ", ".join(f"{m} {n}" for m, n in self.models.most_common())
+        kinds = ", ".join(f"{KIND_NAMES[k]} {n}" for k, n in self.kinds.most_common())
+        print(f"🧭 路由 ({self.policy}): {models} | {kinds}", file=sys.stderr)
+
+
+def _label(decision: dict) -> str:
+    return decision["model_version"] + ("+OCR" if decision["is_ocr"] else "")
+
+
+def route_tag(job) -> str:
+    """` 🧭pipeline+OCR` for a routed job, for progress lines; empty otherwise."""
+    return f" 🧭{_label(job.route)}" if job.route else ""
+
+
+ROUTER = Router()
+
+
+def add_route_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--route", choices=ROUTE_POLICIES,
+                        help="Pick model and OCR per PDF from a local inspection "
+                             "(--model is kept for other files)")
+
+
+def setup_route(args: argparse.Namespace) -> None:
+    policy = getattr(args, "route", None)
+    if policy:
+        ROUTER.enable(policy)
+
+
+def route_batches(paths: Iterable[str], options: dict) -> List[Tuple[dict, List[str]]]:
+    """Group file paths of one upload batch by their routed options (one group without --route)."""
+    paths = list(paths)
+    if not ROUTER.enabled:
+        return [(options, paths)]
+    groups: Dict[tuple, Tuple[dict, List[str]]] = {}
+    for path in paths:
+        routed, _ = ROUTER.options_for(Path(path), options)
+        groups.setdefault(tuple(sorted(routed.items())), (routed, []))[1].append(path)
+    return list(groups.values())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+MinerU input scanner - streaming, recursive directory discovery
+
+Walks the input tree with `os.scandir` (one directory listing at a time, no
+per-file stat on filesystems that report entry types) and yields matching
+files as soon as they are seen, so workers can start uploading long before
+a large NFS share has been fully listed.
+
+Usage:
+    for path in scan_files(Path("./pdfs"), {".pdf"}, recursive=True):
+        out_dir = mirror_output_dir(path, Path("./pdfs"), Path("./parsed"))
+"""
+
+import argparse
+import os
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+
+def _matches(rel_path: str, name: str, patterns: Sequence[str]) -> bool:
+    """True if the relative POSIX path or the bare name matches any glob pattern."""
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def scan_files(
+    root: Path,
+    exts: Iterable[str],
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    recursive: bool = False,
+    skip_dirs: Iterable[Path] = (),
+) -> Iterator[Path]:
+    """Yield files under `root` whose extension is in `exts`, as they are discovered.
+
+    - Extensions are matched case-insensitively in a single pass (`.pdf`
+      matches `a.PDF` and `b.Pdf`).
+    - `include` / `exclude` are glob patterns matched against the path
+      relative to `root` (POSIX separators) or the bare file name. A file
+      must match at least one include pattern (if any are given) and no
+      exclude pattern. Directories matching an exclude pattern are pruned.
+    - `skip_dirs` are never descended into (e.g. an output directory that
+      lives inside the input tree).
+    - Hidden entries (starting with ".") are ignored.
+
+    Order follows the filesystem's directory order; nothing is sorted, so
+    no directory is held in memory longer than it takes to list it.
+    """
+    exts = {e.lower() for e in exts}
+    include = list(include or [])
+    exclude = list(exclude or [])
+    root = Path(root)
+    skip = {os.path.abspath(d) for d in skip_dirs}
+
+    stack = [(str(root), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith("."):
+                        continue
+                    rel_path = f"{rel_dir}{name}"
+                    try:
+                        if entry.is_dir():
+                            if not recursive or os.path.abspath(entry.path) in skip:
+                                continue
+                            if exclude and _matches(rel_path, name, exclude):
+                                continue
+                            stack.append((entry.path, rel_path + "/"))
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    if os.path.splitext(name)[1].lower() not in exts:
+                        continue
+                    if include and not _matches(rel_path, name, include):
+                        continue
+                    if exclude and _matches(rel_path, name, exclude):
+                        continue
+                    yield Path(entry.path)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            continue
+
+
+def mirror_output_dir(file_path: Path, input_root: Path, output_root: Path) -> Path:
+    """Return the output directory that mirrors `file_path`'s parent under `output_root`.
+
+    `./in/a/b/doc.pdf` with input root `./in` maps to `output_root/a/b`, so the
+    parsed result lands in `output_root/a/b/doc/`. Files outside the input
+    root (e.g. a single `--file`) map to `output_root` itself.
+    """
+    try:
+        rel_parent = Path(file_path).parent.relative_to(input_root)
+    except ValueError:
+        return Path(output_root)
+    return Path(output_root) / rel_parent
+
+
+def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared --recursive / --include / --exclude options to a CLI."""
+    parser.add_argument("--recursive", "-r", action="store_true",
+                        help="Scan subdirectories too (outputs mirror the input tree)")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only process files matching this glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files/directories matching this glob (repeatable)")
+
+
+def scan_from_args(args: argparse.Namespace, root: Path, exts: Iterable[str], output_dir: Path) -> Iterator[Path]:
+    """Run `scan_files` with the options added by `add_scan_arguments`."""
+    return scan_files(
+        root, exts,
+        include=args.include,
+        exclude=args.exclude,
+        recursive=args.recursive,
+        skip_dirs=[output_dir],
+    )
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+MinerU local service - one shared async engine for many clients
+
+Runs a small HTTP server on localhost. Clients submit documents (a local
+path or an uploaded body), get a job ID back immediately and poll for the
+result. All jobs share one aiohttp connection pool, one status poller (every
+outstanding batch is checked in a single loop instead of one polling loop
+per document) and one API rate limiter, so N callers cost about as much as
+one long-running batch process.
+
+Usage:
+    python mineru_serve.py --output ./served/ --port 8765 --workers 10
+
+    curl -X POST localhost:8765/jobs -d '{"path": "/abs/doc.pdf"}'
+    curl -X POST "localhost:8765/jobs?filename=doc.pdf" --data-binary @doc.pdf
+    curl localhost:8765/jobs/<job_id>
+    curl localhost:8765/jobs/<job_id>/result
+
+Path submissions read files on the server's disk. They are accepted under the
+`--allow-root` folders only; without one, only on a loopback `--host`.
+Finished jobs are dropped from the job table `--job-ttl` seconds after they
+end (their results stay in the output folder).
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from mineru_download import async_fetch_result
+from mineru_engine import JOB_RETRIES, AsyncEngine
+from mineru_tokens import TokenPool, add_token_arguments, token_pool
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 10
+DEFAULT_RATE = 5.0
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_TIMEOUT = 600
+DEFAULT_JOB_TTL = 3600
+
+JOB_STATES = ("queued", "uploading", "parsing", "downloading", "done", "failed")
+OPTION_KEYS = ("model_version", "language", "is_ocr", "enable_formula", "enable_table", "page_ranges")
+
+
+class RateLimiter:
+    """Token bucket shared by every API call the service makes."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BatchPoller:
+    """Single polling loop for every outstanding batch.
+
+    `wait()` registers a batch and returns its `full_zip_url` once the server
+    reports `done`. One round checks all registered batches concurrently
+    (through the shared rate limiter), then sleeps `interval`.
+    """
+
+    def __init__(self, engine: AsyncEngine, limiter: RateLimiter, interval: float = DEFAULT_POLL_INTERVAL):
+        self.engine = engine
+        self.limiter = limiter
+        self.interval = interval
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._wake = asyncio.Event()
+
+    async def wait(self, batch_id: str, timeout: float = DEFAULT_TIMEOUT) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[batch_id] = future
+        self._wake.set()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("等待超时")
+        finally:
+            self._waiters.pop(batch_id, None)
+
+    async def _check(self, batch_id: str, future: asyncio.Future) -> None:
+        await self.limiter.acquire()
+        try:
+            item = next(iter(await self.engine.batch_results(batch_id)), None)
+        except Exception:
+            return  # transient; retried next round
+        if future.done() or not item:
+            return
+        state = item.get("state")
+        if state == "done":
+            future.set_result(item.get("full_zip_url"))
+        elif state == "failed":
+            future.set_exception(Exception(item.get("err_msg", "解析失败")))
+
+    async def run(self) -> None:
+        while True:
+            if not self._waiters:
+                self._wake.clear()
+                await self._wake.wait()
+            pending = [(b, f) for b, f in self._waiters.items() if not f.done()]
+            await asyncio.gather(*(self._check(b, f) for b, f in pending))
+            await asyncio.sleep(self.interval)
+
+
+class Job:
+    def __init__(self, path: Path, name: str, options: dict, uploaded: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.path = path
+        self.name = name
+        self.options = options
+        self.uploaded = uploaded
+        self.state = "queued"
+        self.error = None
+        self.batch_id = None
+        self.output_dir = None
+        self.markdown = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "error": self.error,
+            "batch_id": self.batch_id,
+            "output_dir": str(self.output_dir) if self.output_dir else None,
+            "markdown": str(self.markdown) if self.markdown else None,
+            "created": self.created,
+            "finished": self.finished,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+
+
+class MinerUService:
+    """Job table plus the shared engine (session, client, poller, limiter)."""
+
+    def __init__(self, token: TokenPool, output_dir: Path, workers: int, rate: float,
+                 poll_interval: float, timeout: float, allow_roots: Optional[List[Path]] = None,
+                 job_ttl: float = DEFAULT_JOB_TTL):
+        self.token = token
+        self.output_dir = output_dir
+        self.upload_dir = output_dir / "_uploads"
+        self.workers = workers
+        self.rate = rate
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.allow_roots = allow_roots  # None: any path; []: no path submissions
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, Job] = {}
+        self.session = None
+        self.engine = None
+        self.slots = None
+        self.limiter = None
+        self.poller = None
+        self._tasks = set()
+
+    async def start(self, app: web.Application) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        connector = aiohttp.TCPConnector(limit=self.workers * 2, force_close=False)
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=3600)
+        )
+        self.engine = AsyncEngine(self.token, self.session)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.limiter = RateLimiter(self.rate)
+        self.poller = BatchPoller(self.engine, self.limiter, self.poll_interval)
+        self._tasks.add(asyncio.ensure_future(self.poller.run()))
+        self._tasks.add(asyncio.ensure_future(self._expire()))
+
+    async def stop(self, app: web.Application) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.session.close()
+
+    async def _expire(self) -> None:
+        """Drop finished jobs from the table once they are `job_ttl` seconds old."""
+        while True:
+            await asyncio.sleep(max(1, min(self.job_ttl, 60)))
+            cutoff = time.time() - self.job_ttl
+            for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+                del self.jobs[job_id]
+
+    def allowed(self, path: Path) -> bool:
+        """True if a submitted server-side path may be read (see --allow-root)."""
+        if self.allow_roots is None:
+            return True
+        return any(path == root or root in path.parents for root in self.allow_roots)
+
+    def submit(self, path: Path, name: str, options: dict, uploaded: bool = False) -> Job:
+        job = Job(path, name, options, uploaded)
+        self.jobs[job.id] = job
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Job) -> None:
+        stem = Path(job.name).stem
+        out_dir = self.output_dir / job.id
+        for attempt in range(JOB_RETRIES):
+            try:
+                # 上传/下载占用并发槽；等待解析期间不占槽，只挂在共享轮询器上
+                async with self.slots:
+                    job.state = "uploading"
+                    await self.limiter.acquire()
+                    batch_id, urls = await self.engine.create_upload_urls(
+                        [(job.name, stem)], job.options
+                    )
+                    job.batch_id = batch_id
+                    await self.engine.upload(urls[0], job.path)
+
+                job.state = "parsing"
+                zip_url = await self.poller.wait(batch_id, self.timeout)
+
+                async with self.slots:
+                    job.state = "downloading"
+                    out_dir.mkdir(parents=True, exist_ok=True)
+                    extract_dir = await async_fetch_result(
+                        self.session, zip_url, out_dir, stem, {"batch_id": batch_id}
+                    )
+
+                job.output_dir = extract_dir
+                md_file = extract_dir / f"{stem}.md"
+                job.markdown = md_file if md_file.exists() else None
+                job.state = "done"
+                job.error = None
+                break
+            except Exception as e:
+                job.error = str(e)
+                if attempt < JOB_RETRIES - 1:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                job.state = "failed"
+        job.finished = time.time()
+        if job.uploaded:
+            try:
+                job.path.unlink()
+                job.path.parent.rmdir()
+            except OSError:
+                pass
+
+    # ============ HTTP handlers ============
+
+    async def handle_submit(self, request: web.Request) -> web.Response:
+        options = {k: _coerce(v) for k, v in request.query.items() if k in OPTION_KEYS}
+
+        if request.content_type == "application/json":
+            try:
+                body = await request.json()
+            except ValueError:
+                return web.json_response({"error": "invalid JSON body"}, status=400)
+            if not isinstance(body, dict) or not isinstance(body.get("options", {}), dict):
+                return web.json_response(
+                    {"error": "body must be an object, 'options' an object"}, status=400)
+            path = Path(os.path.expanduser(str(body.get("path", ""))))
+            options.update({k: v for k, v in body.get("options", {}).items() if k in OPTION_KEYS})
+            if body.get("path") and not self.allowed(path.resolve()):
+                return web.json_response({"error": f"path not allowed: {path}"}, status=403)
+            if not body.get("path") or not path.is_file():
+                return web.json_response({"error": f"file not found: {path}"}, status=400)
+            job = self.submit(path.resolve(), path.name, options)
+            return web.json_response(job.to_dict(), status=202)
+
+        if request.content_type == "multipart/form-data":
+            reader = await request.multipart()
+            field = await reader.next()
+            while field is not None and field.name != "file":
+                field = await reader.next()
+            if field is None or not field.filename:
+                return web.json_response({"error": "missing 'file' field"}, status=400)
+            filename, stream = field.filename, field
+        else:
+            filename = request.query.get("filename")
+            if not filename:
+                return web.json_response({"error": "missing ?filename="}, status=400)
+            stream = request.content
+
+        filename = _safe_name(filename)
+        dest_dir = self.upload_dir / uuid.uuid4().hex[:16]
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dest = dest_dir / filename
+        with open(dest, "wb") as f:
+            if stream is request.content:
+                async for chunk in stream.iter_chunked(1 << 16):
+                    f.write(chunk)
+            else:
+                while True:
+                    chunk = await stream.read_chunk(1 << 16)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+
+        job = self.submit(dest, filename, options, uploaded=True)
+        return web.json_response(job.to_dict(), status=202)
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        job = self.jobs.get(request.match_info["job_id"])
+        if not job:
+            return web.json_response({"error": "unknown job"}, status=404)
+        return web.json_response(job.to_dict())
+
+    async def handle_result(self, request: web.Request) -> web.Response:
+        job = self.jobs.get(request.match_info["job_id"])
+        if not job:
+            return web.json_response({"error": "unknown job"}, status=404)
+        if job.state == "failed":
+            return web.json_response(job.to_dict(), status=422)
+        if job.state != "done":
+            return web.json_response(job.to_dict(), status=409)
+        if not job.markdown:
+            return web.json_response({"error": "no markdown in result", **job.to_dict()}, status=404)
+        return web.FileResponse(job.markdown, headers={"Content-Type": "text/markdown; charset=utf-8"})
+
+    async def handle_list(self, request: web.Request) -> web.Response:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self.jobs.values():
+            counts[job.state] += 1
+        state = request.query.get("state")
+        jobs = [j.to_dict() for j in self.jobs.values() if not state or j.state == state]
+        return web.json_response({"counts": counts, "jobs": jobs})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        waiting = len(self.poller._waiters) if self.poller else 0
+        return web.json_response({"ok": True, "jobs": len(self.jobs), "polling": waiting})
+
+
+def _coerce(value: str):
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return value
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _safe_name(filename: str) -> str:
+    name = Path(filename).name
+    return re.sub(r"[^\w.\-一-鿿 ]", "_", name) or "document.pdf"
+
+
+def create_app(service: MinerUService) -> web.Application:
+    app = web.Application(client_max_size=200 * 1024 * 1024)
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.add_routes([
+        web.post("/jobs", service.handle_submit),
+        web.get("/jobs", service.handle_list),
+        web.get("/jobs/{job_id}", service.handle_status),
+        web.get("/jobs/{job_id}/result", service.handle_result),
+        web.get("/health", service.handle_health),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MinerU local parsing service")
+    parser.add_argument("--output", default="./served/", help="Output directory for results")
+    parser.add_argument("--token", help="MinerU API token, or several comma-separated "
+                                        "(or set MINERU_TOKEN env)")
+    add_token_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent uploads/downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"Max API calls per second across all jobs (default: {DEFAULT_RATE}, 0 = unlimited)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--allow-root", action="append", metavar="DIR",
+                        help="Accept path submissions under this folder (repeatable; default: "
+                             "any path on a loopback --host, none otherwise)")
+    parser.add_argument("--job-ttl", type=float, default=DEFAULT_JOB_TTL, metavar="SECONDS",
+                        help=f"Forget finished jobs after this long (default: {DEFAULT_JOB_TTL})")
+
+    args = parser.parse_args()
+
+    token = token_pool(args)
+    if not token:
+        print("❌ 请设置 MINERU_TOKEN")
+        sys.exit(1)
+
+    if args.allow_root:
+        allow_roots = [Path(root).expanduser().resolve() for root in args.allow_root]
+    else:
+        allow_roots = None if _is_loopback(args.host) else []
+
+    service = MinerUService(
+        token, Path(args.output), args.workers, args.rate, args.poll_interval, args.timeout,
+        allow_roots, args.job_ttl,
+    )
+    print(f"🚀 MinerU 服务: http://{args.host}:{args.port} (并发: {args.workers}, 限速: {args.rate}/s)")
+    print(f"📁 输出到: {args.output}")
+    if allow_roots == []:
+        print("🔒 非本机地址: 不接受服务器路径提交，只接受上传 (可用 --allow-root 放行目录)")
+    web.run_app(create_app(service), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,136 +6,66 @@ MinerU Document Parser - 稳健串行版 (适合网络不稳定)
 """
 
 import argparse
-import os
 import sys
 import time
-import zipfile
 from pathlib import Path
 
-import requests
-
-API_BASE = "https://mineru.net/api/v4"
+from mineru_download import add_download_arguments, setup_download
+from mineru_engine import Engine, Job, Policy, run_serial
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_local import add_local_arguments, setup_local
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pages import add_pages_arguments, setup_pages
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_queue import add_queue_arguments, coordinate, handled_elsewhere, setup_queue
+from mineru_route import add_route_arguments, route_tag, setup_route
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_sync import add_sync_arguments, finish_sync, is_current, setup_sync, track_sync
+from mineru_tokens import add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace
 
 SUPPORTED_EXTS = {
     ".pdf", ".docx", ".pptx",
     ".jpg", ".jpeg", ".png",
 }
 
-
-def collect_files(path: Path) -> list[Path]:
-    files = []
-    for f in sorted(path.iterdir()):
-        if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS:
-            files.append(f)
-    return files
+# 串行 + 固定 3 秒重试间隔，最大化弱网下的成功率
+POLICY = Policy(retries=5, backoff=lambda attempt: 3, poll_interval=5, timeout=600)
 
 
 def get_token(args):
-    return args.token or os.environ.get("MINERU_TOKEN")
+    """单个 token 或 token 池（--token a,b / --tokens-file / MINERU_TOKENS）"""
+    return token_pool(args)
 
 
-def headers(token):
-    return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
+def api_options(args):
+    options = {
+        "model_version": args.model,
+        "enable_formula": not args.no_formula,
+        "enable_table": not args.no_table,
     }
-
-
-def process_single_file(token, file_path, output_dir, model, language, enable_formula, enable_table):
-    """处理单个文件，带重试"""
-    filename = Path(file_path).name
-    stem = Path(file_path).stem
-
-    # 检查是否已存在
-    if (output_dir / stem).exists():
-        print(f"  ⏭️  已存在: {stem}")
-        return True
-
-    print(f"  📤 {stem}...", end=" ", flush=True)
-
-    # 获取上传链接
-    for attempt in range(5):
-        try:
-            payload = {
-                "files": [{"name": filename, "data_id": stem}],
-                "model_version": model,
-                "enable_formula": enable_formula,
-                "enable_table": enable_table,
-            }
-            if language != "auto":
-                payload["language"] = language
-            resp = requests.post(
-                f"{API_BASE}/file-urls/batch",
-                headers=headers(token),
-                json=payload,
-                timeout=60,
-            )
-            result = resp.json()
-            
-            if result.get("code") != 0:
-                raise Exception(result.get("msg"))
-            
-            batch_id = result["data"]["batch_id"]
-            upload_url = result["data"]["file_urls"][0]
-            
-            # 上传
-            with open(file_path, "rb") as f:
-                upload_resp = requests.put(upload_url, data=f, timeout=300)
-            
-            if upload_resp.status_code != 200:
-                raise Exception(f"上传状态码: {upload_resp.status_code}")
-            
-            print("⏳ 解析中...", end=" ", flush=True)
-            
-            # 等待解析
-            for _ in range(120):  # 最多等 10 分钟
-                status_resp = requests.get(
-                    f"{API_BASE}/extract-results/batch/{batch_id}",
-                    headers=headers(token),
-                    timeout=30,
-                )
-                results = status_resp.json()["data"]["extract_result"]
-                
-                if results:
-                    state = results[0].get("state")
-                    if state == "done":
-                        # 下载
-                        zip_url = results[0]["full_zip_url"]
-                        zip_path = output_dir / f"{stem}.zip"
-                        
-                        dl_resp = requests.get(zip_url, timeout=300)
-                        zip_path.write_bytes(dl_resp.content)
-                        
-                        extract_dir = output_dir / stem
-                        with zipfile.ZipFile(zip_path) as zf:
-                            zf.extractall(extract_dir)
-                        
-                        zip_path.unlink()
-                        
-                        # 重命名
-                        md = extract_dir / "full.md"
-                        if md.exists():
-                            md.rename(extract_dir / f"{stem}.md")
-                        
-                        print("✅")
-                        return True
-                    
-                    elif state == "failed":
-                        raise Exception(results[0].get("err_msg", "解析失败"))
-                
-                time.sleep(5)
-            
-            raise Exception("等待超时")
-            
-        except Exception as e:
-            if attempt < 4:
-                print(f"🔄 重试{attempt+1}...", end=" ", flush=True)
-                time.sleep(3)
-            else:
-                print(f"❌ {e}")
-                return False
-    
-    return False
+    if args.language != "auto":
+        options["language"] = args.language
+    if args.ocr:
+        options["is_ocr"] = True
+    return options
+
+
+def print_progress(job, event):
+    if event == "skip":
+        print(f"[{job.index + 1}]   ⏭️  已存在: {job.name}")
+    elif event == "start":
+        print(f"[{job.index + 1}]   📤 {job.name}...", end=" ", flush=True)
+    elif event == "parse":
+        print(f"⏳ 解析中{route_tag(job)}...", end=" ", flush=True)
+    elif event == "retry":
+        print(f"🔄 重试{job.attempts}...", end=" ", flush=True)
+    elif event == "done":
+        print("✅")
+    elif event == "failed":
+        print(f"❌ {job.error}")
 
 
 def main():
@@ -148,7 +78,9 @@ def main():
     parser.add_argument("--resume", action="store_true")
     parser.add_argument("--model", default="vlm",
                         choices=["pipeline", "vlm", "MinerU-HTML"],
-                        help="Model version (default: vlm)")
+                        help="Model version (default: vlm; with --route: for non-PDF files)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="Force OCR (with --route: for every file)")
     parser.add_argument("--language", default="auto",
                         choices=["auto", "en", "ch"],
                         help="Document language (default: auto)")
@@ -156,8 +88,34 @@ def main():
                         help="Disable formula recognition")
     parser.add_argument("--no-table", action="store_true",
                         help="Disable table extraction")
+    add_scan_arguments(parser)
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
+    add_queue_arguments(parser)
+    add_sync_arguments(parser)
+    add_local_arguments(parser)
+    add_route_arguments(parser)
+    add_pages_arguments(parser)
 
     args = parser.parse_args()
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
+    setup_queue(args)
+    setup_sync(args)
+    setup_local(args)
+    setup_route(args)
+    setup_pages(args)
 
     token = get_token(args)
     if not token:
@@ -167,46 +125,64 @@ def main():
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # 收集文件
+    # 收集文件：边扫描边处理
     if args.file:
-        input_files = [Path(args.file)]
+        input_root = Path(args.file).parent
+        input_files = iter([Path(args.file)])
     else:
-        input_files = collect_files(Path(args.dir))
-
-    if not input_files:
-        print("❌ 未找到支持的文件 (PDF/docx/pptx/jpg/png)")
-        sys.exit(1)
-
-    # 过滤已处理的
-    if args.resume:
-        original = len(input_files)
-        input_files = [f for f in input_files if not (output_dir / f.stem).exists()]
-        skipped = original - len(input_files)
-        if skipped:
-            print(f"⏭️  跳过已处理: {skipped} 个\n")
+        input_root = Path(args.dir)
+        input_files = timed_iter("scan", scan_from_args(args, input_root, SUPPORTED_EXTS, output_dir))
 
-    if not input_files:
-        print("✅ 所有文件已完成!")
-        return
-
-    print(f"📚 待处理: {len(input_files)} 个文件 (模型: {args.model})\n")
-
-    enable_formula = not args.no_formula
-    enable_table = not args.no_table
+    model = f"按 {args.route} 路由" if args.route else args.model
+    print(f"📚 开始处理 (模型: {model})\n")
 
+    options = api_options(args)
     success = 0
     failed = 0
+    skipped = 0
     failed_files = []
 
     start = time.time()
 
-    for i, f in enumerate(input_files):
-        print(f"[{i+1}/{len(input_files)}]", end=" ")
-        if process_single_file(token, f, output_dir, args.model, args.language, enable_formula, enable_table):
+    def iter_pending():
+        nonlocal skipped
+        for f in input_files:
+            target = mirror_output_dir(f, input_root, output_dir)
+            # 过滤已处理的
+            if is_current(f, target, args.resume):
+                skipped += 1
+                file_done("skipped")
+                continue
+            yield Job(f, target, options=options)
+
+    processed = 0
+    # --queue 时只处理本节点认领到的文件
+    jobs, on_event = coordinate(iter_pending(), input_root, track_sync(print_progress))
+    for job in run_serial(Engine(token, POLICY), jobs, on_event):
+        processed += 1
+        if job.skipped:
             success += 1
+            file_done("skipped")
+        elif job.ok:
+            success += 1
+            file_done("success")
         else:
             failed += 1
-            failed_files.append(f.name)
+            failed_files.append(job.filename)
+            file_done("failed")
+
+    finish_sync()
+    close_events()
+
+    if skipped:
+        print(f"⏭️  跳过已处理: {skipped} 个\n")
+
+    if processed == 0:
+        if skipped or handled_elsewhere():
+            print("✅ 所有文件已完成!")
+            return
+        print("❌ 未找到支持的文件 (PDF/docx/pptx/jpg/png)")
+        sys.exit(1)
     
     elapsed = time.time() - start
     print(f"\n{'='*50}")
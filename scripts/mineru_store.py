@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+MinerU result store - one SQLite file instead of a folder per document
+
+With `--store [DB]` results are not unpacked into `<output>/<name>/`. They go
+into a single SQLite database (default `<output>/mineru-results.db`): one row
+per document, plus one blob row per file it would have extracted, such as
+`<name>.md`, `images/...` or the JSON files. `--keep` /
+`--referenced-images` still apply. A large corpus then stays one file for
+listing, backup and copying, and resume checks become primary-key lookups.
+
+Documents are keyed by their path relative to the store's directory without
+the extension, e.g. `paper` or `sub/dir/paper` with --recursive. Workers in
+one process share a connection and write one transaction per document under
+a lock. The database runs in WAL mode with a busy timeout, so several runs
+can write to the same store while readers keep reading.
+
+Python API:
+    store = ResultStore("./output/mineru-results.db")
+    "paper" in store
+    store.markdown("paper")
+    store.read("paper", "images/fig_0.jpg")
+    store.export("./unpacked")        # streams back to <dest>/<key>/...
+
+CLI:
+    python mineru_store.py ls ./output/mineru-results.db [KEY]
+    python mineru_store.py cat ./output/mineru-results.db KEY [MEMBER]
+    python mineru_store.py export ./output/mineru-results.db DEST [--prefix sub/]
+"""
+
+import argparse
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
+
+from mineru_archive import member_kind, select_members
+
+DEFAULT_STORE = "mineru-results.db"
+BUSY_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    key   TEXT PRIMARY KEY,
+    name  TEXT NOT NULL,
+    size  INTEGER NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    key    TEXT NOT NULL,
+    member TEXT NOT NULL,
+    kind   TEXT NOT NULL,
+    data   BLOB NOT NULL,
+    PRIMARY KEY (key, member)
+);
+"""
+
+
+class ResultStore:
+    """Documents and their files as rows of one SQLite database."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def key_for(self, output_dir: Path, name: str) -> str:
+        """Store key of `output_dir/name`: its path relative to the store, or `name`."""
+        try:
+            rel = Path(output_dir).resolve().relative_to(self.root.resolve())
+        except ValueError:
+            return name
+        return (rel / name).as_posix()
+
+    def add_zip(self, key: str, zip_path: Path, name: str, keep: Optional[Set[str]] = None,
+                referenced_only: bool = False) -> int:
+        """Store the selected members of a result ZIP (full.md as `<name>.md`), replacing
+        any earlier copy of `key`; returns bytes stored."""
+        size = 0
+        with zipfile.ZipFile(zip_path) as zf, self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM members WHERE key = ?", (key,))
+                for info in select_members(zf, keep, referenced_only):
+                    member = f"{name}.md" if info.filename == "full.md" else info.filename
+                    data = zf.read(info)
+                    size += len(data)
+                    self._db.execute(
+                        "INSERT INTO members (key, member, kind, data) VALUES (?, ?, ?, ?)",
+                        (key, member, member_kind(info.filename), data),
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO documents (key, name, size, added) VALUES (?, ?, ?, ?)",
+                    (key, name, size, time.time()),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return size
+
+    def delete(self, key: str) -> bool:
+        """Remove a document and its files; True if it was stored."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM members WHERE key = ?", (key,))
+            deleted = self._db.execute("DELETE FROM documents WHERE key = ?", (key,)).rowcount
+            self._db.execute("COMMIT")
+        return deleted > 0
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def __contains__(self, key: str) -> bool:
+        return bool(self._query("SELECT 1 FROM documents WHERE key = ?", (key,)))
+
+    def keys(self, prefix: str = "") -> List[str]:
+        rows = self._query("SELECT key FROM documents WHERE substr(key, 1, ?) = ? ORDER BY key",
+                           (len(prefix), prefix))
+        return [r[0] for r in rows]
+
+    def documents(self, prefix: str = "") -> List[Tuple[str, int, int]]:
+        """(key, bytes, member count) per document."""
+        return self._query(
+            "SELECT d.key, d.size, (SELECT count(*) FROM members m WHERE m.key = d.key) "
+            "FROM documents d WHERE substr(d.key, 1, ?) = ? ORDER BY d.key",
+            (len(prefix), prefix),
+        )
+
+    def members(self, key: str) -> List[Tuple[str, str, int]]:
+        """(member, kind, bytes) of one document."""
+        return self._query(
+            "SELECT member, kind, length(data) FROM members WHERE key = ? ORDER BY member", (key,)
+        )
+
+    def read(self, key: str, member: str) -> bytes:
+        rows = self._query("SELECT data FROM members WHERE key = ? AND member = ?", (key, member))
+        if not rows:
+            raise KeyError(f"{key}: {member}")
+        return rows[0][0]
+
+    def markdown(self, key: str) -> str:
+        rows = self._query("SELECT data FROM members WHERE key = ? AND kind = 'md' "
+                           "ORDER BY member = (SELECT name FROM documents WHERE key = ?) || '.md' DESC",
+                           (key, key))
+        if not rows:
+            raise KeyError(f"{key} has no Markdown")
+        return rows[0][0].decode("utf-8")
+
+    def _iter_members(self, prefix: str) -> Iterator[Tuple[str, str, bytes]]:
+        # own connection, rows fetched one at a time: no writer lock, one file in memory
+        db = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT)
+        try:
+            yield from db.execute(
+                "SELECT key, member, data FROM members WHERE substr(key, 1, ?) = ? ORDER BY key",
+                (len(prefix), prefix),
+            )
+        finally:
+            db.close()
+
+    def export(self, dest: Path, prefix: str = "") -> int:
+        """Write documents back out as `<dest>/<key>/<member>`; returns the document count."""
+        dest = Path(dest)
+        count, last = 0, None
+        for key, member, data in self._iter_members(prefix):
+            path = dest / key / member
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            if key != last:
+                count, last = count + 1, key
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class StoreBackend:
+    """The `--store` output backend used by fetch_result."""
+
+    def __init__(self):
+        self.store: Optional[ResultStore] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def enable(self, path: Path) -> None:
+        """Store results in the database at `path` instead of extracting them."""
+        self.store = ResultStore(path)
+        atexit.register(self.store.close)
+
+    def has(self, output_dir: Path, name: str) -> bool:
+        return self.store.key_for(output_dir, name) in self.store
+
+    def remove(self, output_dir: Path, name: str) -> bool:
+        return self.store.delete(self.store.key_for(output_dir, name))
+
+
+STORE = StoreBackend()
+
+
+# ============ CLI ============
+
+def cmd_ls(store: ResultStore, args: argparse.Namespace) -> None:
+    if args.key:
+        members = store.members(args.key)
+        if not members:
+            print(f"❌ 找不到: {args.key}", file=sys.stderr)
+            sys.exit(1)
+        for member, kind, size in members:
+            print(f"{size:>12}  {kind:<12}  {member}")
+        return
+    for key, size, count in store.documents(args.prefix):
+        print(f"{size:>12}  {count:>5}  {key}")
+
+
+def cmd_cat(store: ResultStore, args: argparse.Namespace) -> None:
+    try:
+        if args.member:
+            data = store.read(args.key, args.member)
+        else:
+            data = store.markdown(args.key).encode("utf-8")
+    except KeyError as e:
+        print(f"❌ 找不到: {e}", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.buffer.write(data)
+
+
+def cmd_export(store: ResultStore, args: argparse.Namespace) -> None:
+    count = store.export(Path(args.dest), args.prefix)
+    print(f"✅ 已导出 {count} 个文档到 {args.dest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read results written with --store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ls", help="List documents, or the files of one")
+    p.add_argument("db")
+    p.add_argument("key", nargs="?")
+    p.add_argument("--prefix", default="", help="Only keys starting with this (e.g. sub/dir/)")
+    p.set_defaults(func=cmd_ls)
+
+    p = sub.add_parser("cat", help="Write one file to stdout (default: the Markdown)")
+    p.add_argument("db")
+    p.add_argument("key")
+    p.add_argument("member", nargs="?")
+    p.set_defaults(func=cmd_cat)
+
+    p = sub.add_parser("export", help="Write documents back out as <dest>/<key>/ folders")
+    p.add_argument("db")
+    p.add_argument("dest")
+    p.add_argument("--prefix", default="", help="Only keys starting with this")
+    p.set_defaults(func=cmd_export)
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"❌ 找不到结果库: {args.db}", file=sys.stderr)
+        sys.exit(1)
+    store = ResultStore(Path(args.db))
+    try:
+        args.func(store, args)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+MinerU incremental sync - keep an output tree in step with its inputs
+
+`--resume` only asks whether an output exists, so a PDF replaced under the
+same name is never parsed again, and outputs of deleted inputs stay behind.
+With `--sync [MANIFEST]` a run keeps a manifest (default
+`<output>/mineru-manifest.jsonl`) of every parsed input's path, size,
+mtime and SHA-256, and only parses what is new or changed:
+
+    same size + mtime, result present   unchanged, skipped (stat only)
+    same size, new mtime                hashed; same hash means unchanged
+    anything else                       parsed again, replacing the old result
+
+Only files whose size matches but whose mtime moved are hashed at check
+time, so a no-op sync costs one stat per file plus a manifest load. New
+results are hashed once when recorded. Existing outputs without a manifest
+entry (e.g. from earlier `--resume` runs) are adopted as current, without
+hashing. With `--prune`, results of manifest entries whose input file no
+longer exists are deleted at the end of the run. Inputs that still exist but
+were filtered out by `--include` / `--exclude` are kept. With `--pages`, the
+default manifest is `mineru-manifest__pages-<spec>.jsonl`, so triage and
+full runs are tracked apart.
+
+The manifest is append-only JSONL like the download ledger (later lines
+win, `{"path": ..., "deleted": true}` drops an entry), and is compacted at
+the end of each run:
+
+    {"path": "/in/a.pdf", "size": 1234, "mtime_ns": 1718000000000000000,
+     "sha256": "9f86...", "output": "/out", "name": "a"}
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from mineru_download import has_result, remove_result, replace_result
+from mineru_engine import EventHook, Job
+from mineru_metrics import timed
+from mineru_pages import pages_suffix, result_name
+
+DEFAULT_MANIFEST = "mineru-manifest.jsonl"
+HASH_CHUNK = 1 << 20
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file, read in 1 MB chunks (timed as the `hash` stage)."""
+    digest = hashlib.sha256()
+    with timed("hash") as t, open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+            t.bytes += len(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Path -> last parsed (size, mtime, hash, output) of each input."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, dict] = {}
+        self.lines = 0
+        self._lock = threading.Lock()
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            f = None
+        if f:
+            with f:
+                for line in f:
+                    self.lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get("deleted"):
+                        self.entries.pop(entry["path"], None)
+                    else:
+                        self.entries[entry["path"]] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.lines += 1
+
+    def put(self, entry: dict) -> None:
+        with self._lock:
+            self.entries[entry["path"]] = entry
+        self._append(entry)
+
+    def drop(self, path: str) -> None:
+        with self._lock:
+            self.entries.pop(path, None)
+        self._append({"path": path, "deleted": True})
+
+    def close(self) -> None:
+        """Rewrite the file with one line per entry if it has grown stale."""
+        with self._lock:
+            self._file.close()
+            if self.lines <= len(self.entries):
+                return
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+
+
+class Sync:
+    """Decides per input whether it needs parsing and records what was parsed."""
+
+    def __init__(self, manifest: Path, prune: bool = False):
+        self.manifest = Manifest(manifest)
+        self.prune = prune
+        self.seen = set()
+        self.added = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.pruned = 0
+        # input path -> (size, mtime_ns, output dir) as checked, until its job finishes
+        self._pending: Dict[str, Tuple[int, int, Path]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str, st: os.stat_result, output_dir: Path, name: str,
+               digest: Optional[str]) -> dict:
+        return {"path": key, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest,
+                "output": os.path.abspath(output_dir), "name": name}
+
+    def needs_parse(self, path: Path, output_dir: Path) -> bool:
+        """True if `path` is new or changed since the manifest (its old result is
+        replaced once the new one is downloaded)."""
+        key = os.path.abspath(path)
+        self.seen.add(key)
+        st = os.stat(key)
+        entry = self.manifest.entries.get(key)
+        name = result_name(path)
+        if has_result(output_dir, name):
+            if entry is None:
+                # Parsed before --sync was used: take it as current
+                self.manifest.put(self._entry(key, st, output_dir, name, None))
+                self.unchanged += 1
+                return False
+            if entry["size"] == st.st_size:
+                if entry["mtime_ns"] == st.st_mtime_ns:
+                    self.unchanged += 1
+                    return False
+                if entry.get("sha256") and file_hash(Path(key)) == entry["sha256"]:
+                    self.manifest.put(dict(entry, mtime_ns=st.st_mtime_ns))
+                    self.unchanged += 1
+                    return False
+            # Kept until the new result replaces it: the parse may fail, and with
+            # --queue another node may be the one re-parsing it
+            replace_result(output_dir, name)
+            self.changed += 1
+        else:
+            self.added += 1
+        with self._lock:
+            self._pending[key] = (st.st_size, st.st_mtime_ns, output_dir)
+        return True
+
+    def record(self, job: Job) -> None:
+        """Add a parsed job to the manifest, unless its input changed while parsing."""
+        key = os.path.abspath(job.source)
+        with self._lock:
+            checked = self._pending.pop(key, None)
+        if checked is None or not job.ok:
+            return
+        try:
+            st = os.stat(key)
+            if (st.st_size, st.st_mtime_ns) != checked[:2]:
+                return  # rewritten mid-run: leave it for the next sync
+            self.manifest.put(self._entry(key, st, checked[2], job.name, file_hash(Path(key))))
+        except OSError:
+            return
+
+    def track(self, on_event: EventHook = None) -> EventHook:
+        """Wrap an engine event hook so finished jobs are recorded in the manifest."""
+
+        def hook(job: Job, event: str) -> None:
+            if event in ("done", "failed", "skip"):
+                self.record(job)
+            if on_event:
+                on_event(job, event)
+
+        return hook
+
+    def finish(self) -> None:
+        """Prune results of deleted inputs (with --prune), compact the manifest, report."""
+        if self.prune:
+            for key, entry in list(self.manifest.entries.items()):
+                if key in self.seen or os.path.exists(key):
+                    continue  # present, or just filtered out by --include/--exclude
+                remove_result(Path(entry["output"]), entry["name"])
+                self.manifest.drop(key)
+                self.pruned += 1
+        self.manifest.close()
+        print(f"🔄 同步: 新增 {self.added}, 变更 {self.changed}, 未变 {self.unchanged}"
+              + (f", 清理 {self.pruned}" if self.prune else ""), file=sys.stderr)
+
+
+SYNC: Optional[Sync] = None
+
+
+def add_sync_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sync", nargs="?", const="", metavar="MANIFEST",
+                        help=f"Only parse new or changed inputs, tracked by size/mtime/hash in a "
+                             f"manifest (default: <output>/{DEFAULT_MANIFEST})")
+    parser.add_argument("--prune", action="store_true",
+                        help="With --sync, delete results whose input file was removed")
+
+
+def setup_sync(args: argparse.Namespace) -> None:
+    global SYNC
+    manifest = getattr(args, "sync", None)
+    if manifest is not None:
+        if not manifest:
+            # --pages triage runs track their own results, apart from full parses
+            spec = getattr(args, "pages", None)
+            default = Path(DEFAULT_MANIFEST)
+            if spec:
+                default = default.with_name(default.stem + pages_suffix(spec) + default.suffix)
+            manifest = Path(args.output) / default
+        SYNC = Sync(Path(manifest), args.prune)
+
+
+def is_current(path: Path, output_dir: Path, resume: bool) -> bool:
+    """True if `path` can be skipped: unchanged with --sync, else already parsed with --resume."""
+    if SYNC is not None:
+        return not SYNC.needs_parse(path, output_dir)
+    return resume and has_result(output_dir, result_name(path))
+
+
+def track_sync(on_event: EventHook = None) -> EventHook:
+    return SYNC.track(on_event) if SYNC else on_event
+
+
+def finish_sync() -> None:
+    """End of a completed run: prune and compact (no-op without --sync)."""
+    if SYNC is not None:
+        SYNC.finish()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+MinerU token pool - spread work over several API accounts
+
+One token caps a run at one account's daily quota and rate limit. Give the
+scripts several tokens and each new batch or URL task goes to the token
+with the most headroom. Tokens can be comma-separated in `--token` /
+`MINERU_TOKEN`, listed in `MINERU_TOKENS`, or given one per line in
+`--tokens-file`.
+
+Headroom means two things. First, the token must not be cooling down after
+an HTTP 429. Second, among those, the token with the fewest API calls in
+the last minute wins, with remaining `--token-quota` (documents per token
+for this run) as the tie-break.
+
+A token that answers with A0202 (invalid), A0211 (expired) or -60018
+(daily limit reached) is quarantined for the rest of the run, and the
+request moves on to the next token. Each batch / task remembers the token
+that created it, so its status is always polled with that token. The
+token's fingerprint is also written to the --defer-download ledger, so
+`mineru_download.py` refreshes expired URLs with the right account. The
+token itself is never written.
+
+    pool = TokenPool(["tok-a", "tok-b"], quota=500)
+    state = pool.acquire()          # best token for a new batch
+    pool.bind(batch_id, state)      # later: pool.owner(batch_id)
+"""
+
+import argparse
+import atexit
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Union
+
+QUARANTINE_CODES = {"A0202", "A0211", "-60018"}
+RATE_LIMIT_STATUS = 429
+COOLDOWN = 30.0  # seconds a token rests after a 429
+WINDOW = 60.0  # seconds of request history used to compare headroom
+
+
+class NoTokenAvailable(Exception):
+    """Every token is quarantined or out of quota."""
+
+
+def fingerprint(token: str) -> str:
+    """Short stable id of a token, safe to log and to write to ledgers."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:12]
+
+
+class TokenState:
+    def __init__(self, token: str, quota: Optional[int] = None):
+        self.token = token
+        self.id = fingerprint(token)
+        self.quota = quota
+        self.used = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.cool_until = 0.0
+        self.quarantined: Optional[str] = None
+        self.recent: Deque[float] = deque()
+
+    @property
+    def remaining(self) -> float:
+        return float("inf") if self.quota is None else self.quota - self.used
+
+    @property
+    def usable(self) -> bool:
+        return self.quarantined is None and self.remaining > 0
+
+
+class TokenPool:
+    """Thread-safe set of tokens; picks one per new batch and remembers owners."""
+
+    def __init__(self, tokens: Iterable[str], quota: Optional[int] = None,
+                 cooldown: float = COOLDOWN):
+        self.states = [TokenState(t, quota) for t in dict.fromkeys(tokens) if t]
+        if not self.states:
+            raise ValueError("empty token pool")
+        self.cooldown = cooldown
+        self._by_id = {s.id: s for s in self.states}
+        self._owners: Dict[str, TokenState] = {}
+        self._lock = threading.Lock()
+        if len(self.states) > 1:
+            atexit.register(self.report)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def _headroom(self, state: TokenState, now: float) -> int:
+        while state.recent and state.recent[0] < now - WINDOW:
+            state.recent.popleft()
+        return len(state.recent)
+
+    def acquire(self, cost: int = 1) -> TokenState:
+        """Token with the most headroom for `cost` more documents; raises NoTokenAvailable."""
+        now = time.monotonic()
+        with self._lock:
+            usable = [s for s in self.states if s.usable and s.remaining >= cost]
+            if not usable:
+                reasons = ", ".join(f"{s.id}: {s.quarantined or '额度用尽'}" for s in self.states)
+                raise NoTokenAvailable(f"没有可用的 token ({reasons})")
+            return min(usable, key=lambda s: (s.cool_until > now, self._headroom(s, now),
+                                              -s.remaining))
+
+    def bind(self, job_id: str, state: TokenState, cost: int = 1) -> None:
+        """Record that `state` created `job_id` for `cost` documents."""
+        with self._lock:
+            self._owners[job_id] = state
+            state.used += cost
+
+    def owner(self, job_id: str) -> TokenState:
+        """Token that created `job_id` (the first token if unknown)."""
+        with self._lock:
+            return self._owners.get(job_id, self.states[0])
+
+    def get(self, token_id: Optional[str]) -> Optional[TokenState]:
+        return self._by_id.get(token_id) if token_id else None
+
+    def note(self, state: TokenState, status: Optional[int] = None,
+             result: Optional[dict] = None) -> bool:
+        """Record one API call; returns True if `state` was just quarantined."""
+        now = time.monotonic()
+        with self._lock:
+            state.requests += 1
+            state.recent.append(now)
+            if status == RATE_LIMIT_STATUS:
+                state.rate_limited += 1
+                state.cool_until = now + self.cooldown
+            code = str((result or {}).get("code"))
+            if code in QUARANTINE_CODES and state.quarantined is None:
+                state.quarantined = f"{code} {(result or {}).get('msg', '')}".strip()
+                quarantined = True
+            else:
+                quarantined = False
+        if quarantined:
+            print(f"🔒 token {state.id} 已隔离: {state.quarantined}", file=sys.stderr)
+        return quarantined
+
+    def report(self) -> None:
+        lines = [f"  {s.id}: {s.used} 个文档, {s.requests} 次请求"
+                 + (f", 限流 {s.rate_limited} 次" if s.rate_limited else "")
+                 + (f", 已隔离 ({s.quarantined})" if s.quarantined else "")
+                 for s in self.states]
+        print("🔑 token 使用:\n" + "\n".join(lines), file=sys.stderr)
+
+
+TokenSource = Union[str, Iterable[str], TokenPool]
+
+
+def split_tokens(value: Optional[str]) -> List[str]:
+    return [t.strip() for t in (value or "").replace("\n", ",").split(",") if t.strip()]
+
+
+def as_pool(tokens: TokenSource) -> TokenPool:
+    """A TokenPool from a pool, one (comma-separated) token string or a list of tokens."""
+    if isinstance(tokens, TokenPool):
+        return tokens
+    if isinstance(tokens, str):
+        return TokenPool(split_tokens(tokens))
+    return TokenPool(tokens)
+
+
+# ============ CLI ============
+
+def add_token_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--tokens-file", metavar="PATH",
+                        help="File with one MinerU API token per line; work is spread over all "
+                             "tokens (also: comma-separated --token / MINERU_TOKEN, MINERU_TOKENS)")
+    parser.add_argument("--token-quota", type=int, metavar="N",
+                        help="Documents each token may take in this run (default: no limit)")
+
+
+def token_pool(args: argparse.Namespace) -> Optional[TokenPool]:
+    """All tokens from --token, --tokens-file and the environment, or None if there are none."""
+    tokens = split_tokens(getattr(args, "token", None)) or split_tokens(os.environ.get("MINERU_TOKEN"))
+    tokens += split_tokens(os.environ.get("MINERU_TOKENS"))
+    tokens_file = getattr(args, "tokens_file", None)
+    if tokens_file:
+        lines = Path(tokens_file).read_text(encoding="utf-8").splitlines()
+        tokens += [t.strip() for t in lines if t.strip() and not t.lstrip().startswith("#")]
+    if not tokens:
+        return None
+    return TokenPool(tokens, getattr(args, "token_quota", None))
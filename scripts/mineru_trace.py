@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+MinerU tracing - Chrome / Perfetto trace-event export
+
+Records every stage of every file as a span on the lane (thread or asyncio
+task) that executed it, so pipeline occupancy, idle workers and poll bursts
+can be inspected visually in chrome://tracing or https://ui.perfetto.dev.
+
+Span sources:
+    stage   create_batch / upload / download / extract (via mineru_metrics.timed)
+    http    every requests / aiohttp request (method, host+path, status)
+    sleep   poll intervals and retry backoff (traced_sleep / async_traced_sleep)
+    item    one span per file handled by a pipeline worker
+    server  queue / parse as observed by polling (async tracks, not per lane)
+
+Events are streamed to disk in the JSON array format, which trace viewers
+accept even when the closing bracket is missing (e.g. after a crash). When
+tracing is off, every hook is a single attribute check.
+
+Usage:
+    with span("upload", bytes=size):
+        ...
+    traced_sleep(poll, "poll")
+"""
+
+import argparse
+import asyncio
+import atexit
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._file = None
+        self._first = True
+        self._lock = threading.Lock()
+        self._lanes = weakref.WeakKeyDictionary()
+        self._lanes_lock = threading.Lock()
+        self._lane_ids = itertools.count(1)
+        self._async_ids = itertools.count(1)
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._wall_offset = time.time() - self._origin
+
+    def enable(self, path: Path) -> None:
+        """Start streaming events to `path`; the file is finalized at exit."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self.enabled = True
+        self._emit({
+            "name": "process_name", "ph": "M", "pid": self._pid, "tid": 0,
+            "args": {"name": Path(sys.argv[0]).stem or "mineru"},
+        })
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file:
+                return
+            self.enabled = False
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+
+    def _ts(self, perf: float) -> float:
+        return round((perf - self._origin) * 1e6, 1)
+
+    def _emit(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._file:
+                return
+            self._file.write(line if self._first else ",\n" + line)
+            self._first = False
+
+    def _lane(self) -> int:
+        """Trace `tid` for the current asyncio task, or the current thread."""
+        thread = threading.current_thread()
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = task if task is not None else thread
+        tid = self._lanes.get(key)
+        if tid is None:
+            with self._lanes_lock:
+                tid = next(self._lane_ids)
+                self._lanes[key] = tid
+            name = thread.name if task is None else f"{thread.name}/{task.get_name()}"
+            self._emit({
+                "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                "args": {"name": name},
+            })
+        return tid
+
+    def complete(self, name: str, cat: str, start: float, end: float, args: Optional[dict] = None) -> None:
+        """Record a finished span on the current lane (`start`/`end` from perf_counter)."""
+        event = {
+            "name": name, "cat": cat, "ph": "X", "pid": self._pid, "tid": self._lane(),
+            "ts": self._ts(start), "dur": round(max(0.0, end - start) * 1e6, 1),
+        }
+        if args:
+            event["args"] = args
+        self._emit(event)
+
+    def async_span(self, name: str, cat: str, start_wall: float, end_wall: float,
+                   args: Optional[dict] = None) -> None:
+        """Record a span on its own async track (`start_wall`/`end_wall` from time.time)."""
+        span_id = next(self._async_ids)
+        base = {"name": name, "cat": cat, "pid": self._pid, "tid": self._lane(), "id": span_id}
+        begin = dict(base, ph="b", ts=self._ts(start_wall - self._wall_offset))
+        if args:
+            begin["args"] = args
+        self._emit(begin)
+        self._emit(dict(base, ph="e", ts=self._ts(end_wall - self._wall_offset)))
+
+
+TRACER = Tracer()
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", **args) -> Iterator[dict]:
+    """Trace the enclosed block. The yielded dict becomes the span's args."""
+    if not TRACER.enabled:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = repr(e)
+        raise
+    finally:
+        TRACER.complete(name, cat, start, time.perf_counter(), args)
+
+
+def server_span(name: str, start_wall: float, end_wall: float, **args) -> None:
+    """Record a server-side phase (queue/parse) inferred from polling."""
+    if TRACER.enabled:
+        TRACER.async_span(name, "server", start_wall, end_wall, args)
+
+
+def traced_sleep(seconds: float, reason: str = "sleep") -> None:
+    with span(reason, "sleep", seconds=seconds):
+        time.sleep(seconds)
+
+
+async def async_traced_sleep(seconds: float, reason: str = "sleep") -> None:
+    with span(reason, "sleep", seconds=seconds):
+        await asyncio.sleep(seconds)
+
+
+def _short_url(url) -> str:
+    # Drop query strings: presigned upload/download URLs carry long signatures
+    parts = urlsplit(str(url))
+    return f"{parts.netloc}{parts.path}"
+
+
+def install_requests_hook() -> None:
+    """Wrap `requests.Session.request` so every sync HTTP call becomes a span."""
+    try:
+        import requests
+    except ImportError:
+        return
+
+    original = requests.Session.request
+    if getattr(original, "_mineru_traced", False):
+        return
+
+    @functools.wraps(original)
+    def request(self, method, url, *args, **kwargs):
+        with span(f"{method.upper()} {_short_url(url)}", "http") as info:
+            response = original(self, method, url, *args, **kwargs)
+            info["status"] = response.status_code
+            return response
+
+    request._mineru_traced = True
+    requests.Session.request = request
+
+
+def aiohttp_trace_configs() -> list:
+    """`trace_configs` for aiohttp.ClientSession (empty when tracing is off)."""
+    if not TRACER.enabled:
+        return []
+    import aiohttp
+
+    async def on_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_end(session, ctx, params):
+        TRACER.complete(f"{params.method} {_short_url(params.url)}", "http", ctx.start,
+                        time.perf_counter(), {"status": params.response.status})
+
+    async def on_error(session, ctx, params):
+        TRACER.complete(f"{params.method} {_short_url(params.url)}", "http", ctx.start,
+                        time.perf_counter(), {"error": repr(params.exception)})
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_start)
+    config.on_request_end.append(on_end)
+    config.on_request_exception.append(on_error)
+    return [config]
+
+
+def item_name(item) -> str:
+    """Readable span name for a pipeline item (path, (path, target) job, engine Job or URL)."""
+    if isinstance(item, tuple) and item:
+        item = item[0]
+    item = getattr(item, "source", item)
+    if isinstance(item, Path):
+        return item.name
+    return _short_url(item).rsplit("/", 1)[-1] or str(item)
+
+
+def add_trace_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Write Chrome/Perfetto trace events (per-file stages, HTTP "
+                             "requests, sleeps) to PATH")
+
+
+def setup_trace(args: argparse.Namespace) -> None:
+    if getattr(args, "trace", None):
+        TRACER.enable(Path(args.trace))
+        install_requests_hook()
@@ -6,149 +6,80 @@ MinerU Document Parser - 异步并行版
 """
 
 import argparse
-import os
 import sys
+import threading
 import time
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-import requests
-
-API_BASE = "https://mineru.net/api/v4"
+from mineru_download import add_download_arguments, replace_result, setup_download
+from mineru_engine import Engine, Job, Policy, run_threaded
+from mineru_events import add_event_arguments, close_events, setup_events
+from mineru_hedge import add_hedge_arguments, setup_hedge
+from mineru_ledger import add_ledger_arguments, setup_ledger
+from mineru_local import add_local_arguments, setup_local
+from mineru_metrics import add_metrics_arguments, file_done, setup_metrics, timed_iter
+from mineru_pages import add_pages_arguments, result_name, setup_pages
+from mineru_pipeline import DEFAULT_BACKLOG, progress_tag
+from mineru_profile import add_profile_arguments, setup_profile
+from mineru_queue import add_queue_arguments, coordinate, setup_queue
+from mineru_route import add_route_arguments, route_tag, setup_route
+from mineru_scan import add_scan_arguments, mirror_output_dir, scan_from_args
+from mineru_sync import add_sync_arguments, finish_sync, is_current, setup_sync, track_sync
+from mineru_tokens import add_token_arguments, token_pool
+from mineru_trace import add_trace_arguments, setup_trace
+from mineru_watch import DEFAULT_SETTLE, DEFAULT_WATCH_INTERVAL, watch_files
 
 SUPPORTED_EXTS = {
     ".pdf", ".docx", ".pptx",
     ".jpg", ".jpeg", ".png",
 }
 
+# 上传/解析/下载全部走 mineru_engine；这里只保留重试策略和进度输出
+POLICY = Policy(retries=5, backoff=lambda attempt: 2 ** attempt, poll_interval=5, timeout=600)
 
-def collect_files(path: Path) -> list[Path]:
-    """收集目录下所有支持的文件"""
-    files = []
-    for f in sorted(path.iterdir()):
-        if f.is_file() and f.suffix.lower() in SUPPORTED_EXTS:
-            files.append(f)
-    return files
+PROGRESS = {
+    "upload": " ⏳",
+    "parse": " 🔄",
+    "download": " 📥",
+    "done": " ✅\n",
+}
 
 
 def get_token(args):
-    return args.token or os.environ.get("MINERU_TOKEN")
+    """单个 token 或 token 池（--token a,b / --tokens-file / MINERU_TOKENS）"""
+    return token_pool(args)
 
 
-def headers(token):
-    return {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}",
+def api_options(args):
+    options = {
+        "model_version": args.model,
+        "enable_formula": not args.no_formula,
+        "enable_table": not args.no_table,
     }
-
-
-def process_file(token, file_path, output_dir, index, total, model, language, enable_formula, enable_table):
-    """处理单个文件"""
-    filename = Path(file_path).name
-    stem = Path(file_path).stem
-
-    # 检查是否已存在
-    if (output_dir / stem).exists():
-        print(f"  [{index+1}/{total}] ⏭️  {stem}")
-        return True, stem
-
-    print(f"  [{index+1}/{total}] 📤 {stem}", end="", flush=True)
-
-    for attempt in range(5):
-        try:
-            # 1. 获取上传链接
-            payload = {
-                "files": [{"name": filename, "data_id": stem}],
-                "model_version": model,
-                "enable_formula": enable_formula,
-                "enable_table": enable_table,
-            }
-            if language != "auto":
-                payload["language"] = language
-            resp = requests.post(
-                f"{API_BASE}/file-urls/batch",
-                headers=headers(token),
-                json=payload,
-                timeout=60,
-            )
-            result = resp.json()
-            
-            if result.get("code") != 0:
-                raise Exception(f"API错误: {result.get('msg')}")
-            
-            batch_id = result["data"]["batch_id"]
-            upload_url = result["data"]["file_urls"][0]
-            
-            # 2. 上传文件 - 使用正确的方式
-            print(" ⏳", end="", flush=True)
-            
-            # 关键：不设置 Content-Type，让 requests 自动处理
-            with open(file_path, "rb") as f:
-                file_data = f.read()
-            
-            upload_resp = requests.put(
-                upload_url,
-                data=file_data,  # 使用 data 而不是 files
-                timeout=300,
-            )
-            
-            if upload_resp.status_code not in [200, 203]:
-                raise Exception(f"上传失败: {upload_resp.status_code}")
-            
-            # 3. 等待解析
-            print(" 🔄", end="", flush=True)
-            
-            for _ in range(120):
-                status_resp = requests.get(
-                    f"{API_BASE}/extract-results/batch/{batch_id}",
-                    headers=headers(token),
-                    timeout=30,
-                )
-                results = status_resp.json()["data"]["extract_result"]
-                
-                if results:
-                    state = results[0].get("state")
-                    
-                    if state == "done":
-                        # 4. 下载
-                        print(" 📥", end="", flush=True)
-                        zip_url = results[0]["full_zip_url"]
-                        zip_path = output_dir / f"{stem}.zip"
-                        
-                        dl_resp = requests.get(zip_url, timeout=300)
-                        zip_path.write_bytes(dl_resp.content)
-                        
-                        extract_dir = output_dir / stem
-                        with zipfile.ZipFile(zip_path) as zf:
-                            zf.extractall(extract_dir)
-                        
-                        zip_path.unlink()
-                        
-                        # 重命名
-                        md = extract_dir / "full.md"
-                        if md.exists():
-                            md.rename(extract_dir / f"{stem}.md")
-                        
-                        print(" ✅")
-                        return True, stem
-                    
-                    elif state == "failed":
-                        raise Exception(results[0].get("err_msg", "解析失败"))
-                
-                time.sleep(5)
-            
-            raise Exception("等待超时")
-            
-        except Exception as e:
-            if attempt < 4:
-                print(f" 🔄r{attempt+1}", end="", flush=True)
-                time.sleep(2 ** attempt)
-            else:
-                print(f" ❌ {e}")
-                return False, stem
-    
-    return False, stem
+    if args.language != "auto":
+        options["language"] = args.language
+    if args.ocr:
+        options["is_ocr"] = True
+    return options
+
+
+def print_progress(job, event):
+    """一行一个文件：📤 ⏳ 🔄 📥 ✅"""
+    tag = progress_tag(job.index)
+    if event == "skip":
+        print(f"  {tag} ⏭️  {job.name}")
+    elif event == "start":
+        print(f"  {tag} 📤 {job.name}", end="", flush=True)
+    elif event == "retry":
+        print(f" 🔄r{job.attempts}", end="", flush=True)
+    elif event == "failed":
+        print(f" ❌ {job.error}")
+    elif event == "done" and job.local:
+        print(" ⚡ ✅")
+    elif event == "upload":
+        print(route_tag(job) + PROGRESS[event], end="", flush=True)
+    else:
+        print(PROGRESS[event], end="", flush=True)
 
 
 def main():
@@ -162,7 +93,9 @@ def main():
     parser.add_argument("--resume", action="store_true")
     parser.add_argument("--model", default="vlm",
                         choices=["pipeline", "vlm", "MinerU-HTML"],
-                        help="Model version (default: vlm)")
+                        help="Model version (default: vlm; with --route: for non-PDF files)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="Force OCR (with --route: for every file)")
     parser.add_argument("--language", default="auto",
                         choices=["auto", "en", "ch"],
                         help="Document language (default: auto)")
@@ -170,9 +103,46 @@ def main():
                         help="Disable formula recognition")
     parser.add_argument("--no-table", action="store_true",
                         help="Disable table extraction")
+    add_scan_arguments(parser)
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and parse new files dropped into --dir")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help=f"Seconds between inbox polls (default: {DEFAULT_WATCH_INTERVAL})")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help=f"Seconds a file's size/mtime must be unchanged before pickup "
+                             f"(default: {DEFAULT_SETTLE})")
+    add_metrics_arguments(parser)
+    add_trace_arguments(parser)
+    add_profile_arguments(parser)
+    add_event_arguments(parser)
+    add_hedge_arguments(parser)
+    add_download_arguments(parser)
+    add_ledger_arguments(parser)
+    add_token_arguments(parser)
+    add_queue_arguments(parser)
+    add_sync_arguments(parser)
+    add_local_arguments(parser)
+    add_route_arguments(parser)
+    add_pages_arguments(parser)
 
     args = parser.parse_args()
 
+    if args.watch and not args.dir:
+        parser.error("--watch requires --dir")
+
+    setup_metrics(args)
+    setup_trace(args)
+    setup_profile(args)
+    setup_events(args)
+    setup_hedge(args)
+    setup_download(args)
+    setup_ledger(args)
+    setup_queue(args)
+    setup_sync(args)
+    setup_local(args)
+    setup_route(args)
+    setup_pages(args)
+
     token = get_token(args)
     if not token:
         print("❌ 请设置 MINERU_TOKEN — https://mineru.net/user-center/api-token")
@@ -181,50 +151,91 @@ def main():
     output_dir = Path(args.output)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # 收集文件
+    # 收集文件：边扫描边提交，不预先物化/排序整个目录
     if args.file:
-        input_files = [Path(args.file)]
+        input_root = Path(args.file).parent
+        input_files = iter([Path(args.file)])
+    elif args.watch:
+        # 常驻监听：新文件写入稳定后直接送入同一个工作池
+        input_root = Path(args.dir)
+
+        def on_replaced(f):
+            # 监听中被替换的文件：重新解析并覆盖旧结果 (--sync 自行按清单判断)
+            if args.sync is None:
+                replace_result(mirror_output_dir(f, input_root, output_dir), result_name(f))
+
+        input_files = watch_files(
+            input_root, SUPPORTED_EXTS, args.include, args.exclude, args.recursive,
+            skip_dirs=[output_dir], interval=args.watch_interval, settle=args.settle,
+            replaced=on_replaced,
+        )
+        print(f"👀 监听目录: {input_root} (Ctrl+C 退出)")
     else:
-        input_files = collect_files(Path(args.dir))
-
-    if args.resume:
-        original = len(input_files)
-        input_files = [f for f in input_files if not (output_dir / f.stem).exists()]
-        if skipped := original - len(input_files):
-            print(f"⏭️  跳过已处理: {skipped} 个\n")
-
-    if not input_files:
-        print("✅ 所有文件已完成!")
-        return
-
-    total = len(input_files)
-    print(f"📚 开始处理 {total} 个文件 (并发: {args.workers}, 模型: {args.model})\n")
+        input_root = Path(args.dir)
+        input_files = timed_iter("scan", scan_from_args(args, input_root, SUPPORTED_EXTS, output_dir))
+
+    skipped = 0
+    options = api_options(args)
+
+    def iter_pending():
+        nonlocal skipped
+        for f in input_files:
+            target = mirror_output_dir(f, input_root, output_dir)
+            # --sync 按清单判断新增/变更；否则 --resume 只看结果是否存在
+            if is_current(f, target, args.resume or args.watch):
+                skipped += 1
+                file_done("skipped")
+                continue
+            yield Job(f, target, options=options)
+
+    model = f"按 {args.route} 路由" if args.route else args.model
+    print(f"📚 开始处理 (并发: {args.workers}, 模型: {model})\n")
 
     success = 0
     failed = 0
     failed_files = []
     start = time.time()
-
-    enable_formula = not args.no_formula
-    enable_table = not args.no_table
-
-    # 并行处理
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {
-            executor.submit(
-                process_file, token, f, output_dir, i, total,
-                args.model, args.language, enable_formula, enable_table
-            ): f
-            for i, f in enumerate(input_files)
-        }
-
-        for future in as_completed(futures):
-            ok, name = future.result()
-            if ok:
+    lock = threading.Lock()
+
+    def on_event(job, event):
+        nonlocal success, failed, skipped
+        print_progress(job, event)
+        # 在 worker 内计数：watch 模式下主线程可能一直阻塞在等待新文件上
+        if event not in ("skip", "done", "failed"):
+            return
+        with lock:
+            if event == "skip":
+                skipped += 1
+            elif event == "done":
                 success += 1
             else:
                 failed += 1
-                failed_files.append(name)
+                failed_files.append(job.name)
+        file_done({"skip": "skipped", "done": "success", "failed": "failed"}[event])
+
+    # 并行处理（watch / queue 模式不预读：新文件到达即由空闲 worker 接手，
+    # 多节点时也只认领马上要处理的文件，剩下的留给其他节点）
+    backlog = 0 if args.watch or args.queue is not None else DEFAULT_BACKLOG
+    engine = Engine(token, POLICY)
+    # --queue 时只处理本节点认领到的文件，其余由共享目录上的其他节点处理
+    jobs, hook = coordinate(iter_pending(), input_root, track_sync(on_event))
+    try:
+        for _ in run_threaded(engine, jobs, args.workers, backlog, hook):
+            pass
+    except KeyboardInterrupt:
+        if not args.watch:
+            raise
+        print("\n🛑 停止监听")
+
+    finish_sync()
+    close_events()
+
+    if skipped:
+        print(f"⏭️  跳过已处理: {skipped} 个\n")
+
+    if success + failed == 0:
+        print("✅ 所有文件已完成!")
+        return
     
     elapsed = time.time() - start
     print(f"\n{'='*50}")
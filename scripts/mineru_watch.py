@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+MinerU watch-folder helper - low-latency pickup of new documents
+
+Polls an inbox directory with cheap `os.scandir` listings plus one stat per
+file. A file is yielded once its size and mtime have stayed the same for
+`settle` seconds, i.e. once whatever is writing it (a copy, a sync client, a
+scanner) has finished. A file replaced under the same name (new size or
+mtime) is yielded again once it settles. No inotify or
+external services are needed, so it works the same on local disks and NFS.
+
+Usage:
+    for path in watch_files(Path("./inbox"), {".pdf"}):
+        ...  # runs until interrupted
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from mineru_scan import scan_files
+
+DEFAULT_WATCH_INTERVAL = 2.0
+DEFAULT_SETTLE = 3.0
+
+
+def watch_files(
+    root: Path,
+    exts: Iterable[str],
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    recursive: bool = False,
+    skip_dirs: Iterable[Path] = (),
+    interval: float = DEFAULT_WATCH_INTERVAL,
+    settle: float = DEFAULT_SETTLE,
+    stop: Optional[threading.Event] = None,
+    replaced: Optional[Callable[[Path], None]] = None,
+) -> Iterator[Path]:
+    """Yield files under `root` as they appear and finish being written.
+
+    Files already present when watching starts are picked up too (after the
+    same stabilization check). Each version of a file (path, size, mtime) is
+    yielded at most once per process; a file that disappears is forgotten, so
+    it is yielded again if it comes back. `replaced(path)` is called before a
+    file is yielded again because it changed since it was last yielded. Runs
+    until `stop` is set (or forever).
+    """
+    exts = set(exts)
+    skip_dirs = list(skip_dirs)
+    stop = stop or threading.Event()
+
+    # path -> (size, mtime_ns, first time this signature was seen)
+    candidates: Dict[str, Tuple[int, int, float]] = {}
+    # path -> (size, mtime_ns) when it was yielded
+    handed_out: Dict[str, Tuple[int, int]] = {}
+
+    while not stop.is_set():
+        present = set()
+
+        for path in scan_files(root, exts, include, exclude, recursive, skip_dirs):
+            key = str(path)
+            try:
+                st = os.stat(key)
+            except OSError:
+                continue
+            now = time.monotonic()
+            present.add(key)
+
+            signature = (st.st_size, st.st_mtime_ns)
+            if handed_out.get(key) == signature:
+                continue
+            previous = candidates.get(key)
+            if previous is None or previous[:2] != signature:
+                candidates[key] = (st.st_size, st.st_mtime_ns, now)
+                continue
+
+            if st.st_size > 0 and now - previous[2] >= settle:
+                del candidates[key]
+                if replaced and key in handed_out:
+                    replaced(path)
+                handed_out[key] = signature
+                yield path
+
+        # Forget files that vanished (renamed/deleted mid-write, or moved away after parsing)
+        for seen in (candidates, handed_out):
+            for key in list(seen):
+                if key not in present:
+                    del seen[key]
+
+        stop.wait(interval)